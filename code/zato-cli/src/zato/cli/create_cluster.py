@@ -104,6 +104,9 @@ zato_services = {
     'zato.cloud.openstack.swift.edit':'zato.server.service.internal.cloud.openstack.swift.Edit',
     'zato.cloud.openstack.swift.get-list':'zato.server.service.internal.cloud.openstack.swift.GetList',
 
+    # Connection pools
+    'zato.conn-pool.get-stats':'zato.server.service.internal.conn_pool.GetStats',
+
     # Connectors - AMQP
     'zato.connector.amqp.create':'zato.server.service.internal.connector.amqp_.Create',
 
@@ -160,6 +163,10 @@ zato_services = {
     'zato.http-soap.edit':'zato.server.service.internal.http_soap.Edit',
     'zato.http-soap.get-list':'zato.server.service.internal.http_soap.GetList',
     'zato.http-soap.ping':'zato.server.service.internal.http_soap.Ping',
+    'zato.http-soap.clear-timing-stats':'zato.server.service.internal.http_soap.ClearTimingStats',
+    'zato.http-soap.get-limits-stats':'zato.server.service.internal.http_soap.GetLimitsStats',
+    'zato.http-soap.get-timing-stats':'zato.server.service.internal.http_soap.GetTimingStats',
+    'zato.http-soap.set-timing-config':'zato.server.service.internal.http_soap.SetTimingConfig',
 
     # Clusters - Connections map
     'zato.info.get-info':'zato.server.service.internal.info.GetInfo',
@@ -186,6 +193,9 @@ zato_services = {
     'zato.kvdb.data-dict.translation.translate':'zato.server.service.internal.kvdb.data_dict.translation.Translate',
     'zato.kvdb.remote-command.execute':'zato.server.service.internal.kvdb.ExecuteCommand',
 
+    # Locks
+    'zato.lock.get-stats':'zato.server.service.internal.lock.GetStats',
+
     # Messages - Namespaces
     'zato.message.namespace.create': 'zato.server.service.internal.message.namespace.Create',
     'zato.message.namespace.edit': 'zato.server.service.internal.message.namespace.Edit',
@@ -374,6 +384,10 @@ zato_services = {
     'zato.security.rbac.role-permission.delete':'zato.server.service.internal.security.rbac.role_permission.Delete',
     'zato.security.rbac.role-permission.get-list':'zato.server.service.internal.security.rbac.role_permission.GetList',
 
+    # Security - RBAC - Roles of accounts of RBAC-delegated channels
+    'zato.security.rbac.delegated-cache.delete':'zato.server.service.internal.security.rbac.delegated_cache.Delete',
+    'zato.security.rbac.delegated-cache.get-stats':'zato.server.service.internal.security.rbac.delegated_cache.GetStats',
+
     # Security - TLS - CA certs
     'zato.security.tls.ca_cert.create':'zato.server.service.internal.security.tls.ca_cert.Create',
     'zato.security.tls.ca_cert.delete':'zato.server.service.internal.security.tls.ca_cert.Delete',
@@ -430,6 +444,7 @@ zato_services = {
     'zato.service.get-wsdl':'zato.server.service.internal.service.GetWSDL',
     'zato.service.has-wsdl':'zato.server.service.internal.service.HasWSDL',
     'zato.service.invoke':'zato.server.service.internal.service.Invoke',
+    'zato.service.invoke-many':'zato.server.service.internal.service.InvokeMany',
     'zato.service.set-wsdl':'zato.server.service.internal.service.SetWSDL',
     'zato.service.slow-response.get':'zato.server.service.internal.service.GetSlowResponse',
     'zato.service.slow-response.get-list':'zato.server.service.internal.service.GetSlowResponseList',
@@ -75,6 +75,10 @@ ca_certs_location=zato-scheduler-ca-certs.pem
 
 [api_users]
 user1={user1_password}
+
+[misc]
+job_batch_window=0.05 # In seconds, 0 sends each job to servers in its own message
+job_batch_max_size=1000
 """
 
 # ################################################################################################################################
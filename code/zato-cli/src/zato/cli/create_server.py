@@ -69,6 +69,8 @@ priv_key_location=zato-server-priv-key.pem
 pub_key_location=zato-server-pub-key.pem
 cert_location=zato-server-cert.pem
 ca_certs_location=zato-server-ca-certs.pem
+pool_size=4 # How many threads hash passwords, verify signatures and encrypt large values, 0 = no pool
+offload_min_size=65536 # Values smaller than that many bytes are encrypted and decrypted without the pool
 
 [odb]
 db_name={{odb_db_name}}
@@ -125,6 +127,9 @@ internal_services_may_be_deleted=False
 initial_cluster_name={{initial_cluster_name}}
 initial_server_name={{initial_server_name}}
 queue_build_cap=30 # All queue-based connections need to initialize in that many seconds
+queue_acquire_timeout=5 # How many seconds to wait for a free connection from a queue-based connection pool
+queue_max_idle_time=60 # Idle connections are health-checked after that many seconds before being handed out
+queue_max_lifetime=0 # Connections older than that many seconds are replaced with new ones, 0 = no limit
 http_proxy=
 locale=
 ensure_sql_connections_exist=True
@@ -138,13 +143,23 @@ enforce_service_invokes=False
 return_tracebacks=True
 default_error_message="An error has occurred"
 startup_callable=
+use_config_snapshot=True # Workers other than the first one read ODB-based configuration from a file in work_dir
+scheduler_job_pool_size=100 # How many jobs that the scheduler sent in batches may run concurrently in each worker
 
 [ibm_mq]
 ipc_tcp_start_port=34567
+forward_pool_size=10
+forward_batch_size=1
+forward_queue_size=1000
+forward_stats_interval=60
 
 [stats]
 expire_after=168 # In hours, 168 = 7 days = 1 week
 
+[http_timing]
+enabled=False
+server_timing_header=False
+
 [kvdb]
 host={{kvdb_host}}
 port={{kvdb_port}}
@@ -200,6 +215,9 @@ level=WARN
 
 [rbac]
 custom_auth_list_service=
+delegated_cache_ttl=60
+delegated_cache_negative_ttl=10
+delegated_cache_max_size=10000
 
 [[auth_type_hook]]
 
@@ -246,6 +264,7 @@ data_len=0
 
 [wsx]
 hook_service=
+metadata_flush_interval=5 # In seconds, how often last-seen and pub/sub interaction metadata of WSX clients is stored in the ODB
 
 [content_type]
 json = {JSON}
@@ -378,6 +397,9 @@ inform_if_not_approved=True
 
 [session]
 expiry=60 # In minutes
+cache_ttl=5 # Verified sessions are served from memory for up to that many seconds, 0 = no cache
+cache_max_size=10000
+renew_write_interval=30 # Renewals of a session update its expiration time in ODB at most once in that many seconds
 
 [password]
 expiry=730 # In days, 365 days * 2 years = 730 days
@@ -17,6 +17,7 @@ import os
 import re
 import sys
 from datetime import datetime
+from multiprocessing.pool import ThreadPool
 
 # anyjson
 import anyjson
@@ -42,6 +43,7 @@ from zato.cli import ManageCommand
 from zato.cli.check_config import CheckConfig
 from zato.common import SECRETS
 from zato.common.util import get_client_from_server_conf
+from zato.common.util.metrics import monotonic
 
 DEFAULT_COLS_WIDTH = '15,100'
 ZATO_NO_SECURITY = 'zato-no-security'
@@ -391,6 +393,48 @@ HTTP_SOAP_KINDS = (
 )
 HTTP_SOAP_ITEM_TYPES = set(tup[0] for tup in HTTP_SOAP_KINDS)
 
+def get_import_levels(item_types):
+    """ Groups item types into levels such that objects of each type depend only on objects of types from earlier levels,
+    as declared in object_dependencies of their ServiceInfo. As with a sequential import, security and other definitions
+    always come before all the other types. Types from the same level do not depend on each other.
+    """
+    item_types = set(item_types)
+    sec_types = set(item_type for item_type in item_types if SERVICE_BY_NAME[item_type].is_security)
+    def_types = sec_types | set(item_type for item_type in item_types if 'def' in item_type)
+
+    def get_deps(item_type):
+        deps = set()
+
+        for info in SERVICE_BY_NAME[item_type].object_dependencies.values():
+            dep_type = info['dependent_type']
+            deps.update(sec_types if dep_type == 'def_sec' else [dep_type])
+
+        if item_type not in def_types:
+            deps.update(def_types)
+
+        deps.discard(item_type)
+        return deps & item_types
+
+    levels = {}
+
+    def get_level(item_type, path=()):
+        if item_type not in levels:
+
+            # Cycles are not expected but if there are any, they are not followed
+            deps = [dep for dep in get_deps(item_type) if dep not in path]
+            levels[item_type] = max([get_level(dep, path + (item_type,)) + 1 for dep in deps] or [0])
+
+        return levels[item_type]
+
+    for item_type in item_types:
+        get_level(item_type)
+
+    out = [[] for _ in range(max(levels.values()) + 1)] if levels else []
+    for item_type, level in sorted(levels.items()):
+        out[level].append(item_type)
+
+    return out
+
 class _DummyLink(object):
     """ Pip requires URLs to have a .url attribute.
     """
@@ -742,7 +786,131 @@ class ObjectImporter(object):
 
 # ################################################################################################################################
 
-    def _import_object(self, def_type, item, is_edit):
+    def import_objects_bulk(self, already_existing, batch_size=100, concurrency=4):
+        """ Like import_objects but objects of each type are created or updated in batches, one request to the server
+        per batch, and types that do not depend on each other are imported concurrently. Types are imported level by level,
+        as returned by get_import_levels, and the import stops after the first level that had any errors.
+        """
+        edits = {}
+        creates = {}
+
+        for w in already_existing.warnings:
+            item_type, attrs = w.value_raw
+            if not self.should_skip_item(item_type, attrs, True):
+                edits.setdefault(item_type, []).append(attrs)
+
+        for item_type, items in iteritems(self.json):
+            edited = set(attrs.name for attrs in edits.get(item_type, []))
+            for attrs in items:
+                if attrs.name not in edited and not self.should_skip_item(item_type, attrs, False):
+                    creates.setdefault(item_type, []).append(attrs)
+
+        timings = []
+        pool = ThreadPool(concurrency)
+        start = monotonic()
+
+        try:
+            for level in get_import_levels(set(edits) | set(creates)):
+
+                def import_type(item_type):
+                    return self._import_type_bulk(item_type, edits.get(item_type, []), creates.get(item_type, []), batch_size)
+
+                timings.extend(pool.map(import_type, level))
+
+                if not self.results.ok:
+                    return self.results
+        finally:
+            pool.close()
+
+        for item_type, count, elapsed in sorted(timings):
+            self.logger.info('{}: {} object(s) in {:.2f}s'.format(item_type, count, elapsed))
+
+        self.logger.info('Imported {} object(s) of {} type(s) in {:.2f}s'.format(
+            sum(elem[1] for elem in timings), len(timings), monotonic() - start))
+
+        return self.results
+
+# ################################################################################################################################
+
+    def _import_type_bulk(self, item_type, edits, creates, batch_size):
+        """ Updates and creates all objects of a given type, returning the type, how many objects there were
+        and how long it took.
+        """
+        start = monotonic()
+        total = len(edits) + len(creates)
+        done = 0
+
+        for is_edit, items in ((True, edits), (False, creates)):
+            for idx in range(0, len(items), batch_size):
+                batch = items[idx:idx+batch_size]
+                if not self._import_batch(item_type, batch, is_edit):
+                    return item_type, done, monotonic() - start
+
+                done += len(batch)
+                self.logger.info('{}: {}/{} imported'.format(item_type, done, total))
+
+        # Dependent types from next levels will need IDs of the objects just imported
+        self.object_mgr.get_objects_by_type(item_type)
+
+        return item_type, done, monotonic() - start
+
+# ################################################################################################################################
+
+    def _invoke_many(self, item_type, service_name, items, is_edit):
+        """ Invokes a service for each of the items in one request, returning a list of results or None in case of errors.
+        """
+        response = self.client.invoke('zato.service.invoke-many', {'name': service_name, 'requests': items})
+        results = response.data['results'] if response.ok else [{'ok': False, 'details': response.details}]
+
+        for attrs, result in zip(items, results):
+            if not result['ok']:
+                raw = (item_type, dict(attrs), result['details'])
+                self.results.add_error(raw, ERROR_COULD_NOT_IMPORT_OBJECT,
+                    "Could not import (is_edit {}) '{}' with '{}', response from '{}' was '{}'",
+                        is_edit, attrs.get('name'), dict(attrs), item_type, result['details'])
+                return
+
+        return results
+
+# ################################################################################################################################
+
+    def _import_batch(self, item_type, batch, is_edit):
+        """ Imports a batch of objects of the same type, including their passwords, if there are any.
+        Returns True if all of them were imported.
+        """
+        service_info = SERVICE_BY_NAME[item_type]
+
+        for attrs in batch:
+            attrs.cluster_id = self.client.cluster_id
+            service_name = self._prepare_object(item_type, attrs, is_edit)
+
+        results = self._invoke_many(item_type, service_name, batch, is_edit)
+        if not results:
+            return False
+
+        verb = 'Updated' if is_edit else 'Created'
+        self.logger.debug('{} {} object(s) with {}'.format(verb, len(batch), service_name))
+
+        password_service_name = service_info.get_service_name('change-password')
+        if password_service_name:
+
+            passwords = [{
+                'id': result['data']['id'],
+                'name': attrs.name,
+                'password1': attrs.password,
+                'password2': attrs.password,
+            } for attrs, result in zip(batch, results) if 'password' in attrs]
+
+            if passwords and not self._invoke_many(item_type, password_service_name, passwords, is_edit):
+                return False
+
+        return True
+
+# ################################################################################################################################
+
+    def _prepare_object(self, def_type, item, is_edit):
+        """ Fills in attributes that an object's create or edit service needs and returns that service's name.
+        """
         service_info = SERVICE_BY_NAME[def_type]
 
         if is_edit:
@@ -767,6 +935,14 @@ class ObjectImporter(object):
                 })
                 item[info['id_field']] = dep_obj.id
 
+        return service_name
+
+# ################################################################################################################################
+
+    def _import_object(self, def_type, item, is_edit):
+        service_info = SERVICE_BY_NAME[def_type]
+        service_name = self._prepare_object(def_type, item, is_edit)
+
         self.logger.debug("Invoking {} for {}".format(service_name, service_info.name))
         response = self.client.invoke(service_name, item)
         if response.ok:
@@ -794,10 +970,13 @@ class ObjectImporter(object):
         return response
 
 class ObjectManager(object):
-    def __init__(self, client, logger):
+    def __init__(self, client, logger, concurrency=1):
         self.client = client
         self.logger = logger
 
+        # How many types of objects to fetch concurrently
+        self.concurrency = concurrency
+
 # ################################################################################################################################
 
     def find(self, item_type, fields):
@@ -968,8 +1147,17 @@ class ObjectManager(object):
 
     def _refresh_objects(self):
         self.objects = Bunch()
-        for service_info in SERVICES:
-            self.get_objects_by_type(service_info.name)
+        names = [service_info.name for service_info in SERVICES]
+
+        if self.concurrency > 1:
+            pool = ThreadPool(self.concurrency)
+            try:
+                pool.map(self.get_objects_by_type, names)
+            finally:
+                pool.close()
+        else:
+            for name in names:
+                self.get_objects_by_type(name)
 
         for item_type, items in iteritems(self.objects):
             for item in items:
@@ -1142,6 +1330,11 @@ class EnMasse(ManageCommand):
         {'name':'--ignore-missing-defs', 'help':'Ignore missing definitions when exporting to file', 'action':'store_true'},
         {'name':'--replace-odb-objects', 'help':'Force replacing objects already existing in ODB during import', 'action':'store_true'},
         {'name':'--input', 'help':'Path to input file with objects to import'},
+        {'name':'--bulk', 'help':'Import objects in batches, running independent types concurrently', 'action':'store_true'},
+        {'name':'--bulk-batch-size', 'help':'How many objects to import in one request in bulk mode, default: 100',
+            'type':int, 'default':100},
+        {'name':'--bulk-concurrency', 'help':'How many types of objects to import or export concurrently in bulk mode, default: 4',
+            'type':int, 'default':4},
         {'name':'--cols_width', 'help':'A list of columns width to use for the table output, default: {}'.format(DEFAULT_COLS_WIDTH), 'action':'store_true'},
     ]
 
@@ -1193,7 +1386,7 @@ class EnMasse(ManageCommand):
 
         # Get client and issue a sanity check as quickly as possible
         self.client = get_client_from_server_conf(self.component_dir)
-        self.object_mgr = ObjectManager(self.client, self.logger)
+        self.object_mgr = ObjectManager(self.client, self.logger, args.bulk_concurrency if args.bulk else 1)
         self.client.invoke('zato.ping')
         populate_services_from_apispec(self.client, self.logger)
 
@@ -1431,7 +1624,11 @@ class EnMasse(ManageCommand):
         if not already_existing.ok and not self.args.replace_odb_objects:
             return [already_existing]
 
-        results = importer.import_objects(already_existing)
+        if self.args.bulk:
+            results = importer.import_objects_bulk(already_existing, self.args.bulk_batch_size, self.args.bulk_concurrency)
+        else:
+            results = importer.import_objects(already_existing)
+
         if not results.ok:
             return [results]
 
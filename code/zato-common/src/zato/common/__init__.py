@@ -1149,6 +1149,14 @@ class ConnectionException(ZatoException):
 class TimeoutException(ConnectionException):
     pass
 
+class CircuitOpen(ConnectionException):
+    """ Raised when a circuit breaker of an outgoing connection is open and requests are not sent to the remote end.
+    """
+
+class ConcurrencyLimitExceeded(ConnectionException):
+    """ Raised when an outgoing connection has reached its concurrency limit and no request slot became free in time.
+    """
+
 class StatusAwareException(ZatoException):
     """ Raised when the underlying error condition can be easily expressed
     as one of the HTTP status codes.
@@ -1364,6 +1372,7 @@ default_internal_modules = {
     'zato.server.service.internal.channel.zmq': True,
     'zato.server.service.internal.cloud.aws.s3': True,
     'zato.server.service.internal.cloud.openstack.swift': True,
+    'zato.server.service.internal.conn_pool': True,
     'zato.server.service.internal.connector.amqp_': True,
     'zato.server.service.internal.crypto': True,
     'zato.server.service.internal.definition.amqp_': True,
@@ -75,6 +75,7 @@ class SCHEDULER(Constants):
     DELETE = ValueConstant('')
     EXECUTE = ValueConstant('')
     JOB_EXECUTED = ValueConstant('')
+    JOB_EXECUTED_BATCH = ValueConstant('')
 
 class ZMQ_SOCKET(Constants):
     code_start = 100200
@@ -237,6 +238,8 @@ class CHANNEL(Constants):
     WEB_SOCKET_EDIT = ValueConstant('')
     WEB_SOCKET_DELETE = ValueConstant('')
 
+    HTTP_SOAP_TIMING_SET_CONFIG = ValueConstant('')
+
 class AMQP_CONNECTOR(Constants):
     """ Since 3.0, this is not used anymore.
     """
@@ -399,6 +402,8 @@ class RBAC(Constants):
     ROLE_PERMISSION_EDIT = ValueConstant('')
     ROLE_PERMISSION_DELETE = ValueConstant('')
 
+    DELEGATED_CACHE_DELETE = ValueConstant('')
+
 class VAULT(Constants):
     code_start = 105400
 
@@ -490,6 +495,16 @@ class GENERIC(Constants):
     CONNECTION_DELETE = ValueConstant('')
     CONNECTION_CHANGE_PASSWORD = ValueConstant('')
 
+class SSO(Constants):
+    code_start = 107200
+
+    SESSION_CACHE_DELETE = ValueConstant('')
+
+class KVDB(Constants):
+    code_start = 107400
+
+    TRANSLATION_CHANGED = ValueConstant('')
+
 code_to_name = {}
 
 # To prevent 'RuntimeError: dictionary changed size during iteration'
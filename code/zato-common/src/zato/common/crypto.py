@@ -22,6 +22,9 @@ from bunch import bunchify
 # configobj
 from configobj import ConfigObj
 
+# gevent
+from gevent.threadpool import ThreadPool
+
 # cryptography
 from cryptography.fernet import Fernet, InvalidToken
 
@@ -50,11 +53,88 @@ class SecretKeyError(Exception):
 
 # ################################################################################################################################
 
+class CryptoPool(object):
+    """ Runs CPU-bound cryptographic functions, such as hashing of passwords or verification of RSA signatures,
+    in a pool of native threads rather than in the gevent hub. The C code that hashlib and cryptography delegate to
+    releases the GIL so other greenlets keep running while a function is computed in the pool and the calling greenlet
+    resumes once its result is ready. With pool_size set to zero, all functions are run inline, in the calling greenlet.
+    Any other object with the same run method, e.g. one backed by a pool of processes, can be used instead.
+    """
+    def __init__(self, pool_size=0, min_size=65536):
+
+        # Zato - imported here because zato.common.util imports this module
+        from zato.common.util.metrics import Histogram, monotonic
+
+        self.pool_size = pool_size
+        self.pool = ThreadPool(pool_size) if pool_size else None
+
+        # Data smaller than that many bytes is encrypted and decrypted inline because handing it over to the pool
+        # would take longer than encrypting or decrypting it.
+        self.min_size = min_size
+
+        # How long functions waited for a free thread in the pool and how long they ran, in milliseconds
+        self.queue_wait = Histogram()
+        self.run_time = Histogram()
+        self.pending = 0
+        self.monotonic = monotonic
+
+# ################################################################################################################################
+
+    def run(self, func, *args, **kwargs):
+        """ Runs a function in the pool, blocking the calling greenlet only, and returns its result or re-raises its exception.
+        """
+        if self.pool is None:
+            return func(*args, **kwargs)
+
+        _monotonic = self.monotonic
+        enqueued_at = _monotonic()
+        started = []
+
+        def _run():
+            started.append(_monotonic())
+            return func(*args, **kwargs)
+
+        self.pending += 1
+
+        try:
+            return self.pool.apply(_run)
+        finally:
+            self.pending -= 1
+
+            # Metrics are updated in the calling greenlet rather than in the pool's threads to keep them consistent
+            if started:
+                self.queue_wait.add((started[0] - enqueued_at) * 1000)
+                self.run_time.add((_monotonic() - started[0]) * 1000)
+
+# ################################################################################################################################
+
+    def run_sized(self, data, func, *args, **kwargs):
+        """ Like run but runs a function inline if data it is given is smaller than min_size.
+        """
+        if len(data) < self.min_size:
+            return func(*args, **kwargs)
+        return self.run(func, *args, **kwargs)
+
+# ################################################################################################################################
+
+    def get_stats(self):
+        return {
+            'pool_size': self.pool_size,
+            'pending': self.pending,
+            'queue_wait': self.queue_wait.to_dict(),
+            'run_time': self.run_time.to_dict(),
+        }
+
+# ################################################################################################################################
+
 class CryptoManager(object):
     """ Used for encryption and decryption of secrets.
     """
     def __init__(self, repo_dir=None, secret_key=None, stdin_data=None, well_known_data=None):
 
+        # Functions are run inline until a caller configures a pool of threads for them
+        self.pool = CryptoPool()
+
         # We always get it on input rather than reading it directly because our caller
         # may want to provide it to subprocesses in which case reading it in this process
         # would consume it and the other process would not be able to access it.
@@ -194,7 +274,7 @@ class CryptoManager(object):
     def encrypt(self, data):
         """ Encrypts incoming data, which must be a string.
         """
-        return self.secret_key.encrypt(data)
+        return self.pool.run_sized(data, self.secret_key.encrypt, data)
 
 # ################################################################################################################################
 
@@ -203,19 +283,19 @@ class CryptoManager(object):
         """
         if not isinstance(encrypted, bytes):
             encrypted = encrypted.encode('utf8')
-        return self.secret_key.decrypt(encrypted).decode('utf8')
+        return self.pool.run_sized(encrypted, self.secret_key.decrypt, encrypted).decode('utf8')
 
 # ################################################################################################################################
 
     def hash_secret(self, data, name='zato.default'):
         """ Hashes input secret using a named configured (e.g. PBKDF2-SHA512, 100k rounds, salt 32 bytes).
         """
-        return self.hash_scheme[name].hash(data)
+        return self.pool.run(self.hash_scheme[name].hash, data)
 
 # ################################################################################################################################
 
     def verify_hash(self, given, expected, name='zato.default'):
-        return self.hash_scheme[name].verify(given, expected)
+        return self.pool.run(self.hash_scheme[name].verify, given, expected)
 
 # ################################################################################################################################
 
@@ -84,6 +84,10 @@ class KVDB(object):
         self.run_lua = self.lua_container.run_lua # So it's more natural to use it
         self.has_sentinel = False
 
+        # Translation name -> value2, read from the KVDB by load_translations. As long as it is None,
+        # each translation is looked up in the KVDB.
+        self.translations = None
+
     def _get_connection_class(self):
         """ Returns a concrete class to create Redis connections off basing on whether we use Redis sentinels or not.
         Abstracted out to a separate method so it's easier to test the whole class in separation.
@@ -180,9 +184,57 @@ class KVDB(object):
         return self.conn.subscribe(*args, **kwargs)
 
     def translate(self, system1, key1, value1, system2, key2, default=''):
-        return self.conn.hget(
-            _KVDB.SEPARATOR.join(
-                (_KVDB.TRANSLATION, system1, key1, value1, system2, key2)), 'value2') or default
+        name = _KVDB.SEPARATOR.join((_KVDB.TRANSLATION, system1, key1, value1, system2, key2))
+
+        if self.translations is not None:
+            return self.translations.get(name) or default
+
+        return self.conn.hget(name, 'value2') or default
+
+    def translate_many(self, items, default=''):
+        """ Translates each of (system1, key1, value1, system2, key2) tuples given on input and returns a list of results,
+        in the same order. Translations that do not exist are returned as default.
+        """
+        names = [_KVDB.SEPARATOR.join((_KVDB.TRANSLATION,) + tuple(item)) for item in items]
+
+        if self.translations is not None:
+            get = self.translations.get
+            return [get(name) or default for name in names]
+
+        with self.conn.pipeline() as pipeline:
+            for name in names:
+                pipeline.hget(name, 'value2')
+            return [value or default for value in pipeline.execute()]
+
+    def _get_translations(self, names):
+        """ Returns a dictionary of value2 of translations under names given.
+        """
+        with self.conn.pipeline() as pipeline:
+            for name in names:
+                pipeline.hget(name, 'value2')
+            return dict(zip(names, pipeline.execute()))
+
+    def load_translations(self):
+        """ Reads all translations from the KVDB so that they can be looked up without the KVDB from now on.
+        """
+        names = list(self.conn.scan_iter(_KVDB.TRANSLATION + _KVDB.SEPARATOR + '*'))
+        self.translations = dict((name, value) for name, value in self._get_translations(names).items() if value is not None)
+
+    def refresh_translations(self, names=None):
+        """ Reads again translations under names given, which were created, edited or deleted, or all of them
+        if names are not given.
+        """
+        if self.translations is None:
+            return
+
+        if names is None:
+            return self.load_translations()
+
+        for name, value in self._get_translations(names).items():
+            if value is None:
+                self.translations.pop(name, None)
+            else:
+                self.translations[name] = value
 
     def copy(self):
         """ Returns an KVDB with the configuration copied over from self. Note that
@@ -10,9 +10,11 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 # stdlib
 import logging
+import re
+from collections import OrderedDict
 
 # globre
-from globre import match as globre_match
+from globre import compile as globre_compile, EXACT as globre_exact
 
 # Paste
 from paste.util.converters import asbool
@@ -22,13 +24,59 @@ from zato.common import FALSE_TRUE, TRUE_FALSE
 
 logger = logging.getLogger(__name__)
 
+# Python 2 does not allow for more than 100 groups in a regex so patterns are combined into as many regexes as needed
+max_regex_groups = 99
+
+class MatchCache(dict):
+    """ Decisions of a Matcher keyed by values they were made for. Holds up to max_size of them, evicting
+    ones that were least recently used first. Values that were never seen before are a KeyError, as with regular dicts.
+    """
+    def __init__(self, max_size=10000):
+        super(MatchCache, self).__init__()
+        self.max_size = max_size
+        self.recent = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getitem__(self, key, _getitem=dict.__getitem__):
+        try:
+            value = _getitem(self, key)
+        except KeyError:
+            self.misses += 1
+            raise
+        else:
+            self.hits += 1
+            del self.recent[key]
+            self.recent[key] = None
+            return value
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self.recent.pop(key, None)
+        self.recent[key] = None
+
+        if len(self.recent) > self.max_size:
+            oldest, _ = self.recent.popitem(last=False)
+            dict.__delitem__(self, oldest)
+            self.evictions += 1
+
+    def clear(self):
+        dict.clear(self)
+        self.recent.clear()
+
+    def get_stats(self):
+        return {'size':len(self), 'max_size':self.max_size, 'hits':self.hits, 'misses':self.misses,
+            'evictions':self.evictions}
+
 class Matcher(object):
-    def __init__(self):
+    def __init__(self, cache_size=10000):
         self.config = None
         self.items = {True:[], False:[]}
+        self.regexes = {True:[], False:[]}
         self.order1 = None
         self.order2 = None
-        self.is_allowed_cache = {}
+        self.is_allowed_cache = MatchCache(cache_size)
         self.special_case = None
 
     def read_config(self, config):
@@ -50,14 +98,49 @@ class Matcher(object):
         # Now sort everything lexicographically, the way it will be used in run-time
         for key in self.items:
             self.items[key] = list(reversed(sorted(self.items[key])))
+            self.regexes[key] = self._compile(self.items[key])
 
         for empty, non_empty in ((True, False), (False, True)):
             if not self.items[empty] and '*' in self.items[non_empty]:
                 self.special_case = non_empty
                 break
 
+    def _compile(self, patterns):
+        """ Combines all patterns into alternatives of one regex, or more if there are too many groups for one,
+        each pattern in a group of its own so that it is known which of them matched a value.
+        """
+        out = []
+        parts = []
+        groups = 0
+
+        for idx, pattern in enumerate(patterns):
+            regex = globre_compile(pattern, flags=globre_exact)
+
+            # One group is added for each pattern in addition to any that the pattern itself has
+            pattern_groups = regex.groups + 1
+
+            if parts and groups + pattern_groups > max_regex_groups:
+                out.append(re.compile('|'.join(parts)))
+                parts = []
+                groups = 0
+
+            parts.append('(?P<p{}>{})'.format(idx, regex.pattern))
+            groups += pattern_groups
+
+        if parts:
+            out.append(re.compile('|'.join(parts)))
+
+        return out
+
+    def get_match(self, order, value):
+        """ Returns the first of patterns of a given order that a value matches, or None if there is no such pattern.
+        """
+        for regex in self.regexes[order]:
+            match = regex.match(value)
+            if match:
+                return self.items[order][int(match.lastgroup[1:])]
+
     def is_allowed(self, value):
-        logger.debug('Cache:`%s`, value:`%s`', self.is_allowed_cache, value)
 
         if self.special_case is not None:
             return self.special_case
@@ -65,16 +148,19 @@ class Matcher(object):
         try:
             return self.is_allowed_cache[value]
         except KeyError:
-            _match = globre_match
-            is_allowed = None
 
-            for order in self.order1, self.order2:
-                for pattern in self.items[order]:
-                    if _match(pattern, value):
-                        is_allowed = order
+            # Patterns of the second order, if matched, take precedence over the ones from the first order
+            for order in self.order2, self.order1:
+                pattern = self.get_match(order, value)
+                if pattern is not None:
+                    is_allowed = order
+                    break
 
             # No match at all - we don't allow it in that case
-            is_allowed = is_allowed if (is_allowed is not None) else False
+            else:
+                is_allowed = False
+
+            logger.debug('Value:`%s`, is_allowed:`%s`, pattern:`%s`', value, is_allowed, pattern)
 
             self.is_allowed_cache[value] = is_allowed
             return is_allowed
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from bisect import bisect_left
+
+try:
+    from time import monotonic
+except ImportError:
+    # Python 2 has no monotonic clock in stdlib so wall-clock time is the closest we can get
+    from time import time as monotonic
+
+# For pyflakes
+monotonic = monotonic
+
+# ################################################################################################################################
+
+# Upper bounds of histogram buckets, in milliseconds. The last bucket catches everything above the previous one.
+default_buckets = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+# ################################################################################################################################
+
+class Histogram(object):
+    """ A fixed-bucket, in-memory histogram of durations or sizes. Adding a value costs one bisect and a few
+    attribute updates so it is cheap enough to be used on hot paths. Since it never yields, it is safe to use
+    from multiple greenlets without any locking.
+    """
+    __slots__ = ('buckets', 'counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self, buckets=default_buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value, _bisect_left=bisect_left):
+        self.counts[_bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+        if self.min is None or value < self.min:
+            self.min = value
+
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def clear(self):
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def get_percentile(self, percentile):
+        """ Returns an upper bound of the bucket that a given percentile (0-100) falls into.
+        Values in the last, open-ended, bucket are reported as the maximum value observed.
+        """
+        if not self.count:
+            return None
+
+        threshold = self.count * percentile / 100.0
+        running = 0
+
+        for idx, count in enumerate(self.counts):
+            running += count
+            if running >= threshold:
+                return min(self.buckets[idx], self.max) if idx < len(self.buckets) else self.max
+
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.total / self.count if self.count else None,
+            'p50': self.get_percentile(50),
+            'p90': self.get_percentile(90),
+            'p99': self.get_percentile(99),
+            'buckets': [[bound, count] for bound, count in zip(self.buckets + ('inf',), self.counts) if count],
+        }
+
+# ################################################################################################################################
+
+class PhaseTimer(object):
+    """ Measures how long each of consecutive phases of a longer process takes, e.g. of a server's startup.
+    """
+    def __init__(self, _monotonic=monotonic):
+        self.start = self.last = _monotonic()
+        self.phases = []
+
+    def mark(self, name, _monotonic=monotonic):
+        """ Records that a phase of a given name has just ended - it started when the previous one did.
+        """
+        now = _monotonic()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    @property
+    def total(self):
+        return self.last - self.start
+
+    def to_string(self):
+        return ', '.join('{}:{:.3f}s'.format(name, duration) for name, duration in self.phases)
+
+# ################################################################################################################################
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# Benchmarks of CryptoPool, run as `python bench_crypto.py [num_logins] [rounds] [pool_size]`.
+# Simulates a burst of SSO logins, each verifying a PBKDF2-SHA512 hash, and reports how late a greenlet that is meant
+# to wake up every 10 ms is while they are verified - first with all hashes verified inline, then in a pool of threads.
+
+# stdlib
+import sys
+
+# gevent
+from gevent import sleep, spawn
+from gevent.pool import Group
+
+# Zato
+from zato.common.crypto import CryptoManager, CryptoPool
+from zato.common.util.metrics import Histogram, monotonic
+
+# ################################################################################################################################
+
+def run(num_logins, rounds, pool_size, interval=0.01):
+
+    crypto = CryptoManager.from_secret_key(CryptoManager.generate_key())
+    crypto.add_hash_scheme('zato.default', rounds, 32)
+    crypto.pool = CryptoPool(pool_size)
+
+    hashed = crypto.hash_secret('my-password')
+
+    # How many milliseconds later than expected the ticker woke up
+    lateness = Histogram()
+    keep_running = [True]
+
+    def tick():
+        while keep_running[0]:
+            expected = monotonic() + interval
+            sleep(interval)
+            lateness.add(max(monotonic() - expected, 0) * 1000)
+
+    ticker = spawn(tick)
+    sleep(interval)
+
+    start = monotonic()
+    group = Group()
+    for _ in range(num_logins):
+        group.spawn(crypto.verify_hash, 'my-password', hashed)
+    group.join()
+    total_time = monotonic() - start
+
+    keep_running[0] = False
+    ticker.join()
+
+    lateness = lateness.to_dict()
+    print('pool_size:{} - {} logins in {:.3f}s ({:.1f}/s), hub lateness in ms - p50:{} p99:{} max:{:.3f}'.format(
+        pool_size, num_logins, total_time, num_logins / total_time, lateness['p50'], lateness['p99'], lateness['max']))
+
+    if pool_size:
+        queue_wait = crypto.pool.queue_wait.to_dict()
+        print('pool_size:{} - queue wait in ms - p50:{} p99:{} max:{:.3f}'.format(
+            pool_size, queue_wait['p50'], queue_wait['p99'], queue_wait['max']))
+
+# ################################################################################################################################
+
+if __name__ == '__main__':
+    num_logins = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    pool_size = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    run(num_logins, rounds, 0)
+    run(num_logins, rounds, pool_size)
+
+# ################################################################################################################################
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# Benchmarks of the scheduler's engine, run as `python bench_scheduler.py [num_jobs] [run_time]`.
+# Reports how long it takes to load old jobs at startup, how long it takes to schedule, edit and delete jobs,
+# how much memory they use and how late they are fired.
+
+# stdlib
+import resource
+import sys
+from datetime import datetime, timedelta
+
+# Bunch
+from bunch import Bunch
+
+# Zato
+from zato.common import SCHEDULER
+from zato.common.util.metrics import monotonic
+from zato.scheduler.backend import get_cron_interval, Interval, Job, Scheduler
+
+# ################################################################################################################################
+
+def get_max_rss():
+    """ Returns the peak resident set size of the current process, in megabytes.
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+# ################################################################################################################################
+
+def get_scheduler():
+    config = Bunch()
+    config.on_job_executed_cb = lambda ctx: None
+    config._add_startup_jobs = False
+    config._add_scheduler_jobs = False
+    config.startup_jobs = []
+    config.odb = None
+    config.job_log_level = 'debug'
+
+    return Scheduler(config, None)
+
+# ################################################################################################################################
+
+def run_startup(num_jobs):
+
+    scheduler = get_scheduler()
+
+    # Jobs created two years ago, as they are when the scheduler starts - interval-based ones running every 1 to 10 seconds,
+    # some of them with max_repeats reached long ago, and cron-style ones sharing a few definitions.
+    start_time = datetime.utcnow() - timedelta(days=730)
+    cron_definitions = ['* * * * *', '*/5 * * * *', '0 * * * *', '30 2 * * 1-5']
+
+    start = monotonic()
+    for idx in range(num_jobs):
+        name = 'job.{}'.format(idx)
+
+        if idx % 4:
+            job = Job(idx, name, SCHEDULER.JOB_TYPE.INTERVAL_BASED, Interval(seconds=1 + idx % 10), start_time=start_time,
+                max_repeats=1000 if idx % 10 == 1 else None)
+        else:
+            cron_definition = cron_definitions[idx % len(cron_definitions)]
+            job = Job(idx, name, SCHEDULER.JOB_TYPE.CRON_STYLE, get_cron_interval(cron_definition),
+                cron_definition=cron_definition)
+
+        scheduler.create(job)
+
+    startup_time = monotonic() - start
+
+    print('Loaded {} old jobs in {:.3f}s ({:.2f} us/job), {} in the heap'.format(
+        num_jobs, startup_time, startup_time / num_jobs * 10**6, len(scheduler.heap)))
+
+# ################################################################################################################################
+
+def run(num_jobs, run_time):
+
+    scheduler = get_scheduler()
+    # Leaves enough time for all the jobs to be scheduled before the first one is due
+    start_time = datetime.utcnow() + timedelta(seconds=5 + num_jobs // 20000)
+
+    rss_before = get_max_rss()
+
+    # Jobs with intervals of 1 to 10 minutes, with their start times evenly spread over run_time seconds
+    jobs = []
+    step = run_time * 10**6 // num_jobs
+    for idx in range(num_jobs):
+        job = Job(idx, 'job.{}'.format(idx), SCHEDULER.JOB_TYPE.INTERVAL_BASED, Interval(in_seconds=60 * (1 + idx % 10)),
+            start_time=start_time + timedelta(microseconds=idx * step))
+        jobs.append(job)
+
+    rss_jobs = get_max_rss()
+
+    start = monotonic()
+    for job in jobs:
+        scheduler.create(job)
+    create_time = monotonic() - start
+
+    print('Scheduled {} jobs in {:.3f}s ({:.2f} us/job), RSS - jobs:+{:.1f} MB, scheduler:+{:.1f} MB'.format(
+        num_jobs, create_time, create_time / num_jobs * 10**6, rss_jobs - rss_before, get_max_rss() - rss_jobs))
+
+    # Stop the dispatcher once all the jobs ran once
+    stop_time = start_time + timedelta(seconds=run_time + 1)
+
+    def iter_cb():
+        if datetime.utcnow() >= stop_time:
+            scheduler.keep_running = False
+
+    scheduler.iter_cb = iter_cb
+    scheduler.dispatch()
+
+    lateness = scheduler.lateness.to_dict()
+    print('Fired {} jobs in {}s, lateness in ms - mean:{:.3f} p50:{} p90:{} p99:{} max:{:.3f}'.format(
+        lateness['count'], run_time, lateness['mean'], lateness['p50'], lateness['p90'], lateness['p99'], lateness['max']))
+
+    # Every other job is deleted and the rest is edited
+    start = monotonic()
+    for idx, job in enumerate(jobs):
+        if idx % 2:
+            scheduler.unschedule(job)
+        else:
+            scheduler.edit(job)
+    edit_time = monotonic() - start
+
+    print('Deleted or edited {} jobs in {:.3f}s ({:.2f} us/job), {} left in the heap'.format(
+        num_jobs, edit_time, edit_time / num_jobs * 10**6, len(scheduler.heap)))
+
+# ################################################################################################################################
+
+if __name__ == '__main__':
+    num_jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    run_time = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    run_startup(num_jobs)
+    run(num_jobs, run_time)
+
+# ################################################################################################################################
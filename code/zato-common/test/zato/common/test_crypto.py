@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from time import sleep as thread_sleep
+from unittest import TestCase
+
+# gevent
+from gevent import sleep, spawn
+
+# Zato
+from zato.common.crypto import CryptoManager, CryptoPool
+
+# ################################################################################################################################
+
+class CryptoPoolTestCase(TestCase):
+
+    def test_inline(self):
+        pool = CryptoPool()
+
+        self.assertEqual(pool.run(sum, [1, 2]), 3)
+        self.assertEqual(pool.run_sized('abc', len, 'abc'), 3)
+        self.assertEqual(pool.run_time.count, 0)
+
+    def test_run(self):
+        pool = CryptoPool(2, min_size=4)
+
+        self.assertEqual(pool.run(sum, [1, 2]), 3)
+        self.assertRaises(ZeroDivisionError, pool.run, divmod, 1, 0)
+
+        # Only data of at least min_size bytes is handed over to the pool
+        self.assertEqual(pool.run_sized('abc', len, 'abc'), 3)
+        self.assertEqual(pool.run_sized('abcd', len, 'abcd'), 4)
+
+        stats = pool.get_stats()
+        self.assertEqual(stats['pending'], 0)
+        self.assertEqual(stats['queue_wait']['count'], 3)
+        self.assertEqual(stats['run_time']['count'], 3)
+
+    def test_hub_not_blocked(self):
+        pool = CryptoPool(1)
+        ticks = []
+
+        def tick():
+            while True:
+                ticks.append(None)
+                sleep(0.01)
+
+        ticker = spawn(tick)
+        sleep(0)
+
+        # The function blocks its own thread only so the ticker greenlet keeps running in the meantime
+        pool.run(thread_sleep, 0.2)
+        ticker.kill()
+
+        self.assertGreater(len(ticks), 5)
+
+# ################################################################################################################################
+
+class CryptoManagerPoolTestCase(TestCase):
+
+    def test_hash_and_encrypt(self):
+        crypto = CryptoManager.from_secret_key(CryptoManager.generate_key())
+        crypto.add_hash_scheme('zato.default', 1000, 32)
+        crypto.pool = CryptoPool(2, min_size=1)
+
+        hashed = crypto.hash_secret('my-password')
+        self.assertTrue(crypto.verify_hash('my-password', hashed))
+        self.assertFalse(crypto.verify_hash('invalid', hashed))
+        self.assertEqual(crypto.decrypt(crypto.encrypt(b'my-data')), 'my-data')
+        self.assertEqual(crypto.pool.run_time.count, 5)
+
+# ################################################################################################################################
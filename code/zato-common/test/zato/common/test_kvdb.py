@@ -95,3 +95,71 @@ class KVDBTestCase(TestCase):
         kvdb.init()
 
         self.assertTrue(isinstance(kvdb.conn, FakeStrictRedis))
+
+# ##############################################################################
+
+class FakePipeline(object):
+    def __init__(self, conn):
+        self.conn = conn
+        self.results = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *ignored_args):
+        pass
+
+    def hget(self, name, key):
+        self.results.append(self.conn.hashes.get(name, {}).get(key))
+
+    def execute(self):
+        self.conn.commands += len(self.results)
+        return self.results
+
+class FakeRedis(object):
+    """ Keeps hashes in a dictionary and counts how many commands were sent.
+    """
+    def __init__(self, hashes):
+        self.hashes = hashes
+        self.commands = 0
+
+    def hget(self, name, key):
+        self.commands += 1
+        return self.hashes.get(name, {}).get(key)
+
+    def scan_iter(self, match):
+        self.commands += 1
+        return [name for name in self.hashes if name.startswith(match[:-1])]
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+class TranslationTestCase(TestCase):
+
+    def test_translate(self):
+        name1 = 'zato:kvdb:data-dict:translation:::sys1:::key1:::value1:::sys2:::key2'
+        name2 = 'zato:kvdb:data-dict:translation:::sys1:::key1:::value2:::sys2:::key2'
+        conn = FakeRedis({name1: {'value2': 'translated1'}, 'zato:other': {'value2': 'other'}})
+
+        kvdb = KVDB(conn)
+        eq_(kvdb.translate('sys1', 'key1', 'value1', 'sys2', 'key2'), 'translated1')
+        eq_(conn.commands, 1)
+
+        kvdb.load_translations()
+        eq_(kvdb.translations, {name1: 'translated1'})
+        commands = conn.commands
+
+        # Once loaded, translations are looked up locally
+        eq_(kvdb.translate('sys1', 'key1', 'value1', 'sys2', 'key2'), 'translated1')
+        eq_(kvdb.translate_many([
+            ('sys1', 'key1', 'value1', 'sys2', 'key2'),
+            ('sys1', 'key1', 'value2', 'sys2', 'key2')], 'default'), ['translated1', 'default'])
+        eq_(conn.commands, commands)
+
+        conn.hashes[name2] = {'value2': 'translated2'}
+        del conn.hashes[name1]
+
+        # Only translations that were changed are read again
+        kvdb.refresh_translations([name1, name2])
+        eq_(kvdb.translations, {name2: 'translated2'})
+        eq_(conn.commands, commands + 2)
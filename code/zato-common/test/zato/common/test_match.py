@@ -327,4 +327,44 @@ class MatcherTestCase(TestCase):
         m.is_allowed('aaa.zxc')
         self.assertEquals(m.is_allowed_cache, {})
 
+# ################################################################################################################################
+
+    def test_get_match_many_patterns(self):
+
+        # More patterns than can be combined into a single regex, some of them with groups of their own
+        config = Bunch({'order':FALSE_TRUE})
+        for idx in range(150):
+            config['my.{}.*'.format(idx)] = True
+            config['my.{}.{{(abc|def)}}.*'.format(idx)] = False
+
+        m = Matcher()
+        m.read_config(config)
+        self.assertGreater(len(m.regexes[True]), 1)
+        self.assertGreater(len(m.regexes[False]), 1)
+
+        self.assertEquals(m.get_match(True, 'my.149.zxc'), 'my.149.*')
+        self.assertEquals(m.get_match(False, 'my.7.def.zxc'), 'my.7.{(abc|def)}.*')
+        self.assertIsNone(m.get_match(False, 'my.7.zxc'))
+        self.assertIsNone(m.get_match(True, 'my.150.zxc'))
+
+        self.assertIs(m.is_allowed('my.7.def.zxc'), True)
+        self.assertIs(m.is_allowed('my.150.zxc'), False)
+
+# ################################################################################################################################
+
+    def test_is_allowed_cache_size(self):
+
+        m = Matcher(cache_size=2)
+        m.read_config(default_config)
+
+        m.is_allowed('aaa.zxc')
+        m.is_allowed('bbb.zxc')
+        m.is_allowed('aaa.zxc')
+        m.is_allowed('ccc.zxc')
+
+        # The least recently used value was evicted
+        self.assertDictEqual(m.is_allowed_cache, {'aaa.zxc':True, 'ccc.zxc':True})
+        self.assertDictEqual(m.is_allowed_cache.get_stats(),
+            {'size':2, 'max_size':2, 'hits':1, 'misses':3, 'evictions':1})
+
 # ################################################################################################################################
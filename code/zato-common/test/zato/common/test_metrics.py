@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from functools import partial
+from unittest import TestCase
+
+# Zato
+from zato.common.util.metrics import Histogram, PhaseTimer
+
+# ################################################################################################################################
+
+class HistogramTestCase(TestCase):
+
+    def test_empty(self):
+        h = Histogram()
+        out = h.to_dict()
+
+        self.assertEqual(out['count'], 0)
+        self.assertIsNone(out['min'])
+        self.assertIsNone(out['max'])
+        self.assertIsNone(out['mean'])
+        self.assertIsNone(out['p50'])
+        self.assertListEqual(out['buckets'], [])
+
+# ################################################################################################################################
+
+    def test_add(self):
+        h = Histogram(buckets=(1, 10, 100))
+
+        for value in (0.5, 2, 3, 50, 500):
+            h.add(value)
+
+        self.assertEqual(h.count, 5)
+        self.assertEqual(h.total, 555.5)
+        self.assertEqual(h.min, 0.5)
+        self.assertEqual(h.max, 500)
+        self.assertListEqual(h.counts, [1, 2, 1, 1])
+
+# ################################################################################################################################
+
+    def test_percentile(self):
+        h = Histogram(buckets=(1, 10, 100))
+
+        for value in range(90):
+            h.add(5)
+
+        for value in range(10):
+            h.add(1000)
+
+        self.assertEqual(h.get_percentile(50), 10)
+        self.assertEqual(h.get_percentile(90), 10)
+        self.assertEqual(h.get_percentile(99), 1000)
+
+        out = h.to_dict()
+        self.assertListEqual(out['buckets'], [[10, 90], ['inf', 10]])
+
+# ################################################################################################################################
+
+    def test_percentile_capped_by_max(self):
+        h = Histogram(buckets=(1, 10, 100))
+        h.add(2)
+
+        # The bucket's upper bound is 10 but no value observed was greater than 2
+        self.assertEqual(h.get_percentile(50), 2)
+
+# ################################################################################################################################
+
+    def test_clear(self):
+        h = Histogram(buckets=(1, 10, 100))
+        h.add(5)
+        h.clear()
+
+        self.assertEqual(h.count, 0)
+        self.assertEqual(h.total, 0)
+        self.assertIsNone(h.min)
+        self.assertIsNone(h.max)
+        self.assertListEqual(h.counts, [0, 0, 0, 0])
+
+# ################################################################################################################################
+
+class PhaseTimerTestCase(TestCase):
+
+    def test_phases(self):
+        clock = partial(next, iter([10.0, 10.5, 12.0]))
+
+        timer = PhaseTimer(_monotonic=clock)
+        timer.mark('config', _monotonic=clock)
+        timer.mark('deploy', _monotonic=clock)
+
+        self.assertEqual(timer.total, 2.0)
+        self.assertEqual(timer.to_string(), 'config:0.500s, deploy:1.500s')
+
+# ################################################################################################################################
@@ -31,8 +31,10 @@ from mock import patch
 
 # Zato
 from zato.common import SCHEDULER
+from zato.common.broker_message import SCHEDULER as SCHEDULER_MSG
 from zato.common.test import is_like_cid, rand_bool, rand_date_utc, rand_int, rand_string
-from zato.scheduler.backend import Interval, Job, Scheduler
+from zato.scheduler.api import Scheduler as SchedulerAPI
+from zato.scheduler.backend import get_cron_interval, Interval, Job, Scheduler, to_timestamp
 
 seed()
 
@@ -456,6 +458,27 @@ class JobStartTimeTestCase(TestCase):
             self.assertEquals(job.max_repeats_reached_at, expected)
             self.assertFalse(job.start_time)
 
+    def test_get_start_time_many_runs_in_past(self):
+        start_time = parse('2017-03-20 19:11:23')
+        self.now = parse('2019-05-13 05:19:37.5')
+
+        with patch('zato.scheduler.backend.datetime', self._datetime):
+
+            # Over 67 million runs in the past, the next one is the closest whole second
+            job = Job(rand_int(), rand_string(), SCHEDULER.JOB_TYPE.INTERVAL_BASED, start_time=start_time,
+                interval=Interval(seconds=1))
+            self.assertEquals(job.start_time, parse('2019-05-13 05:19:38'))
+
+            # A run at exactly now is the next one
+            self.now = parse('2019-05-13 05:19:38')
+            self.assertEquals(job.get_start_time(start_time), self.now)
+
+            # The 100th run is the last one
+            job = Job(rand_int(), rand_string(), SCHEDULER.JOB_TYPE.INTERVAL_BASED, start_time=start_time,
+                interval=Interval(seconds=1), max_repeats=100)
+            self.assertTrue(job.max_repeats_reached)
+            self.assertEquals(job.max_repeats_reached_at, start_time + timedelta(seconds=100))
+
 class SchedulerTestCase(TestCase):
 
     def test_create(self):
@@ -654,62 +677,60 @@ class SchedulerTestCase(TestCase):
         # 1+2+1 = 4
         self.assertEquals(scheduler.lock.called, 4)
 
-    def test_job_greenlets(self):
-
-        data = {'spawned':[], 'stopped': []}
-
-        class FakeGreenlet(object):
-            def __init__(_self, run):
-                _self.run = _self._run = run
+    def test_heap_dispatch(self):
 
-            def kill(_self, *args, **kwargs):
-                data['stopped'].append([_self, args, kwargs])
+        data = {'batches':[]}
 
-        def spawn(scheduler_instance, job, *args, **kwargs):
-            g = FakeGreenlet(job)
-            data['spawned'].append(g)
-            return g
+        def spawn(scheduler_instance, func, batch):
+            data['batches'].append(batch)
 
         with patch('zato.scheduler.backend.Scheduler._spawn', spawn):
 
-            test_wait_time = 0.5
-            job_sleep_time = 10
-            job_max_repeats = 30
+            test_wait_time = 0.3
+            now = datetime.utcnow()
 
-            job1 = Job(rand_int(), 'a', SCHEDULER.JOB_TYPE.INTERVAL_BASED, Interval(seconds=0.1), max_repeats=job_max_repeats)
-            job1.wait_sleep_time = job_sleep_time
-
-            job2 = Job(rand_int(), 'b', SCHEDULER.JOB_TYPE.INTERVAL_BASED, Interval(seconds=0.1), max_repeats=job_max_repeats)
-            job2.wait_sleep_time = job_sleep_time
+            job1 = get_job('a', interval_in_seconds=10, start_time=now + timedelta(seconds=0.05))
+            job2 = get_job('b', interval_in_seconds=10, start_time=now + timedelta(hours=1))
 
             scheduler = Scheduler(get_scheduler_config(), None)
-            scheduler.lock = RLock()
             scheduler.iter_cb = iter_cb
             scheduler.iter_cb_args = (scheduler, datetime.utcnow() + timedelta(seconds=test_wait_time))
 
-            scheduler.create(job1)
             scheduler.create(job2)
-            scheduler.run()
+            scheduler.create(job1)
+
+            # Both jobs are in the heap, the one that is to run first is on top
+            self.assertEquals(len(scheduler.heap), 2)
+            self.assertIs(scheduler.heap[0][2], job1)
+            self.assertIs(scheduler.heap_entries['b'][2], job2)
 
-            self.assertEquals(scheduler.job_greenlets[job1.name]._run, job1.run)
-            self.assertEquals(scheduler.job_greenlets[job2.name]._run, job2.run)
+            scheduler.dispatch()
 
-            self.assertTrue(job1.keep_running)
-            self.assertTrue(job2.keep_running)
+            # Only job1 was due - it was fired once, in a batch of its own, and scheduled to run again
+            self.assertEquals(len(data['batches']), 1)
+            callback, ctx = data['batches'][0][0]
+
+            self.assertEquals(len(data['batches'][0]), 1)
+            self.assertEquals(callback, scheduler.on_job_executed)
+            self.assertEquals(ctx['name'], 'a')
+            self.assertEquals(ctx['current_run'], 1)
+            self.assertEquals(scheduler.heap_entries['a'][0], to_timestamp(job1.start_time) + 10)
+            self.assertEquals(scheduler.lateness.count, 1)
 
             scheduler.unschedule(job1)
 
+            # The job's entry is only marked as deleted ..
             self.assertFalse(job1.keep_running)
-            self.assertTrue(job2.keep_running)
+            self.assertNotIn('a', scheduler.heap_entries)
+            self.assertEquals(len(scheduler.heap), 2)
+            self.assertEquals(scheduler.heap_deleted, 1)
 
-            self.assertNotIn(job1.name, scheduler.job_greenlets)
-            self.assertEquals(scheduler.job_greenlets[job2.name]._run, job2.run)
+            # .. and it is skipped when its time comes
+            batch = scheduler.get_due_jobs(to_timestamp(now + timedelta(hours=2)))
 
-            self.assertEquals(len(data['stopped']), 1)
-            g, args, kwargs = data['stopped'][0]
-            self.assertIs(g.run.im_func, job1.run.im_func) # That's how we know it was job1 deleted not job2
-            self.assertIs(args, ())
-            self.assertDictEqual(kwargs, {'timeout':2.0, 'block':False})
+            self.assertEquals(len(batch), 1)
+            self.assertEquals(batch[0][1]['name'], 'b')
+            self.assertEquals(scheduler.heap_deleted, 0)
 
     def test_edit(self):
 
@@ -819,3 +840,178 @@ class SchedulerTestCase(TestCase):
 
         for idx, item in enumerate(data['runs']):
             self.assertEquals(data['ctx'][idx], item)
+
+class SchedulerHeapTestCase(TestCase):
+
+    def get_scheduler(self):
+        scheduler = Scheduler(get_scheduler_config(), None)
+        scheduler._spawn = lambda func, *args, **kwargs: func(*args, **kwargs)
+        return scheduler
+
+    def test_get_next_run_time_interval(self):
+        job = Job(rand_int(), 'a', SCHEDULER.JOB_TYPE.INTERVAL_BASED, Interval(seconds=10), start_time=parse('2030-01-01'))
+        run_time = 1000.0
+
+        # Computed from the time the job was to run at, not from the time it actually ran at
+        self.assertEquals(job.get_next_run_time(run_time, 1000.3), 1010.0)
+
+        # Missed runs are skipped
+        self.assertEquals(job.get_next_run_time(run_time, 1035.0), 1040.0)
+
+    def test_get_next_run_time_cron(self):
+        job = Job(rand_int(), 'a', SCHEDULER.JOB_TYPE.CRON_STYLE, CronTab('*/5 * * * *'), cron_definition='*/5 * * * *')
+        run_time = to_timestamp(parse('2030-01-01 10:05:00'))
+        next_run_time = job.get_next_run_time(run_time, run_time + 0.1)
+
+        self.assertAlmostEquals(next_run_time, to_timestamp(parse('2030-01-01 10:10:00')))
+
+    def test_cron_interval_cache(self):
+        interval = get_cron_interval('*/5 * * * *')
+        self.assertIs(get_cron_interval('*/5 * * * *'), interval)
+
+        # Times before the next match reuse the previous result
+        self.assertEquals(interval.next(parse('2030-01-01 10:01:00')), 240)
+        interval.crontab = None
+        self.assertEquals(interval.next(parse('2030-01-01 10:03:30')), 90)
+
+        interval.crontab = CronTab('*/5 * * * *')
+        self.assertEquals(interval.next(parse('2030-01-01 10:05:00')), 300)
+
+    def test_get_due_jobs(self):
+        scheduler = self.get_scheduler()
+        now = datetime.utcnow()
+        now_ts = to_timestamp(now)
+
+        job1 = get_job('job1', 10, now - timedelta(seconds=1))
+        job2 = get_job('job2', 10, now + timedelta(seconds=5))
+        job3 = get_job('job3', 10, now - timedelta(seconds=2), max_repeats=1)
+
+        # Overrides start times computed by the jobs themselves
+        for job, start_time in ((job1, now - timedelta(seconds=1)), (job3, now - timedelta(seconds=2))):
+            job.start_time = start_time
+
+        for job in job1, job2, job3:
+            scheduler.create(job)
+
+        batch = scheduler.get_due_jobs(now_ts)
+        self.assertListEqual([ctx['name'] for _, ctx in batch], ['job3', 'job1'])
+
+        # job1 will run again, job3 reached its max_repeats and is not active anymore
+        self.assertAlmostEquals(scheduler.heap_entries['job1'][0], now_ts + 9)
+        self.assertNotIn('job3', scheduler.heap_entries)
+        self.assertFalse(job3.is_active)
+        self.assertEquals(scheduler.lateness.count, 2)
+
+        self.assertEquals(scheduler.get_wait_time(now_ts), scheduler.sleep_time)
+        self.assertListEqual(scheduler.get_due_jobs(now_ts + 4), [])
+
+    def test_edit_delete(self):
+        scheduler = self.get_scheduler()
+        now = datetime.utcnow()
+
+        job1 = get_job('job1', 10, now + timedelta(seconds=1))
+        scheduler.create(job1)
+
+        job2 = get_job('job2', 10, now + timedelta(seconds=1))
+        job2.old_name = 'job1'
+        scheduler.edit(job2)
+
+        job3 = get_job('job3', 10, now + timedelta(seconds=1))
+        scheduler.create(job3)
+        scheduler.unschedule(job3)
+
+        self.assertEquals(len(scheduler.heap_entries), 1)
+        self.assertListEqual([ctx['name'] for _, ctx in scheduler.get_due_jobs(to_timestamp(now) + 2)], ['job2'])
+
+    def test_compaction(self):
+        scheduler = self.get_scheduler()
+        start_time = datetime.utcnow() + timedelta(seconds=60)
+
+        for idx in range(10):
+            scheduler.create(get_job('job{}'.format(idx), 10, start_time))
+
+        for idx in range(6):
+            scheduler.unschedule_by_name('job{}'.format(idx))
+
+        # Deleted entries are removed once they are more than a half of the heap
+        self.assertEquals(len(scheduler.heap), 4)
+        self.assertEquals(scheduler.heap_deleted, 0)
+
+    def test_dispatch(self):
+        data = {'runs': []}
+
+        config = get_scheduler_config()
+        config.on_job_executed_cb = data['runs'].append
+
+        scheduler = Scheduler(config, None)
+        scheduler.iter_cb = iter_cb
+        scheduler.iter_cb_args = (scheduler, datetime.utcnow() + timedelta(seconds=0.35))
+
+        job = Job(rand_int(), 'a', SCHEDULER.JOB_TYPE.INTERVAL_BASED, Interval(in_seconds=0.1), start_time=datetime.utcnow())
+        scheduler.create(job)
+        scheduler.dispatch()
+        sleep(0)
+
+        self.assertEquals(len(data['runs']), 4)
+        self.assertListEqual([ctx['current_run'] for ctx in data['runs']], [1, 2, 3, 4])
+
+class SchedulerAPIJobBatchTestCase(TestCase):
+
+    def get_api(self, job_batch_window, job_batch_max_size=1000):
+
+        class _BrokerClient(object):
+            def __init__(self):
+                self.sent = []
+
+            def invoke_async(self, msg):
+                self.sent.append(msg)
+
+        api = SchedulerAPI.__new__(SchedulerAPI)
+        api.broker_client = _BrokerClient()
+        api.job_batch_window = job_batch_window
+        api.job_batch_max_size = job_batch_max_size
+        api.job_batch = []
+
+        return api
+
+    def get_ctx(self, name):
+        return {'name':name, 'cid':rand_string(), 'type':SCHEDULER.JOB_TYPE.INTERVAL_BASED,
+            'cb_kwargs':{'service':'my.service', 'extra':''}}
+
+    def test_batch_window(self):
+        api = self.get_api(0.05)
+
+        for idx in range(3):
+            api.on_job_executed(self.get_ctx('job{}'.format(idx)))
+
+        self.assertListEqual(api.broker_client.sent, [])
+        sleep(0.1)
+
+        self.assertEquals(len(api.broker_client.sent), 1)
+        msg = api.broker_client.sent[0]
+
+        self.assertEquals(msg['action'], SCHEDULER_MSG.JOB_EXECUTED_BATCH.value)
+        self.assertListEqual([job['name'] for job in msg['jobs']], ['job0', 'job1', 'job2'])
+
+        for job in msg['jobs']:
+            self.assertEquals(job['action'], SCHEDULER_MSG.JOB_EXECUTED.value)
+            self.assertTrue(job['fired_at'])
+
+    def test_batch_max_size(self):
+        api = self.get_api(0.05, 2)
+
+        for idx in range(3):
+            api.on_job_executed(self.get_ctx('job{}'.format(idx)))
+
+        # The first batch was full so it was sent right away
+        self.assertEquals(len(api.broker_client.sent), 1)
+        sleep(0.1)
+
+        self.assertListEqual([len(msg['jobs']) for msg in api.broker_client.sent], [2, 1])
+
+    def test_no_batch_window(self):
+        api = self.get_api(0)
+        api.on_job_executed(self.get_ctx('job1'))
+
+        self.assertEquals(len(api.broker_client.sent), 1)
+        self.assertEquals(api.broker_client.sent[0]['action'], SCHEDULER_MSG.JOB_EXECUTED.value)
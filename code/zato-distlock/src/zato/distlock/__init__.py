@@ -11,7 +11,8 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 # stdlib
 import logging
 import os
-from datetime import datetime, timedelta
+from collections import deque
+from datetime import datetime
 from errno import ENOENT
 from hashlib import sha256
 from pwd import getpwuid
@@ -19,16 +20,19 @@ from tempfile import gettempdir
 from threading import current_thread
 
 # gevent
-from gevent import sleep, spawn
+from gevent import spawn_later
+from gevent.event import Event
 
 # portalocker
 from portalocker import lock, LockException, LOCK_NB, LOCK_EX, unlock
 
 # SQLAlchemy
-from sqlalchemy import func
+from sqlalchemy import func, text
+from sqlalchemy.exc import DBAPIError
 
 # Zato
 from zato.common.util import make_repr
+from zato.common.util.metrics import Histogram, monotonic
 
 # ################################################################################################################################
 
@@ -50,6 +54,11 @@ class LOCK_TYPE:
     PERMANENT = 'permanent'
     TRANSIENT = 'transient'
 
+class LOCK_SCOPE:
+    WORKER = 'worker'
+    SERVER = 'server'
+    CLUSTER = 'cluster'
+
 # ################################################################################################################################
 
 class LockTimeout(Exception):
@@ -83,11 +92,112 @@ class LockInfo(object):
 
 # ################################################################################################################################
 
+class LocalWaitQueue(object):
+    """ Greenlets of the current process waiting for locks, by lock IDs. Each time a lock is released, the greenlet that has
+    waited for it the longest is woken up so that it can try to acquire the lock straightaway. Locks released in other
+    processes are not known about here, which is why waiting greenlets also wake up on their own after a timeout.
+    """
+    def __init__(self):
+        self.waiters = {}
+
+        # IDs of locks currently held by LocalLock objects
+        self.held = set()
+
+    def wait(self, priv_id, timeout):
+        """ Waits until a lock is released in this process or until timeout seconds elapse. Returns True in the former case.
+        """
+        event = Event()
+        waiters = self.waiters.setdefault(priv_id, deque())
+        waiters.append(event)
+
+        try:
+            return event.wait(timeout)
+        finally:
+            if not event.is_set():
+                waiters.remove(event)
+            if not waiters:
+                self.waiters.pop(priv_id, None)
+
+    def notify(self, priv_id):
+        waiters = self.waiters.get(priv_id)
+        if waiters:
+            waiters.popleft().set()
+
+# ################################################################################################################################
+
+class NameStats(object):
+    """ Statistics of locks of a given name.
+    """
+    __slots__ = ('acquired', 'timeouts', 'wait_time', 'hold_time')
+
+    def __init__(self):
+        self.acquired = 0
+        self.timeouts = 0
+
+        # How long it took to acquire locks and how long they were held for, in milliseconds
+        self.wait_time = Histogram()
+        self.hold_time = Histogram()
+
+# ################################################################################################################################
+
+class LockStats(object):
+    """ Per-name statistics of locks from a given LockManager. Lock names can be built out of arbitrary data so, to keep
+    memory usage in check, statistics of names above max_names are all gathered under a common name.
+    """
+    other_name = '<other>'
+
+    def __init__(self, max_names=1000):
+        self.max_names = max_names
+        self.stats = {}
+
+    def _get(self, name):
+        stats = self.stats.get(name)
+
+        if not stats:
+            if len(self.stats) >= self.max_names:
+                name = self.other_name
+                stats = self.stats.get(name)
+
+            if not stats:
+                stats = self.stats[name] = NameStats()
+
+        return stats
+
+    def on_acquired(self, name, wait_time):
+        stats = self._get(name)
+        stats.acquired += 1
+        stats.wait_time.add(wait_time * 1000)
+
+    def on_timeout(self, name):
+        self._get(name).timeouts += 1
+
+    def on_released(self, name, hold_time):
+        self._get(name).hold_time.add(hold_time * 1000)
+
+    def get_stats(self, name=None):
+        out = []
+
+        for _name, stats in sorted(self.stats.items()):
+            if name and _name != name:
+                continue
+
+            out.append({
+                'name': _name,
+                'acquired': stats.acquired,
+                'timeouts': stats.timeouts,
+                'wait_time': stats.wait_time.to_dict(),
+                'hold_time': stats.hold_time.to_dict(),
+            })
+
+        return out
+
+# ################################################################################################################################
+
 class Lock(object):
     """ Base class for all backend-specific locks.
     """
-    def __init__(self, os_user_name, session, namespace, name, ttl, block, block_interval, _permanent=LOCK_TYPE.PERMANENT,
-            _transient=LOCK_TYPE.TRANSIENT):
+    def __init__(self, os_user_name, session, namespace, name, ttl, block, block_interval, waiters=None, stats=None,
+            _permanent=LOCK_TYPE.PERMANENT, _transient=LOCK_TYPE.TRANSIENT):
         self.os_user_name = os_user_name
         self.session = session() if session else None
         self.namespace = namespace
@@ -100,20 +210,43 @@ class Lock(object):
         self.released = False
         self.block = block
         self.block_interval = block_interval
+        self.waiters = waiters or LocalWaitQueue()
+        self.stats = stats or LockStats()
+        self.ttl_timer = None
+        self.acquired_at = None
 
     def _acquire_impl(self, *args, **kwargs):
         raise NotImplementedError('Must be implemented in subclasses')
 
+    def _wait_impl(self, timeout):
+        """ Waits for up to timeout seconds for the lock to be released and returns True if it could be acquired then.
+        Subclasses whose backends can block until a lock is released override it to wait in the backend itself.
+        """
+        self.waiters.wait(self.priv_id, min(self.block_interval, timeout))
+        return self._acquire_impl()
+
 # ################################################################################################################################
 
-    def __enter__(self, pub_hash_func=sha256, _permanent=LOCK_TYPE.PERMANENT):
+    def __enter__(self, pub_hash_func=sha256, _permanent=LOCK_TYPE.PERMANENT, _monotonic=monotonic):
 
         # Compute lock_id in PostgreSQL's internal format which is a 64-bit integer (bigint)
         self.priv_id = str(hash('{}{}'.format(self.namespace, self.name)))
         self.pub_id = pub_hash_func(self.priv_id.encode('utf8')).hexdigest()
 
         # Try to acquire the lock
-        self.acquired = self._acquire()
+        start = _monotonic()
+
+        try:
+            self.acquired = self._acquire()
+        except LockTimeout:
+            self.stats.on_timeout(self.name)
+            raise
+
+        if self.acquired:
+            self.acquired_at = _monotonic()
+            self.stats.on_acquired(self.name, self.acquired_at - start)
+        else:
+            self.stats.on_timeout(self.name)
 
         # If it was acquired and we are a permanent lock we need to start a background task
         # to keep the lock around for as long as ttl or (if we are called through `with`)
@@ -128,28 +261,25 @@ class Lock(object):
 
 # ################################################################################################################################
 
-    def _acquire(self, _utcnow=datetime.utcnow, _has_debug=has_debug):
+    def _acquire(self, _monotonic=monotonic, _has_debug=has_debug):
         """ Try to acquire a lock by its ID. If not possible and block is not False
-        sleep for that many seconds as block points to.
+        wait for up to that many seconds as block points to.
         """
         acquired = self._acquire_impl()
 
         # Ok, we do not have the lock. If configured to, let's wait until we can obtain one or we time out.
 
         _block = self.block
-        _block_interval = self.block_interval
 
         if _block and not acquired:
 
-            now = _utcnow()
-            until = now + timedelta(seconds=_block)
+            until = _monotonic() + _block
 
-            while now < until:
-                sleep(_block_interval)
-                acquired = self._acquire_impl()
-                if acquired:
+            while not acquired:
+                remaining = until - _monotonic()
+                if remaining <= 0:
                     break
-                now = _utcnow()
+                acquired = self._wait_impl(remaining)
 
             if not acquired:
                 msg = 'Could not obtain lock for `{}` `{}` within {}s'.format(self.namespace, self.name, _block)
@@ -163,28 +293,34 @@ class Lock(object):
 
 # ################################################################################################################################
 
-    def _wait_in_greenlet(self, _utcnow=datetime.utcnow, _timedelta=timedelta):
-        """ Sleeps until self.ttl is reached or until the lock is released and then releases the lock if it is still held.
+    def _on_ttl(self):
+        """ Releases the lock once self.ttl is reached, unless it has been released already.
         """
-        now = _utcnow()
-        until = now + _timedelta(seconds=self.ttl)
+        self.ttl_timer = None
+        self.release()
 
-        while now < until:
-            if self.released:
-                break
-            now = _utcnow()
-            sleep(0.1)
+# ################################################################################################################################
 
-        if not self.released:
-            self.release()
+    def _sustain(self):
+        """ Starts a timer that will sustain the lock for at least self.ttl,
+        possibly less if self.__exit__ is called earlier, in which case the timer is cancelled.
+        """
+        self.ttl_timer = spawn_later(self.ttl, self._on_ttl)
 
 # ################################################################################################################################
 
-    def _sustain(self):
-        """ Spawns a greenlet that will sustain the lock for at least self.ttl,
-        possibly less if self.__exit__ is called earlier.
+    def _on_released(self, _monotonic=monotonic):
+        """ Cancels the TTL timer, if any, and wakes up a greenlet from this process waiting for the lock, if there is one.
         """
-        spawn(self._wait_in_greenlet)
+        if self.acquired_at:
+            self.stats.on_released(self.name, _monotonic() - self.acquired_at)
+            self.acquired_at = None
+
+        if self.ttl_timer:
+            self.ttl_timer.kill(block=False)
+            self.ttl_timer = None
+
+        self.waiters.notify(self.priv_id)
 
 # ################################################################################################################################
 
@@ -204,6 +340,7 @@ class SQLLock(Lock):
 
             self.session.execute(self._release_func(self.priv_id))
             self.released = True
+            self._on_released()
 
             if _has_debug:
                 logger.debug('Released %s', self.priv_id)
@@ -221,8 +358,13 @@ class MySQLLock(SQLLock):
     _acquire_func = func.get_lock
     _release_func = func.release_lock
 
-    def _acquire_impl(self):
-        return self.session.execute(self._acquire_func(self.priv_id, 0)).scalar()
+    def _acquire_impl(self, timeout=0):
+        return self.session.execute(self._acquire_func(self.priv_id, timeout)).scalar()
+
+    def _wait_impl(self, timeout):
+        """ Waits in MySQL itself, which accepts timeouts in whole seconds only.
+        """
+        return self._acquire_impl(max(int(timeout), 1))
 
 # ################################################################################################################################
 
@@ -230,11 +372,28 @@ class PostgresSQLLock(SQLLock):
     """ Distributed locks based on PostgreSQL.
     """
     _acquire_func = func.pg_try_advisory_lock
+    _acquire_blocking_func = func.pg_advisory_lock
     _release_func = func.pg_advisory_unlock
 
     def _acquire_impl(self):
         return self.session.execute(self._acquire_func(self.priv_id)).scalar()
 
+    def _wait_impl(self, timeout):
+        """ Waits in PostgreSQL itself, with lock_timeout limiting how long it may take.
+        """
+        self.session.execute(text('SET LOCAL lock_timeout = {}'.format(max(int(timeout * 1000), 1))))
+
+        try:
+            self.session.execute(self._acquire_blocking_func(self.priv_id))
+        except DBAPIError:
+
+            # The statement timed out, which aborted the transaction, but advisory locks are not transactional
+            # so nothing else is rolled back along with it.
+            self.session.rollback()
+            return False
+        else:
+            return True
+
 # ################################################################################################################################
 
 class FCNTLLock(Lock):
@@ -289,6 +448,7 @@ user={}
 
             unlock(self.tmp_file)
             self.tmp_file.close()
+            self._on_released()
 
             if _has_debug:
                 logger.debug('Unlocked file %s', self.tmp_file_name)
@@ -310,14 +470,35 @@ user={}
 
 # ################################################################################################################################
 
+class LocalLock(Lock):
+    """ A lock held only within the current process, e.g. among greenlets of a single server worker.
+    Acquiring and releasing it takes no I/O at all.
+    """
+    def _acquire_impl(self):
+        if self.priv_id in self.waiters.held:
+            return False
+        else:
+            self.waiters.held.add(self.priv_id)
+            return True
+
+    def release(self):
+        if self.acquired and not self.released:
+            self.waiters.held.discard(self.priv_id)
+            self.released = True
+            self._on_released()
+
+# ################################################################################################################################
+
 class LockManager(object):
     """ A distributed lock manager based on SQL or, if only IPC is needed, on fcntl.
+    Locks that need to be held within the current process only are kept in memory.
     """
     _lock_impl = {
         'postgresql+pg8000': PostgresSQLLock,
         'oracle': OracleLock,
         'mysql+pymysql': MySQLLock,
         'fcntl': FCNTLLock,
+        'local': LocalLock,
         }
 
     def __init__(self, backend_type, default_namespace, session=None):
@@ -327,6 +508,10 @@ class LockManager(object):
         self._lock_class = self._lock_impl[backend_type]
         self.user_name = getpwuid(os.getuid()).pw_name
 
+        # Shared by all locks from this manager so that waiting for a lock released in this process takes no polling
+        self.waiters = LocalWaitQueue()
+        self.stats = LockStats()
+
     def __call__(self, name, namespace='', ttl=DEFAULT.TTL, block=DEFAULT.BLOCK, block_interval=DEFAULT.BLOCK_INTERVAL,
             max_len_ns=MAX.LEN_NS, max_len_name=MAX.LEN_NAME):
 
@@ -341,7 +526,8 @@ class LockManager(object):
             raise ValueError(msg)
 
         return self._lock_class(
-            self.user_name, self.session, namespace or self.default_namespace, name, ttl, block, block_interval)
+            self.user_name, self.session, namespace or self.default_namespace, name, ttl, block, block_interval, self.waiters,
+            self.stats)
 
     def acquire(self, *args, **kwargs):
         return self(*args, **kwargs).acquire()
@@ -10,10 +10,11 @@ Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
 from unittest import TestCase
 
 # gevent
-from gevent import sleep
+from gevent import sleep, spawn_later
 
 # Zato
 from zato.common.test import rand_int, rand_string
+from zato.common.util.metrics import monotonic
 from zato.distlock import DEFAULT, LockManager, LockTimeout, LOCK_TYPE
 
 # ################################################################################################################################
@@ -162,6 +163,34 @@ class _Base(TestCase):
         else:
             self.fail('Expected a LockTimeout here')
 
+# ################################################################################################################################
+
+    def test_acquire_already_taken_woken_on_release(self):
+
+        if not self.is_set_up:
+            return
+
+        name = rand_string()
+        default_ns = rand_string()
+
+        lock_manager = LockManager(self.backend_type, default_ns)
+
+        lock1 = lock_manager.acquire(name, ttl=10)
+        self.assertEquals(lock1.acquired, True)
+
+        # The lock is released soon after we start to wait for it and we are woken up right then
+        # rather than after block_interval, which is much longer.
+        spawn_later(0.1, lock1.release)
+
+        start = monotonic()
+        lock2 = lock_manager.acquire(name, block=10, block_interval=5)
+
+        self.assertEquals(lock2.acquired, True)
+        self.assertLess(monotonic() - start, 1)
+
+        lock2.release()
+        self.assertIsNone(lock2.lock.ttl_timer)
+
 # ################################################################################################################################
 
 class FCNTLLockTestCase(_Base):
@@ -170,6 +199,47 @@ class FCNTLLockTestCase(_Base):
     def setUp(self):
         self.is_set_up = True
 
+    def test_server_namespaces(self):
+        # Lock files are shared by all the servers on the same host so SERVER-scope locks of each server are in a namespace
+        # of their own - a lock of the same name held by one server does not block another one.
+        lock_manager1 = LockManager(self.backend_type, 'zato-1-server1')
+        lock_manager2 = LockManager(self.backend_type, 'zato-1-server2')
+        name = rand_string()
+
+        with lock_manager1(name) as lock1:
+            self.assertTrue(lock1.acquired)
+
+            with lock_manager2(name, block=0.01) as lock2:
+                self.assertTrue(lock2.acquired)
+                self.assertNotEqual(lock1.pub_id, lock2.pub_id)
+
+            # The same server still cannot obtain its own lock twice
+            self.assertRaises(LockTimeout, lock_manager1.acquire, name, block=0.01, block_interval=0.01)
+
+# ################################################################################################################################
+
+class LocalLockTestCase(_Base):
+    backend_type = 'local'
+
+    def setUp(self):
+        self.is_set_up = True
+
+    def test_stats(self):
+        lock_manager = LockManager(self.backend_type, rand_string())
+
+        with lock_manager('my.lock'):
+            sleep(0.05)
+
+            # The lock is already held so this one times out
+            self.assertRaises(LockTimeout, lock_manager.acquire, 'my.lock', block=0.01, block_interval=0.01)
+
+        stats = lock_manager.stats.get_stats('my.lock')
+        self.assertEquals(len(stats), 1)
+        self.assertEquals(stats[0]['acquired'], 1)
+        self.assertEquals(stats[0]['timeouts'], 1)
+        self.assertEquals(stats[0]['hold_time']['count'], 1)
+        self.assertGreaterEqual(stats[0]['hold_time']['max'], 50)
+
 # ################################################################################################################################
 
 class MySQLLockTestCase(_Base):
@@ -10,16 +10,14 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 # stdlib
 import logging
+from time import time
 from traceback import format_exc
 
-# crontab
-from crontab import CronTab
-
 # dateutil
 from dateutil.parser import parse
 
 # gevent
-from gevent import sleep
+from gevent import sleep, spawn
 
 # Python 2/3 compatibility
 from past.builtins import basestring
@@ -31,7 +29,7 @@ from zato.common import CHANNEL, DATA_FORMAT, SCHEDULER, ZATO_NONE
 from zato.common.broker_message import MESSAGE_TYPE, SCHEDULER as SCHEDULER_MSG, SERVICE, TOPICS
 from zato.common.kvdb import KVDB
 from zato.common.util import new_cid, spawn_greenlet
-from zato.scheduler.backend import Interval, Job, Scheduler as _Scheduler
+from zato.scheduler.backend import get_cron_interval, Interval, Job, Scheduler as _Scheduler
 
 # ################################################################################################################################
 
@@ -68,6 +66,15 @@ class Scheduler(BrokerMessageReceiver):
 
         self.broker_client = BrokerClient(self.broker_conn, 'scheduler', self.broker_callbacks, [])
 
+        # Added in 3.1, hence optional
+        misc = self.config.main.get('misc') or {}
+
+        # Jobs fired within that many seconds of each other are sent to servers in a single message,
+        # unless there are more of them than job_batch_max_size. If it is 0, each job is sent in its own message.
+        self.job_batch_window = float(misc.get('job_batch_window', 0.05))
+        self.job_batch_max_size = int(misc.get('job_batch_max_size', 1000))
+        self.job_batch = []
+
         if run:
             self.serve_forever()
 
@@ -100,13 +107,17 @@ class Scheduler(BrokerMessageReceiver):
             'service': ctx['cb_kwargs']['service'],
             'payload':ctx['cb_kwargs']['extra'],
             'cid':ctx['cid'],
-            'job_type': ctx['type']
+            'job_type': ctx['type'],
+            'fired_at': time(),
         }
 
         if extra_data_format != ZATO_NONE:
             msg['data_format'] = extra_data_format
 
-        self.broker_client.invoke_async(msg)
+        if self.job_batch_window:
+            self.add_to_job_batch(msg)
+        else:
+            self.broker_client.invoke_async(msg)
 
         if _has_debug:
             msg = 'Sent a job execution request, name [{}], service [{}], extra [{}]'.format(
@@ -125,6 +136,46 @@ class Scheduler(BrokerMessageReceiver):
             }
             self.broker_client.publish(msg)
 
+# ################################################################################################################################
+
+    def add_to_job_batch(self, msg):
+        """ Adds a job execution request to the current batch, to be sent out once the batch window elapses
+        or the batch is full, whichever comes first.
+        """
+        self.job_batch.append(msg)
+        len_job_batch = len(self.job_batch)
+
+        if len_job_batch == 1:
+            spawn(self.send_job_batch, self.job_batch_window)
+
+        elif len_job_batch >= self.job_batch_max_size:
+            self.send_job_batch()
+
+    def send_job_batch(self, delay=0):
+        """ Sends to servers all the job execution requests collected in the current batch, if there are any.
+        """
+        if delay:
+            sleep(delay)
+
+        # Another batch may have been started while we were sleeping if the one we were to send was full earlier,
+        # in which case it will be sent a bit earlier than the batch window indicates. This is harmless.
+        batch, self.job_batch = self.job_batch, []
+
+        if not batch:
+            return
+
+        try:
+            self.broker_client.invoke_async({
+                'action': SCHEDULER_MSG.JOB_EXECUTED_BATCH.value,
+                'cid': new_cid(),
+                'jobs': batch,
+            })
+        except Exception:
+            logger.warn('Could not send a batch of %d jobs, e:`%s`', len(batch), format_exc())
+        else:
+            if _has_debug:
+                logger.debug('Sent a batch of %d job execution requests', len(batch))
+
 # ################################################################################################################################
 
     def create_edit(self, action, job_data, **kwargs):
@@ -150,7 +201,7 @@ class Scheduler(BrokerMessageReceiver):
         }
 
         if job_type == SCHEDULER.JOB_TYPE.CRON_STYLE:
-            interval = CronTab(cron_definition)
+            interval = get_cron_interval(cron_definition)
         else:
             interval = Interval(days=days, hours=hours, minutes=minutes, seconds=seconds)
 
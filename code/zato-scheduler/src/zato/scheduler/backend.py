@@ -10,15 +10,19 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 # stdlib
 import datetime
+from heapq import heapify, heappop, heappush
+from itertools import count
 from logging import getLogger
+from time import time
 from traceback import format_exc
 
-# datetime
-from dateutil.rrule import rrule, SECONDLY
+# crontab
+from crontab import CronTab
 
 # gevent
 import gevent # Imported directly so it can be mocked out in tests
 from gevent import lock, sleep
+from gevent.event import Event
 
 # paodate
 from paodate import Delta
@@ -29,6 +33,7 @@ from future.utils import itervalues
 # Zato
 from zato.common import SCHEDULER
 from zato.common.util import add_scheduler_jobs, add_startup_jobs, asbool, make_repr, new_cid, spawn_greenlet
+from zato.common.util.metrics import Histogram
 
 # ################################################################################################################################
 
@@ -38,6 +43,16 @@ logger = getLogger(__name__)
 
 initial_sleep = 30
 
+# For converting datetime objects to seconds since the epoch
+_epoch = datetime.datetime(1970, 1, 1)
+
+# ################################################################################################################################
+
+def to_timestamp(value, _epoch=_epoch):
+    """ Returns a naive UTC datetime object as the number of seconds since the epoch.
+    """
+    return (value - _epoch).total_seconds()
+
 # ################################################################################################################################
 
 class Interval(object):
@@ -58,6 +73,59 @@ class Interval(object):
 
 # ################################################################################################################################
 
+class CronInterval(object):
+    """ A parsed cron definition, shared by all the jobs that use the same one. Remembers the most recent result of .next
+    so that jobs with the same definition that compute their next run at roughly the same time, e.g. when the scheduler
+    starts or after they have all been fired together, do not need to go through the definition again.
+    """
+    __slots__ = ('definition', 'crontab', 'last_from', 'last_next')
+
+    def __init__(self, definition):
+        self.definition = definition
+        self.crontab = CronTab(definition)
+        self.last_from = None
+        self.last_next = None
+
+    def next(self, now, _timedelta=datetime.timedelta):
+        """ Returns the number of seconds from now until the definition next matches, just like CronTab.next does.
+        """
+        # There are no matches between last_from and last_next so the next one for any time in between is still last_next.
+        if self.last_from is not None and self.last_from <= now < self.last_next:
+            return (self.last_next - now).total_seconds()
+
+        delay = self.crontab.next(now)
+
+        self.last_from = now
+        self.last_next = now + _timedelta(seconds=delay)
+
+        return delay
+
+# ################################################################################################################################
+
+class CronIntervalCache(object):
+    """ Keeps parsed cron definitions by their expressions.
+    """
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self.cache = {}
+
+    def get(self, definition):
+        interval = self.cache.get(definition)
+        if interval is None:
+
+            # Definitions no longer used by any job are not tracked so everything starts anew if there are too many of them
+            if len(self.cache) >= self.max_size:
+                self.cache.clear()
+
+            interval = self.cache[definition] = CronInterval(definition)
+
+        return interval
+
+cron_interval_cache = CronIntervalCache()
+get_cron_interval = cron_interval_cache.get
+
+# ################################################################################################################################
+
 class Job(object):
     def __init__(self, id, name, type, interval, start_time=None, callback=None, cb_kwargs=None, max_repeats=None,
             on_max_repeats_reached_cb=None, is_active=True, clone_start_time=False, cron_definition=None, old_name=None):
@@ -162,9 +230,7 @@ class Job(object):
             return first_run_time
 
         else:
-            runs = rrule(SECONDLY, interval=int(self.interval.in_seconds), dtstart=start_time, count=self.max_repeats)
-            last_run_time = runs.before(now)
-            next_run_time = last_run_time + interval
+            next_run_time = start_time + interval * self.get_runs_before(start_time, now)
 
             if next_run_time >= now:
                 return next_run_time
@@ -185,6 +251,24 @@ class Job(object):
                     'Cannot compute start_time. Job `%s` max repeats reached at `%s` (UTC)',
                     self.name, self.max_repeats_reached_at)
 
+    def get_runs_before(self, start_time, now):
+        """ Returns how many times the job has already run between start_time and now, i.e. how many of its runs, the first one
+        being at start_time itself, fall strictly before now, up to max_repeats if it is set. This is computed arithmetically
+        rather than by going through each of the runs because a job with a short interval that was created a long time ago
+        may have tens of millions of them.
+        """
+        in_seconds = self.interval.in_seconds
+        elapsed = (now - start_time).total_seconds()
+
+        runs = int(elapsed // in_seconds) + 1
+
+        # A run at exactly now has not taken place yet. The check is on datetime objects rather than on floats
+        # so that it is not affected by rounding.
+        if start_time + datetime.timedelta(seconds=in_seconds * (runs - 1)) >= now:
+            runs -= 1
+
+        return min(runs, self.max_repeats) if self.max_repeats else runs
+
     def get_context(self):
         ctx = {
             'cid':new_cid(),
@@ -214,6 +298,28 @@ class Job(object):
         else:
             raise ValueError('Unsupported job type `{}` ({})'.format(self.type, self.name))
 
+    def get_next_run_time(self, run_time, now):
+        """ Returns the time the job should run at after the one it was scheduled for at run_time, all of them in seconds
+        since the epoch (UTC). For interval-based jobs, it is computed from run_time rather than from the time the job actually
+        ran at so that delays in firing jobs do not accumulate. Any runs that were missed altogether, e.g. because
+        the scheduler was busy, are skipped.
+        """
+        if self.type == SCHEDULER.JOB_TYPE.INTERVAL_BASED:
+            in_seconds = self.interval.in_seconds
+            next_run_time = run_time + in_seconds
+
+            if next_run_time <= now and in_seconds > 0:
+                next_run_time += ((now - next_run_time) // in_seconds + 1) * in_seconds
+
+            return next_run_time
+
+        elif self.type == SCHEDULER.JOB_TYPE.CRON_STYLE:
+            now = max(run_time, now)
+            return now + self.interval.next(datetime.datetime.utcfromtimestamp(now))
+
+        else:
+            raise ValueError('Unsupported job type `{}` ({})'.format(self.type, self.name))
+
     def _spawn(self, *args, **kwargs):
         """ A thin wrapper so that it is easier to mock this method out in unit-tests.
         """
@@ -292,6 +398,10 @@ class Job(object):
 # ################################################################################################################################
 
 class Scheduler(object):
+    """ Keeps all active jobs in a single min-heap ordered by the time each of them is to run at next. One dispatcher greenlet
+    pops jobs whose time has come and fires them in batches. Deleting a job only marks its heap entry as no longer valid
+    so that creating, editing and deleting jobs are all O(log n) operations.
+    """
     def __init__(self, config, api):
         self.config = config
         self.api = api
@@ -299,10 +409,9 @@ class Scheduler(object):
         self.startup_jobs = config.startup_jobs
         self.odb = config.odb
         self.jobs = {}
-        self.job_greenlets = {}
         self.keep_running = True
         self.lock = lock.RLock()
-        self.sleep_time = 0.1
+        self.sleep_time = 0.1 # Dispatcher never sleeps longer than that so it notices any changes to the system clock quickly
         self.iter_cb = None
         self.iter_cb_args = ()
         self.ready = False
@@ -310,6 +419,19 @@ class Scheduler(object):
         self._add_scheduler_jobs = config._add_scheduler_jobs
         self.job_log = getattr(logger, config.job_log_level)
 
+        # Entries are [run_time, seq, job] lists, run_time is in seconds since the epoch (UTC)
+        # and job is set to None when the entry is deleted
+        self.heap = []
+        self.heap_seq = count()
+        self.heap_entries = {} # Job name -> its entry in the heap
+        self.heap_deleted = 0  # How many entries are deleted but still in the heap
+
+        # Set each time the dispatcher needs to re-check which job is to run next
+        self.wakeup = Event()
+
+        # How late, in milliseconds, jobs were fired compared to the time they were to run at
+        self.lateness = Histogram()
+
     def on_max_repeats_reached(self, job):
         with self.lock:
             job.is_active = False
@@ -321,7 +443,7 @@ class Scheduler(object):
             self.jobs[job.name] = job
             if job.is_active:
                 if spawn:
-                    self.spawn_job(job)
+                    self.schedule_job(job)
                     self.job_log('Job scheduled `%s` (%s, start: %s UTC)', job.name, job.type, job.start_time)
 
             else:
@@ -349,13 +471,12 @@ class Scheduler(object):
         found = False
         job.keep_running = False
 
-        if name in self.jobs.iterkeys():
+        if name in self.jobs:
             del self.jobs[name]
             found = True
 
-        if name in self.job_greenlets.keys():
-            self.job_greenlets[name].kill(block=False, timeout=2.0)
-            del self.job_greenlets[name]
+        if name in self.heap_entries:
+            self._delete_heap_entry(self.heap_entries.pop(name))
             found = True
 
         return found
@@ -400,10 +521,12 @@ class Scheduler(object):
         """ Stops all jobs and the scheduler itself.
         """
         with self.lock:
-            jobs = sorted(self.jobs)
-            for job in jobs:
+            for job in sorted(itervalues(self.jobs)):
                 self._unschedule_stop(job.clone(), 'stopped')
 
+            self.keep_running = False
+            self.wakeup.set()
+
     def sleep(self, value):
         """ A method introduced so the class is easier to mock out in tests.
         """
@@ -433,12 +556,133 @@ class Scheduler(object):
         """
         return spawn_greenlet(*args, **kwargs)
 
-    def spawn_job(self, job):
-        """ Spawns a job's greenlet. Must be called with self.lock held.
+# ################################################################################################################################
+
+    def _push(self, job, run_time, _heappush=heappush):
+        """ Adds a job to the heap. Must be called with self.lock held.
+        """
+        entry = [run_time, next(self.heap_seq), job]
+        self.heap_entries[job.name] = entry
+        _heappush(self.heap, entry)
+
+        # The dispatcher may be sleeping until a later time than what this job needs
+        if self.heap[0] is entry:
+            self.wakeup.set()
+
+    def _delete_heap_entry(self, entry):
+        """ Marks an entry as deleted, removing all such entries from the heap if they are more than a half of it.
+        Must be called with self.lock held.
+        """
+        entry[2] = None
+        self.heap_deleted += 1
+
+        if self.heap_deleted > len(self.heap) // 2:
+            self.heap = [elem for elem in self.heap if elem[2] is not None]
+            heapify(self.heap)
+            self.heap_deleted = 0
+
+    def schedule_job(self, job):
+        """ Adds a job to the heap so that it is run at its start time. Must be called with self.lock held.
         """
         job.callback = self.on_job_executed
         job.on_max_repeats_reached_cb = self.on_max_repeats_reached
-        self.job_greenlets[job.name] = self._spawn(job.run)
+
+        if not job.start_time:
+            logger.warn('Job `%s` cannot start without start_time set', job.name)
+            return
+
+        self._push(job, to_timestamp(job.start_time))
+
+# ################################################################################################################################
+
+    def _on_job_due(self, job, run_time, now):
+        """ Updates the state of a job that is about to be fired and schedules its next run, if there is any.
+        Returns context that the job's callback is to be invoked with. Must be called with self.lock held.
+        """
+        job.current_run += 1
+
+        # Perhaps we've already been executed enough times
+        if job.max_repeats and job.current_run == job.max_repeats:
+            job.keep_running = False
+            job.max_repeats_reached = True
+            job.max_repeats_reached_at = datetime.datetime.utcfromtimestamp(now)
+
+            if job.on_max_repeats_reached_cb:
+                job.on_max_repeats_reached_cb(job)
+
+        ctx = job.get_context()
+
+        if job.keep_running and job.type != SCHEDULER.JOB_TYPE.ONE_TIME:
+            self._push(job, job.get_next_run_time(run_time, now))
+
+        return ctx
+
+    def get_due_jobs(self, now, _heappop=heappop):
+        """ Pops all jobs that are to be run at or before now, in seconds since the epoch (UTC), and returns a list
+        of (callback, ctx) pairs to fire them with.
+        """
+        batch = []
+
+        with self.lock:
+            heap = self.heap
+
+            while heap and heap[0][0] <= now:
+                run_time, _, job = _heappop(heap)
+
+                # The job was deleted or edited after this entry was added
+                if job is None:
+                    self.heap_deleted -= 1
+                    continue
+
+                del self.heap_entries[job.name]
+
+                try:
+                    batch.append((job.callback, self._on_job_due(job, run_time, now)))
+                except Exception:
+                    logger.warn('Could not fire job `%s`, e:`%s`', job.name, format_exc())
+                else:
+                    self.lateness.add((now - run_time) * 1000)
+
+        return batch
+
+    def get_wait_time(self, now):
+        """ Returns for how many seconds the dispatcher may sleep before the next job is due.
+        """
+        with self.lock:
+            if not self.heap:
+                return self.sleep_time
+            return max(0, min(self.sleep_time, self.heap[0][0] - now))
+
+    def fire_batch(self, batch):
+        for callback, ctx in batch:
+            try:
+                callback(ctx)
+            except Exception:
+                logger.warn('Could not execute job `%s`, e:`%s`', ctx['name'], format_exc())
+
+    def dispatch(self):
+        """ The scheduler's main loop, fires jobs whose time has come. Each batch of jobs due at the same time
+        is fired in its own greenlet.
+        """
+        _time = time
+        _wakeup = self.wakeup
+
+        while self.keep_running:
+
+            # Cleared before computing the wait time so that no job added in the meantime is missed
+            _wakeup.clear()
+            now = _time()
+
+            batch = self.get_due_jobs(now)
+            if batch:
+                self._spawn(self.fire_batch, batch)
+
+            if self.iter_cb:
+                self.iter_cb(*self.iter_cb_args)
+
+            _wakeup.wait(self.get_wait_time(now if not batch else _time()))
+
+# ################################################################################################################################
 
     def init_jobs(self):
         sleep(initial_sleep) # To make sure that at least one server is running if the environment was started from quickstart scripts
@@ -458,26 +702,19 @@ class Scheduler(object):
             # Add default jobs to the ODB and start all of them, the default and user-defined ones
             self.init_jobs()
 
-            _sleep = self.sleep
-            _sleep_time = self.sleep_time
-
             with self.lock:
                 for job in sorted(itervalues(self.jobs)):
                     if job.max_repeats_reached:
                         logger.info('Job `%s` already reached max runs count (%s UTC)', job.name, job.max_repeats_reached_at)
-                    else:
-                        self.spawn_job(job)
+                    elif job.is_active and job.name not in self.heap_entries:
+                        self.schedule_job(job)
 
             # Ok, we're good now.
             self.ready = True
 
             logger.info('Scheduler started')
 
-            while self.keep_running:
-                _sleep(_sleep_time)
-
-                if self.iter_cb:
-                    self.iter_cb(*self.iter_cb_args)
+            self.dispatch()
 
         except Exception:
             logger.warn(format_exc())
@@ -41,22 +41,24 @@ from zato.common import DATA_FORMAT, default_internal_modules, KVDB, SECRETS, SE
      ZATO_ODB_POOL_NAME
 from zato.common.audit import audit_pii
 from zato.common.broker_message import HOT_DEPLOY, MESSAGE_TYPE, TOPICS
+from zato.common.crypto import CryptoPool
 from zato.common.ipc.api import IPCAPI
 from zato.common.zato_keyutils import KeyUtils
 from zato.common.pubsub import SkipDelivery
 from zato.common.util import absolutize, get_config, get_kvdb_config_for_log, get_user_config_name, hot_deploy, \
      invoke_startup_services as _invoke_startup_services, new_cid, spawn_greenlet, StaticConfig, \
      register_diag_handlers
+from zato.common.util.metrics import PhaseTimer
 from zato.common.util.posix_ipc_ import ConnectorConfigIPC, ServerStartupIPC
 from zato.common.util.time_ import TimeUtil
-from zato.distlock import LockManager
+from zato.distlock import LOCK_SCOPE, LockManager
 from zato.server.base.worker import WorkerStore
 from zato.server.config import ConfigStore
 from zato.server.connection.server import Servers
 from zato.server.base.parallel.config import ConfigLoader
 from zato.server.base.parallel.http import HTTPHandler
 from zato.server.base.parallel.wmq import WMQIPC
-from zato.server.pickup import PickupManager
+from zato.server.pickup import get_pubsub_request, PickupManager
 
 # ################################################################################################################################
 
@@ -109,6 +111,7 @@ class ParallelServer(BrokerMessageReceiver, ConfigLoader, HTTPHandler, WMQIPC):
         self.startup_jobs = None
         self.worker_store = None
         self.request_dispatcher_dispatch = None
+        self.http_timing_store = None
         self.deployment_lock_expires = None
         self.deployment_lock_timeout = None
         self.deployment_key = ''
@@ -125,6 +128,7 @@ class ParallelServer(BrokerMessageReceiver, ConfigLoader, HTTPHandler, WMQIPC):
         self.crypto_use_tls = None
         self.servers = None
         self.zato_lock_manager = None
+        self.lock_managers = {}
         self.pid = None
         self.sync_internal = None
         self.ipc_api = IPCAPI()
@@ -346,6 +350,15 @@ class ParallelServer(BrokerMessageReceiver, ConfigLoader, HTTPHandler, WMQIPC):
         for name, program in self.get_lua_programs():
             self.kvdb.lua_container.add_lua_program(name, program)
 
+        # Data dictionary translations are looked up locally unless they cannot be read in,
+        # in which case each one is looked up in the KVDB.
+        try:
+            self.kvdb.load_translations()
+        except Exception:
+            kvdb_logger.warn('Could not load data dictionary translations, e:`%s`', format_exc())
+        else:
+            kvdb_logger.info('Loaded %d data dictionary translation(s)', len(self.kvdb.translations))
+
         # TimeUtil needs self.kvdb so it can be set now
         self.time_util = TimeUtil(self.kvdb)
 
@@ -392,6 +405,9 @@ class ParallelServer(BrokerMessageReceiver, ConfigLoader, HTTPHandler, WMQIPC):
         # Easier to type
         self = parallel_server
 
+        # How long each startup phase takes
+        startup_timer = PhaseTimer()
+
         # This cannot be done in __init__ because each sub-process obviously has its own PID
         self.pid = os.getpid()
 
@@ -426,6 +442,8 @@ class ParallelServer(BrokerMessageReceiver, ConfigLoader, HTTPHandler, WMQIPC):
         if not server:
             raise Exception('Server does not exist in the ODB')
 
+        startup_timer.mark('odb')
+
         # Set up the server-wide default lock manager
         odb_data = self.config.odb_data
         backend_type = 'fcntl' if odb_data.engine == 'sqlite' else odb_data.engine
@@ -442,6 +460,14 @@ class ParallelServer(BrokerMessageReceiver, ConfigLoader, HTTPHandler, WMQIPC):
         self.cluster = self.odb.cluster
         self.worker_id = '{}.{}.{}.{}'.format(self.cluster_id, self.id, self.worker_pid, new_cid())
 
+        # Locks that need to be held only within a worker process or a server do not need to go through the ODB.
+        # Files of fcntl locks are shared by all the servers on the same host, hence the server's name in their namespace.
+        self.lock_managers = {
+            LOCK_SCOPE.WORKER: LockManager('local', 'zato'),
+            LOCK_SCOPE.SERVER: LockManager('fcntl', 'zato-{}-{}'.format(self.cluster_id, self.name)),
+            LOCK_SCOPE.CLUSTER: self.zato_lock_manager,
+        }
+
         # Looked up upfront here and assigned to services in their store
         self.enforce_service_invokes = asbool(self.fs_server_config.misc.enforce_service_invokes)
 
@@ -456,6 +482,7 @@ class ParallelServer(BrokerMessageReceiver, ConfigLoader, HTTPHandler, WMQIPC):
         self.worker_store.invoke_matcher.read_config(self.fs_server_config.invoke_patterns_allowed)
         self.worker_store.target_matcher.read_config(self.fs_server_config.invoke_target_patterns_allowed)
         self.set_up_config(server)
+        startup_timer.mark('config')
 
         # Normalize hot-deploy configuration
         self.hot_deploy_config = Bunch()
@@ -477,14 +504,22 @@ class ParallelServer(BrokerMessageReceiver, ConfigLoader, HTTPHandler, WMQIPC):
 
         # Deploys services
         is_first, locally_deployed = self._after_init_common(server)
+        startup_timer.mark('deploy')
 
         # Initializes worker store, including connectors
         self.worker_store.init()
         self.request_dispatcher_dispatch = self.worker_store.request_dispatcher.dispatch
+        self.http_timing_store = self.worker_store.request_dispatcher.timing
+        startup_timer.mark('worker_store')
 
         # Configure remaining parts of SSO
         self.configure_sso()
 
+        # CPU-bound cryptography is run in a pool of threads so as not to block other greenlets - added in 3.1, hence optional
+        crypto_config = self.fs_server_config.crypto
+        self.crypto_manager.pool = CryptoPool(int(crypto_config.get('pool_size', 4)),
+            int(crypto_config.get('offload_min_size', 65536)))
+
         # Cannot be done in __init__ because self.sso_config is not available there yet
         salt_size = self.sso_config.hash_secret.salt_size
         self.crypto_manager.add_hash_scheme('zato.default', self.sso_config.hash_secret.rounds, salt_size)
@@ -536,6 +571,8 @@ class ParallelServer(BrokerMessageReceiver, ConfigLoader, HTTPHandler, WMQIPC):
                 else:
                     raise Exception('Broker client did not become ready within {} seconds'.format(max_seconds))
 
+        startup_timer.mark('broker')
+
         self._after_init_accepted(locally_deployed)
         self.odb.server_up_down(
             server.token, SERVER_UP_STATUS.RUNNING, True, self.host, self.port, self.preferred_address, use_tls)
@@ -587,7 +624,10 @@ class ParallelServer(BrokerMessageReceiver, ConfigLoader, HTTPHandler, WMQIPC):
             'parallel_server': self,
         })
 
-        logger.info('Started `%s@%s` (pid: %s)', server.name, server.cluster.name, self.pid)
+        startup_timer.mark('after_init')
+
+        logger.info('Started `%s@%s` (pid: %s) in %.3fs (%s)', server.name, server.cluster.name, self.pid,
+            startup_timer.total, startup_timer.to_string())
 
 # ################################################################################################################################
 
@@ -646,6 +686,19 @@ class ParallelServer(BrokerMessageReceiver, ConfigLoader, HTTPHandler, WMQIPC):
             mpt = stanza_config.get('move_processed_to')
             stanza_config.move_processed_to = absolutize(mpt, self.base_dir) if mpt else None
 
+            # Added in 3.1, hence optional
+            stanza_config.stream = asbool(stanza_config.get('stream', False))
+            stanza_config.split_with = stanza_config.get('split_with') or 'lines'
+            stanza_config.batch_size = int(stanza_config.get('batch_size', 1000))
+            stanza_config.chunk_size = int(stanza_config.get('chunk_size', 65536))
+            stanza_config.encoding = stanza_config.get('encoding') or 'utf8'
+            stanza_config.ready_marker = stanza_config.get('ready_marker') or None
+            stanza_config.stable_after = float(stanza_config.get('stable_after', 1))
+
+            cpd = stanza_config.get('checkpoint_dir')
+            stanza_config.checkpoint_dir = absolutize(cpd, self.base_dir) if cpd else \
+                os.path.join(stanza_config.pickup_from, '.zato-checkpoint')
+
             services = stanza_config.get('services') or []
             stanza_config.services = [services] if not isinstance(services, list) else services
 
@@ -782,24 +835,10 @@ class ParallelServer(BrokerMessageReceiver, ConfigLoader, HTTPHandler, WMQIPC):
 # ################################################################################################################################
 
     def publish_pickup(self, topic_name, request, *args, **kwargs):
-        """ Publishes a pickedup file to a named topic.
+        """ Publishes a pickedup file, or a batch of records of a streamed one, to a named topic.
         """
-        self.invoke('zato.pubsub.publish.publish', {
-            'topic_name': topic_name,
-            'endpoint_id': self.default_internal_pubsub_endpoint_id,
-            'has_gd': False,
-            'data': dumps({
-                'meta': {
-                    'pickup_ts_utc': request['ts_utc'],
-                    'stanza': request['stanza'],
-                    'full_path': request['full_path'],
-                    'file_name': request['file_name'],
-                },
-                'data': {
-                    'raw': request['raw_data'],
-                }
-            })
-        })
+        self.invoke('zato.pubsub.publish.publish',
+            get_pubsub_request(topic_name, self.default_internal_pubsub_endpoint_id, request))
 
 # ################################################################################################################################
 
@@ -9,20 +9,27 @@ Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 # stdlib
-from contextlib import closing
+import logging
 import os
+from contextlib import closing
 
 # Zato
 from zato.bunch import Bunch
 from zato.common import MISC, SECRETS
 from zato.common.util import asbool
+from zato.common.util.metrics import monotonic
 from zato.common.util.sql import elems_with_opaque
 from zato.server.config import ConfigDict
+from zato.server.config_snapshot import ConfigSnapshot
 from zato.server.message import JSONPointerStore, NamespaceStore, XPathStore
 from zato.url_dispatcher import Matcher
 
 # ################################################################################################################################
 
+logger = logging.getLogger(__name__)
+
+# ################################################################################################################################
+
 class ConfigLoader(object):
     """ Loads server's configuration.
     """
@@ -30,6 +37,36 @@ class ConfigLoader(object):
 # ################################################################################################################################
 
     def set_up_config(self, server):
+        """ Sets up configuration, either by querying the ODB or, if this worker is not the first one of the current deployment,
+        by reading results of the queries from a snapshot that the first worker created.
+        """
+        start = monotonic()
+
+        # Added in 3.1, hence optional
+        if not asbool(self.fs_server_config.misc.get('use_config_snapshot', True)):
+            self._set_up_config(server, self.odb, False)
+            logger.info('Config read from ODB in %.3fs (%s)', monotonic() - start, self.name)
+            return
+
+        work_dir = os.path.normpath(os.path.join(self.repo_location, self.fs_server_config.hot_deploy.work_dir))
+        snapshot = ConfigSnapshot(work_dir, self.deployment_key)
+        lock_name = 'config_snapshot:{}:{}'.format(self.fs_server_config.main.token, self.deployment_key)
+
+        # Only one worker at a time may create the snapshot, others wait until it is ready ..
+        with self.zato_lock_manager(lock_name, ttl=self.deployment_lock_expires, block=self.deployment_lock_timeout):
+            if not snapshot.load():
+                self._set_up_config(server, snapshot.get_odb(self.odb), False)
+                snapshot.save()
+                logger.info('Config read from ODB and saved to a snapshot in %.3fs (%s)', monotonic() - start, self.name)
+                return
+
+        # .. but once it is, all of them can read it in parallel.
+        self._set_up_config(server, snapshot.get_odb(self.odb), True)
+        logger.info('Config read from a snapshot in %.3fs (%s)', monotonic() - start, self.name)
+
+# ################################################################################################################################
+
+    def _set_up_config(self, server, odb, is_snapshot):
 
         # Which components are enabled
         self.component_enabled.stats = asbool(self.fs_server_config.component_enabled.stats)
@@ -39,10 +76,10 @@ class ConfigLoader(object):
         # Cassandra - start
         #
 
-        query = self.odb.get_cassandra_conn_list(server.cluster.id, True)
+        query = odb.get_cassandra_conn_list(server.cluster.id, True)
         self.config.cassandra_conn = ConfigDict.from_query('cassandra_conn', query, decrypt_func=self.decrypt)
 
-        query = self.odb.get_cassandra_query_list(server.cluster.id, True)
+        query = odb.get_cassandra_query_list(server.cluster.id, True)
         self.config.cassandra_query = ConfigDict.from_query('cassandra_query', query, decrypt_func=self.decrypt)
 
         #
@@ -53,10 +90,10 @@ class ConfigLoader(object):
         # Search - start
         #
 
-        query = self.odb.get_search_es_list(server.cluster.id, True)
+        query = odb.get_search_es_list(server.cluster.id, True)
         self.config.search_es = ConfigDict.from_query('search_es', query, decrypt_func=self.decrypt)
 
-        query = self.odb.get_search_solr_list(server.cluster.id, True)
+        query = odb.get_search_solr_list(server.cluster.id, True)
         self.config.search_solr = ConfigDict.from_query('search_solr', query, decrypt_func=self.decrypt)
 
         #
@@ -67,7 +104,7 @@ class ConfigLoader(object):
         # SMS - start
         #
 
-        query = self.odb.get_sms_twilio_list(server.cluster.id, True)
+        query = odb.get_sms_twilio_list(server.cluster.id, True)
         self.config.sms_twilio = ConfigDict.from_query('sms_twilio', query, decrypt_func=self.decrypt)
 
         #
@@ -80,10 +117,10 @@ class ConfigLoader(object):
 
         # OpenStack - Swift
 
-        query = self.odb.get_cloud_openstack_swift_list(server.cluster.id, True)
+        query = odb.get_cloud_openstack_swift_list(server.cluster.id, True)
         self.config.cloud_openstack_swift = ConfigDict.from_query('cloud_openstack_swift', query, decrypt_func=self.decrypt)
 
-        query = self.odb.get_cloud_aws_s3_list(server.cluster.id, True)
+        query = odb.get_cloud_aws_s3_list(server.cluster.id, True)
         self.config.cloud_aws_s3 = ConfigDict.from_query('cloud_aws_s3', query, decrypt_func=self.decrypt)
 
         #
@@ -93,7 +130,7 @@ class ConfigLoader(object):
         # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
         # Services
-        query = self.odb.get_service_list(server.cluster.id, True)
+        query = odb.get_service_list(server.cluster.id, True)
         self.config.service = ConfigDict.from_query('service_list', query, decrypt_func=self.decrypt)
 
         #
@@ -101,10 +138,10 @@ class ConfigLoader(object):
         #
 
         # AMQP
-        query = self.odb.get_definition_amqp_list(server.cluster.id, True)
+        query = odb.get_definition_amqp_list(server.cluster.id, True)
         self.config.definition_amqp = ConfigDict.from_query('definition_amqp', query, decrypt_func=self.decrypt)
 
-        query = self.odb.get_definition_wmq_list(server.cluster.id, True)
+        query = odb.get_definition_wmq_list(server.cluster.id, True)
         self.config.definition_wmq = ConfigDict.from_query('definition_wmq', query, decrypt_func=self.decrypt)
 
         #
@@ -116,15 +153,15 @@ class ConfigLoader(object):
         #
 
         # AMQP
-        query = self.odb.get_channel_amqp_list(server.cluster.id, True)
+        query = odb.get_channel_amqp_list(server.cluster.id, True)
         self.config.channel_amqp = ConfigDict.from_query('channel_amqp', query, decrypt_func=self.decrypt)
 
         # STOMP
-        query = self.odb.get_channel_stomp_list(server.cluster.id, True)
+        query = odb.get_channel_stomp_list(server.cluster.id, True)
         self.config.channel_stomp = ConfigDict.from_query('channel_stomp', query, decrypt_func=self.decrypt)
 
         # IBM MQ
-        query = self.odb.get_channel_wmq_list(server.cluster.id, True)
+        query = odb.get_channel_wmq_list(server.cluster.id, True)
         self.config.channel_wmq = ConfigDict.from_query('channel_wmq', query, decrypt_func=self.decrypt)
 
         #
@@ -136,58 +173,58 @@ class ConfigLoader(object):
         #
 
         # AMQP
-        query = self.odb.get_out_amqp_list(server.cluster.id, True)
+        query = odb.get_out_amqp_list(server.cluster.id, True)
         self.config.out_amqp = ConfigDict.from_query('out_amqp', query, decrypt_func=self.decrypt)
 
         # Caches
-        query = self.odb.get_cache_builtin_list(server.cluster.id, True)
+        query = odb.get_cache_builtin_list(server.cluster.id, True)
         self.config.cache_builtin = ConfigDict.from_query('cache_builtin', query, decrypt_func=self.decrypt)
 
-        query = self.odb.get_cache_memcached_list(server.cluster.id, True)
+        query = odb.get_cache_memcached_list(server.cluster.id, True)
         self.config.cache_memcached = ConfigDict.from_query('cache_memcached', query, decrypt_func=self.decrypt)
 
         # FTP
-        query = self.odb.get_out_ftp_list(server.cluster.id, True)
+        query = odb.get_out_ftp_list(server.cluster.id, True)
         self.config.out_ftp = ConfigDict.from_query('out_ftp', query, decrypt_func=self.decrypt)
 
         # IBM MQ
-        query = self.odb.get_out_wmq_list(server.cluster.id, True)
+        query = odb.get_out_wmq_list(server.cluster.id, True)
         self.config.out_wmq = ConfigDict.from_query('out_wmq', query, decrypt_func=self.decrypt)
 
         # Odoo
-        query = self.odb.get_out_odoo_list(server.cluster.id, True)
+        query = odb.get_out_odoo_list(server.cluster.id, True)
         self.config.out_odoo = ConfigDict.from_query('out_odoo', query, decrypt_func=self.decrypt)
 
         # SAP RFC
-        query = self.odb.get_out_sap_list(server.cluster.id, True)
+        query = odb.get_out_sap_list(server.cluster.id, True)
         self.config.out_sap = ConfigDict.from_query('out_sap', query)
 
          # Plain HTTP
-        query = self.odb.get_http_soap_list(server.cluster.id, 'outgoing', 'plain_http', True)
+        query = odb.get_http_soap_list(server.cluster.id, 'outgoing', 'plain_http', True)
         self.config.out_plain_http = ConfigDict.from_query('out_plain_http', query, decrypt_func=self.decrypt)
 
         # SOAP
-        query = self.odb.get_http_soap_list(server.cluster.id, 'outgoing', 'soap', True)
+        query = odb.get_http_soap_list(server.cluster.id, 'outgoing', 'soap', True)
         self.config.out_soap = ConfigDict.from_query('out_soap', query, decrypt_func=self.decrypt)
 
         # SQL
-        query = self.odb.get_out_sql_list(server.cluster.id, True)
+        query = odb.get_out_sql_list(server.cluster.id, True)
         self.config.out_sql = ConfigDict.from_query('out_sql', query, decrypt_func=self.decrypt)
 
         # STOMP
-        query = self.odb.get_out_stomp_list(server.cluster.id, True)
+        query = odb.get_out_stomp_list(server.cluster.id, True)
         self.config.out_stomp = ConfigDict.from_query('out_stomp', query, decrypt_func=self.decrypt)
 
         # ZMQ channels
-        query = self.odb.get_channel_zmq_list(server.cluster.id, True)
+        query = odb.get_channel_zmq_list(server.cluster.id, True)
         self.config.channel_zmq = ConfigDict.from_query('channel_zmq', query, decrypt_func=self.decrypt)
 
         # ZMQ outgoing
-        query = self.odb.get_out_zmq_list(server.cluster.id, True)
+        query = odb.get_out_zmq_list(server.cluster.id, True)
         self.config.out_zmq = ConfigDict.from_query('out_zmq', query, decrypt_func=self.decrypt)
 
         # WebSocket channels
-        query = self.odb.get_channel_web_socket_list(server.cluster.id, True)
+        query = odb.get_channel_web_socket_list(server.cluster.id, True)
         self.config.channel_web_socket = ConfigDict.from_query('channel_web_socket', query, decrypt_func=self.decrypt)
 
         #
@@ -203,7 +240,7 @@ class ConfigLoader(object):
         # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
         # Connections
-        query = self.odb.get_generic_connection_list(server.cluster.id, True)
+        query = odb.get_generic_connection_list(server.cluster.id, True)
         self.config.generic_connection = ConfigDict.from_query('generic_connection', query, decrypt_func=self.decrypt)
 
         #
@@ -217,11 +254,11 @@ class ConfigLoader(object):
         #
 
         # OpenStack Swift
-        query = self.odb.get_notif_cloud_openstack_swift_list(server.cluster.id, True)
+        query = odb.get_notif_cloud_openstack_swift_list(server.cluster.id, True)
         self.config.notif_cloud_openstack_swift = ConfigDict.from_query('notif_cloud_openstack_swift', query, decrypt_func=self.decrypt)
 
         # SQL
-        query = self.odb.get_notif_sql_list(server.cluster.id, True)
+        query = odb.get_notif_sql_list(server.cluster.id, True)
         self.config.notif_sql = ConfigDict.from_query('notif_sql', query, decrypt_func=self.decrypt)
 
         #
@@ -235,75 +272,75 @@ class ConfigLoader(object):
         #
 
         # API keys
-        query = self.odb.get_apikey_security_list(server.cluster.id, True)
+        query = odb.get_apikey_security_list(server.cluster.id, True)
         self.config.apikey = ConfigDict.from_query('apikey', query, decrypt_func=self.decrypt)
 
         # AWS
-        query = self.odb.get_aws_security_list(server.cluster.id, True)
+        query = odb.get_aws_security_list(server.cluster.id, True)
         self.config.aws = ConfigDict.from_query('aws', query, decrypt_func=self.decrypt)
 
         # HTTP Basic Auth
-        query = self.odb.get_basic_auth_list(server.cluster.id, None, True)
+        query = odb.get_basic_auth_list(server.cluster.id, None, True)
         self.config.basic_auth = ConfigDict.from_query('basic_auth', query, decrypt_func=self.decrypt)
 
         # JWT
-        query = self.odb.get_jwt_list(server.cluster.id, None, True)
+        query = odb.get_jwt_list(server.cluster.id, None, True)
         self.config.jwt = ConfigDict.from_query('jwt', query, decrypt_func=self.decrypt)
 
         # NTLM
-        query = self.odb.get_ntlm_list(server.cluster.id, True)
+        query = odb.get_ntlm_list(server.cluster.id, True)
         self.config.ntlm = ConfigDict.from_query('ntlm', query, decrypt_func=self.decrypt)
 
         # OAuth
-        query = self.odb.get_oauth_list(server.cluster.id, True)
+        query = odb.get_oauth_list(server.cluster.id, True)
         self.config.oauth = ConfigDict.from_query('oauth', query, decrypt_func=self.decrypt)
 
         # OpenStack
-        query = self.odb.get_openstack_security_list(server.cluster.id, True)
+        query = odb.get_openstack_security_list(server.cluster.id, True)
         self.config.openstack_security = ConfigDict.from_query('openstack_security', query, decrypt_func=self.decrypt)
 
         # RBAC - permissions
-        query = self.odb.get_rbac_permission_list(server.cluster.id, True)
+        query = odb.get_rbac_permission_list(server.cluster.id, True)
         self.config.rbac_permission = ConfigDict.from_query('rbac_permission', query, decrypt_func=self.decrypt)
 
         # RBAC - roles
-        query = self.odb.get_rbac_role_list(server.cluster.id, True)
+        query = odb.get_rbac_role_list(server.cluster.id, True)
         self.config.rbac_role = ConfigDict.from_query('rbac_role', query, decrypt_func=self.decrypt)
 
         # RBAC - client roles
-        query = self.odb.get_rbac_client_role_list(server.cluster.id, True)
+        query = odb.get_rbac_client_role_list(server.cluster.id, True)
         self.config.rbac_client_role = ConfigDict.from_query('rbac_client_role', query, decrypt_func=self.decrypt)
 
         # RBAC - role permission
-        query = self.odb.get_rbac_role_permission_list(server.cluster.id, True)
+        query = odb.get_rbac_role_permission_list(server.cluster.id, True)
         self.config.rbac_role_permission = ConfigDict.from_query('rbac_role_permission', query, decrypt_func=self.decrypt)
 
         # TLS CA certs
-        query = self.odb.get_tls_ca_cert_list(server.cluster.id, True)
+        query = odb.get_tls_ca_cert_list(server.cluster.id, True)
         self.config.tls_ca_cert = ConfigDict.from_query('tls_ca_cert', query, decrypt_func=self.decrypt)
 
         # TLS channel security
-        query = self.odb.get_tls_channel_sec_list(server.cluster.id, True)
+        query = odb.get_tls_channel_sec_list(server.cluster.id, True)
         self.config.tls_channel_sec = ConfigDict.from_query('tls_channel_sec', query, decrypt_func=self.decrypt)
 
         # TLS key/cert pairs
-        query = self.odb.get_tls_key_cert_list(server.cluster.id, True)
+        query = odb.get_tls_key_cert_list(server.cluster.id, True)
         self.config.tls_key_cert = ConfigDict.from_query('tls_key_cert', query, decrypt_func=self.decrypt)
 
         # WS-Security
-        query = self.odb.get_wss_list(server.cluster.id, True)
+        query = odb.get_wss_list(server.cluster.id, True)
         self.config.wss = ConfigDict.from_query('wss', query, decrypt_func=self.decrypt)
 
         # Vault connections
-        query = self.odb.get_vault_connection_list(server.cluster.id, True)
+        query = odb.get_vault_connection_list(server.cluster.id, True)
         self.config.vault_conn_sec = ConfigDict.from_query('vault_conn_sec', query, decrypt_func=self.decrypt)
 
         # XPath
-        query = self.odb.get_xpath_sec_list(server.cluster.id, True)
+        query = odb.get_xpath_sec_list(server.cluster.id, True)
         self.config.xpath_sec = ConfigDict.from_query('xpath_sec', query, decrypt_func=self.decrypt)
 
-        # New in 3.0 - encrypt all old secrets
-        self._migrate_30_encrypt_secrets()
+        # New in 3.0 - encrypt all old secrets, unless it was already done by the worker that created the snapshot
+        self._migrate_30_encrypt_secrets(not is_snapshot)
 
         #
         # Security - end
@@ -314,7 +351,7 @@ class ConfigLoader(object):
         # All the HTTP/SOAP channels.
         http_soap = []
 
-        for item in elems_with_opaque(self.odb.get_http_soap_list(server.cluster.id, 'channel')):
+        for item in elems_with_opaque(odb.get_http_soap_list(server.cluster.id, 'channel')):
 
             hs_item = {}
             for key in item.keys():
@@ -328,15 +365,15 @@ class ConfigLoader(object):
         self.config.http_soap = http_soap
 
         # Namespaces
-        query = self.odb.get_namespace_list(server.cluster.id, True)
+        query = odb.get_namespace_list(server.cluster.id, True)
         self.config.msg_ns = ConfigDict.from_query('msg_ns', query, decrypt_func=self.decrypt)
 
         # XPath
-        query = self.odb.get_xpath_list(server.cluster.id, True)
+        query = odb.get_xpath_list(server.cluster.id, True)
         self.config.xpath = ConfigDict.from_query('msg_xpath', query, decrypt_func=self.decrypt)
 
         # JSON Pointer
-        query = self.odb.get_json_pointer_list(server.cluster.id, True)
+        query = odb.get_json_pointer_list(server.cluster.id, True)
         self.config.json_pointer = ConfigDict.from_query('json_pointer', query, decrypt_func=self.decrypt)
 
         # SimpleIO
@@ -363,23 +400,23 @@ class ConfigLoader(object):
         self.config.pubsub = Bunch()
 
         # Pub/sub - endpoints
-        query = self.odb.get_pubsub_endpoint_list(server.cluster.id, True)
+        query = odb.get_pubsub_endpoint_list(server.cluster.id, True)
         self.config.pubsub_endpoint = ConfigDict.from_query('pubsub_endpoint', query, decrypt_func=self.decrypt)
 
         # Pub/sub - topics
-        query = self.odb.get_pubsub_topic_list(server.cluster.id, True)
+        query = odb.get_pubsub_topic_list(server.cluster.id, True)
         self.config.pubsub_topic = ConfigDict.from_query('pubsub_topic', query, decrypt_func=self.decrypt)
 
         # Pub/sub - subscriptions
-        query = self.odb.get_pubsub_subscription_list(server.cluster.id, True)
+        query = odb.get_pubsub_subscription_list(server.cluster.id, True)
         self.config.pubsub_subscription = ConfigDict.from_query('pubsub_subscription', query, decrypt_func=self.decrypt)
 
         # E-mail - SMTP
-        query = self.odb.get_email_smtp_list(server.cluster.id, True)
+        query = odb.get_email_smtp_list(server.cluster.id, True)
         self.config.email_smtp = ConfigDict.from_query('email_smtp', query, decrypt_func=self.decrypt)
 
         # E-mail - IMAP
-        query = self.odb.get_email_imap_list(server.cluster.id, True)
+        query = odb.get_email_imap_list(server.cluster.id, True)
         self.config.email_imap = ConfigDict.from_query('email_imap', query, decrypt_func=self.decrypt)
 
         # Message paths
@@ -392,13 +429,21 @@ class ConfigLoader(object):
 
 # ################################################################################################################################
 
-    def _migrate_30_encrypt_secrets(self):
+    def _migrate_30_encrypt_secrets(self, needs_odb_update=True):
         """ New in 3.0 - all passwords are always encrypted so we need to look up any that are not,
         for instance, because it is a cluster newly migrated from 2.0 to 3.0, and encrypt them now in ODB.
         """
         sec_config_dict_types = ('apikey', 'aws', 'basic_auth', 'jwt', 'ntlm', 'oauth', 'openstack_security',
             'tls_key_cert', 'wss', 'vault_conn_sec', 'xpath_sec')
 
+        # Only clean up config, there is nothing to encrypt
+        if not needs_odb_update:
+            for sec_config_dict_type in sec_config_dict_types:
+                for config in getattr(self.config, sec_config_dict_type).values():
+                    config['config'].pop('_encryption_needed', None)
+                    config['config'].pop('_encrypted_in_odb', None)
+            return
+
         # Global lock to make sure only one server attempts to do it at a time
         with self.zato_lock_manager('migrate_30_encrypt_secrets'):
 
@@ -83,6 +83,11 @@ class HTTPHandler(object):
             # 404 Not Found since we cannot find the channel
             channel_name = '-'
 
+        # Set by RequestDispatcher only if HTTP timing is enabled
+        timing = wsgi_environ.get('zato.http.timing')
+        if timing:
+            self.http_timing_store.store(channel_name, timing, wsgi_environ['zato.http.response.headers'])
+
         start_response(wsgi_environ['zato.http.response.status'], iteritems(wsgi_environ['zato.http.response.headers']))
 
         if isinstance(payload, unicode):
@@ -72,6 +72,9 @@ class WMQIPC(object):
         # Credentials for both servers and connectors
         username, password = self.get_wmq_credentials()
 
+        # Added in 3.1, hence optional
+        ibm_mq_config = self.fs_server_config.get('ibm_mq') or {}
+
         # Employ IPC to exchange subprocess startup configuration
         self.connector_config_ipc.set_config('zato-ibm-mq', dumps({
             'port': self.wmq_ipc_tcp_port,
@@ -81,7 +84,11 @@ class WMQIPC(object):
             'server_name': self.name,
             'server_path': '/zato/internal/callback/wmq',
             'base_dir': self.base_dir,
-            'logging_conf_path': self.logging_conf_path
+            'logging_conf_path': self.logging_conf_path,
+            'forward_pool_size': int(ibm_mq_config.get('forward_pool_size', 10)),
+            'forward_batch_size': int(ibm_mq_config.get('forward_batch_size', 1)),
+            'forward_queue_size': int(ibm_mq_config.get('forward_queue_size', 1000)),
+            'forward_stats_interval': int(ibm_mq_config.get('forward_stats_interval', 60)),
         }))
 
         # Start IBM MQ connector in a sub-process
@@ -14,6 +14,7 @@ from datetime import datetime
 from errno import ENOENT
 from inspect import isclass
 from json import loads
+from operator import itemgetter
 from shutil import rmtree
 from tempfile import gettempdir
 from threading import RLock
@@ -31,11 +32,15 @@ from dateutil.rrule import DAILY, MINUTELY, rrule
 
 # gevent
 import gevent
+from gevent.pool import Pool
 
 # gunicorn
 from gunicorn.workers.ggevent import GeventWorker as GunicornGeventWorker
 from gunicorn.workers.sync import SyncWorker as GunicornSyncWorker
 
+# Paste
+from paste.util.converters import asbool
+
 # Python 2/3 compatibility
 from future.utils import iterkeys
 from future.moves.urllib.parse import urlparse
@@ -55,6 +60,7 @@ from zato.common.util import get_tls_ca_cert_full_path, get_tls_key_cert_full_pa
      import_module_from_path, new_cid, pairwise, parse_extra_into_dict, parse_tls_channel_security_definition, start_connectors, \
      store_tls, update_apikey_username_to_channel, update_bind_port, visit_py_source
 from zato.server.base.worker.common import WorkerImpl
+from zato.server.config_snapshot import ConfigSnapshot
 from zato.server.connection.amqp_ import ConnectorAMQP
 from zato.server.connection.cache import CacheAPI
 from zato.server.connection.cassandra import CassandraAPI, CassandraConnStore
@@ -64,10 +70,14 @@ from zato.server.connection.cloud.openstack.swift import SwiftWrapper
 from zato.server.connection.email import IMAPAPI, IMAPConnStore, SMTPAPI, SMTPConnStore
 from zato.server.connection.ftp import FTPStore
 from zato.server.generic.api.outconn_wsx import OutconnWSXWrapper
+from zato.server.connection.http_soap.breaker import config_keys as breaker_config_keys
 from zato.server.connection.http_soap.channel import RequestDispatcher, RequestHandler
 from zato.server.connection.http_soap.outgoing import HTTPSOAPWrapper, SudsSOAPWrapper
+from zato.server.connection.http_soap.timing import TimingStore
 from zato.server.connection.http_soap.url_data import URLData
 from zato.server.connection.odoo import OdooWrapper
+from zato.server.connection.queue import ConnectionQueue, default_acquire_timeout, default_max_idle_time, \
+     default_max_lifetime
 from zato.server.connection.sap import SAPWrapper
 from zato.server.connection.search.es import ElasticSearchAPI, ElasticSearchConnStore
 from zato.server.connection.search.solr import SolrAPI, SolrConnStore
@@ -75,6 +85,7 @@ from zato.server.connection.sms.twilio import TwilioAPI, TwilioConnStore
 from zato.server.connection.stomp import ChannelSTOMPConnStore, STOMPAPI, channel_main_loop as stomp_channel_main_loop, \
      OutconnSTOMPConnStore
 from zato.server.connection.web_socket import ChannelWebSocket
+from zato.server.connection.web_socket.metadata import MetadataWriter
 from zato.server.connection.vault import VaultConnAPI
 from zato.server.pubsub import PubSub
 from zato.server.query import CassandraQueryAPI, CassandraQueryStore
@@ -195,6 +206,11 @@ class WorkerStore(_WorkerStoreBase, BrokerMessageReceiver):
         # WebSocket
         self.web_socket_api = ConnectorStore(connector_type.duplex.web_socket, ChannelWebSocket, self.server)
 
+        # Last-seen and pub/sub interaction metadata of all WebSocket clients is stored in the ODB in batches,
+        # once in that many seconds. Added in 3.1, hence optional.
+        wsx_config = self.server.fs_server_config.get('wsx') or {}
+        self.wsx_metadata_writer = MetadataWriter(self.invoke, float(wsx_config.get('metadata_flush_interval', 5)))
+
         # AMQP
         self.amqp_api = ConnectorStore(connector_type.duplex.amqp, ConnectorAMQP)
         self.amqp_out_name_to_def = {} # Maps outgoing connection names to definition names, i.e. to connector names
@@ -268,11 +284,23 @@ class WorkerStore(_WorkerStoreBase, BrokerMessageReceiver):
         # API keys
         self.update_apikeys()
 
+        # Jobs that the scheduler sends in batches are run by a pool of greenlets of that size. Added in 3.1, hence optional.
+        self.job_batch_pool = Pool(int(self.server.fs_server_config.misc.get('scheduler_job_pool_size', 100)))
+
+        # Job name -> histogram of milliseconds it took to start the job since the scheduler fired it
+        self.job_latency = {}
+
+        # Per-stage timing of HTTP requests, disabled by default. Added in 3.1, hence optional.
+        http_timing_config = self.server.fs_server_config.get('http_timing') or {}
+        http_timing = TimingStore(asbool(http_timing_config.get('enabled', False)),
+            asbool(http_timing_config.get('server_timing_header', False)))
+
         # Request dispatcher - matches URLs, checks security and dispatches HTTP
         # requests to services.
 
         self.request_dispatcher = RequestDispatcher(simple_io_config=self.worker_config.simple_io,
-            return_tracebacks=self.server.return_tracebacks, default_error_message=self.server.default_error_message)
+            return_tracebacks=self.server.return_tracebacks, default_error_message=self.server.default_error_message,
+            timing=http_timing)
         self.request_dispatcher.url_data = URLData(
             self, self.worker_config.http_soap,
             self.server.odb.get_url_security(self.server.cluster_id, 'channel')[0],
@@ -335,10 +363,58 @@ class WorkerStore(_WorkerStoreBase, BrokerMessageReceiver):
         # TODO: Fix it, worker doesn't need to accept all the messages
         return True
 
+# ################################################################################################################################
+
+    def on_broker_msg(self, msg):
+
+        # Configuration of the cluster is about to change so workers started from now on cannot use the current snapshot
+        if ConfigSnapshot.is_config_msg(msg):
+            ConfigSnapshot.delete(self.server.hot_deploy_config.work_dir)
+
+        super(WorkerStore, self).on_broker_msg(msg)
+
 # ################################################################################################################################
 
     def _update_queue_build_cap(self, item):
-        item.queue_build_cap = float(self.server.fs_server_config.misc.queue_build_cap)
+        misc = self.server.fs_server_config.misc
+        item['queue_build_cap'] = float(misc.queue_build_cap)
+
+        # Added in 3.1, hence optional
+        item['queue_acquire_timeout'] = float(misc.get('queue_acquire_timeout', default_acquire_timeout))
+        item['queue_max_idle_time'] = float(misc.get('queue_max_idle_time', default_max_idle_time))
+        item['queue_max_lifetime'] = float(misc.get('queue_max_lifetime', default_max_lifetime))
+
+# ################################################################################################################################
+
+    def _yield_conn_pool_wrappers(self):
+        """ Yields all wrappers of outgoing connections that may keep their connections in a ConnectionQueue.
+        """
+        config_dicts = (self.worker_config.out_soap, self.worker_config.out_odoo, self.worker_config.out_sap,
+            self.worker_config.cloud_openstack_swift, self.worker_config.cloud_aws_s3)
+
+        for config_dict in config_dicts:
+            for name in list(config_dict):
+                yield config_dict[name].get('conn')
+
+        for conn_dict in self.generic_conn_api.values():
+            for item in list(conn_dict.values()):
+                yield item.get('conn')
+
+        for item in list(self.search_solr_api._conn_store.items.values()):
+            yield item.impl
+
+    def get_conn_pool_stats(self, conn_name=None):
+        """ Returns metrics of all queue-based connection pools in this worker process, or of the input one only, if given.
+        """
+        out = []
+
+        for wrapper in self._yield_conn_pool_wrappers():
+            conn_queue = getattr(wrapper, 'client', None)
+            if isinstance(conn_queue, ConnectionQueue):
+                if not conn_name or conn_queue.conn_name == conn_name:
+                    out.append(conn_queue.get_stats())
+
+        return sorted(out, key=itemgetter('conn_type', 'conn_name'))
 
 # ################################################################################################################################
 
@@ -405,6 +481,10 @@ class WorkerStore(_WorkerStoreBase, BrokerMessageReceiver):
             }
         wrapper_config.update(sec_config)
 
+        # Circuit breakers and concurrency limits were added in 3.1, hence optional
+        for name in breaker_config_keys:
+            wrapper_config[name] = config.get(name)
+
         if config.sec_tls_ca_cert_id and config.sec_tls_ca_cert_id != ZATO_NONE:
             tls_verify = get_tls_ca_cert_full_path(self.server.tls_dir, get_tls_from_payload(
                 self.worker_config.tls_ca_cert[config.sec_tls_ca_cert_name].config.value))
@@ -417,7 +497,7 @@ class WorkerStore(_WorkerStoreBase, BrokerMessageReceiver):
         conn_suds = wrapper_config['serialization_type'] == HTTP_SOAP_SERIALIZATION_TYPE.SUDS.id
 
         if conn_soap and conn_suds:
-            wrapper_config['queue_build_cap'] = float(self.server.fs_server_config.misc.queue_build_cap)
+            self._update_queue_build_cap(wrapper_config)
             wrapper = SudsSOAPWrapper(wrapper_config)
             wrapper.build_client_queue()
             return wrapper
@@ -487,7 +567,7 @@ class WorkerStore(_WorkerStoreBase, BrokerMessageReceiver):
                 config = config_attr[name]['config']
                 if isinstance(wrapper, S3Wrapper):
                     self._update_aws_config(config)
-                config.queue_build_cap = float(self.server.fs_server_config.misc.queue_build_cap)
+                self._update_queue_build_cap(config)
                 config_attr[name].conn = wrapper(config, self.server)
                 config_attr[name].conn.build_queue()
 
@@ -739,7 +819,7 @@ class WorkerStore(_WorkerStoreBase, BrokerMessageReceiver):
         for name in names:
             item = config = self.worker_config.out_odoo[name]
             config = item['config']
-            config.queue_build_cap = float(self.server.fs_server_config.misc.queue_build_cap)
+            self._update_queue_build_cap(config)
             item.conn = OdooWrapper(config, self.server)
             item.conn.build_queue()
 
@@ -750,7 +830,7 @@ class WorkerStore(_WorkerStoreBase, BrokerMessageReceiver):
         for name in names:
             item = config = self.worker_config.out_sap[name]
             config = item['config']
-            config.queue_build_cap = float(self.server.fs_server_config.misc.queue_build_cap)
+            self._update_queue_build_cap(config)
             item.conn = SAPWrapper(config, self.server)
             item.conn.build_queue()
 
@@ -1410,6 +1490,7 @@ class WorkerStore(_WorkerStoreBase, BrokerMessageReceiver):
 # ################################################################################################################################
 
     def on_broker_msg_SCHEDULER_JOB_EXECUTED(self, msg, args=None):
+        self.record_job_latency(msg)
         return self.on_message_invoke_service(msg, CHANNEL.SCHEDULER, 'SCHEDULER_JOB_EXECUTED', args)
 
     def on_broker_msg_CHANNEL_ZMQ_MESSAGE_RECEIVED(self, msg, args=None):
@@ -1740,7 +1821,7 @@ class WorkerStore(_WorkerStoreBase, BrokerMessageReceiver):
         self._delete_config_close_wrapper(del_name, config_dict, conn_type, logger.debug)
 
         # .. and create a new one
-        msg['queue_build_cap'] = float(self.server.fs_server_config.misc.queue_build_cap)
+        self._update_queue_build_cap(msg)
         wrapper = wrapper_class(msg, self.server)
         wrapper.build_queue()
 
@@ -1975,6 +2056,11 @@ class WorkerStore(_WorkerStoreBase, BrokerMessageReceiver):
     def on_broker_msg_RBAC_CLIENT_ROLE_DELETE(self, msg):
         self.rbac.delete_client_role(msg.client_def, msg.role_id)
 
+# ################################################################################################################################
+
+    def on_broker_msg_RBAC_DELEGATED_CACHE_DELETE(self, msg):
+        self.request_dispatcher.url_data.rbac_delegated_cache.delete(msg.account)
+
 # ################################################################################################################################
 
     def on_broker_msg_RBAC_ROLE_PERMISSION_CREATE(self, msg):
@@ -58,7 +58,7 @@ class Generic(WorkerImpl):
         item = GenericConnection.from_bunch(msg)
         item_dict = item.to_dict(True)
 
-        item_dict.queue_build_cap = self.server.fs_server_config.misc.queue_build_cap
+        self._update_queue_build_cap(item_dict)
         item_dict.auth_url = msg.address
 
         config_attr = self.generic_conn_api[item.type_]
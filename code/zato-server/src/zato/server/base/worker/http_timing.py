@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from logging import getLogger
+
+# Zato
+from zato.server.base.worker.common import WorkerImpl
+
+# ################################################################################################################################
+
+logger = getLogger(__name__)
+
+# ################################################################################################################################
+
+class HTTPTiming(WorkerImpl):
+    """ Callbacks for messages related to per-stage timing of HTTP requests.
+    """
+
+# ################################################################################################################################
+
+    def on_broker_msg_CHANNEL_HTTP_SOAP_TIMING_SET_CONFIG(self, msg):
+        """ Enables or disables HTTP timing probes at runtime, without a server restart.
+        """
+        self.request_dispatcher.timing.set_config(msg.is_enabled, msg.needs_server_timing)
+
+        if msg.get('needs_clear'):
+            self.request_dispatcher.timing.clear()
+
+# ################################################################################################################################
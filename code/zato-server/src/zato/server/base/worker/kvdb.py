@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# Zato
+from zato.server.base.worker.common import WorkerImpl
+
+# ################################################################################################################################
+
+class KVDB(WorkerImpl):
+    """ Callbacks for messages related to the KVDB.
+    """
+
+# ################################################################################################################################
+
+    def on_broker_msg_KVDB_TRANSLATION_CHANGED(self, msg):
+        """ Updates this process's copy of data dictionary translations that were changed in the KVDB.
+        """
+        self.kvdb.refresh_translations(msg.names)
+
+# ################################################################################################################################
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from logging import getLogger
+from time import time
+from traceback import format_exc
+
+# Zato
+from zato.common.util.metrics import Histogram
+from zato.server.base.worker.common import WorkerImpl
+
+# ################################################################################################################################
+
+logger = getLogger(__name__)
+
+# ################################################################################################################################
+
+class Scheduler(WorkerImpl):
+    """ Callbacks for messages related to jobs fired by the scheduler.
+    """
+
+# ################################################################################################################################
+
+    def on_broker_msg_SCHEDULER_JOB_EXECUTED_BATCH(self, msg):
+        """ Runs all the jobs that the scheduler fired within a single batch window. The jobs are run concurrently
+        though no more of them at a time than the size of the pool of this worker allows for.
+        """
+        for job_msg in msg['jobs']:
+            self.job_batch_pool.spawn(self._run_batch_job, self.preprocess_msg(job_msg))
+
+# ################################################################################################################################
+
+    def _run_batch_job(self, msg):
+        try:
+            self.on_broker_msg_SCHEDULER_JOB_EXECUTED(msg)
+        except Exception:
+            logger.warn('Could not run job `%s` (%s), e:`%s`', msg['name'], msg['cid'], format_exc())
+
+# ################################################################################################################################
+
+    def record_job_latency(self, msg, _time=time):
+        """ Stores how many milliseconds it took for a job to start since the scheduler fired it, including the time
+        it spent waiting in a batch and for a free greenlet in the pool. Note that this relies on the clocks
+        of the scheduler's and server's systems being in sync.
+        """
+        fired_at = msg.get('fired_at')
+
+        # Older schedulers do not send this information
+        if not fired_at:
+            return
+
+        name = msg['name']
+        histogram = self.job_latency.get(name)
+
+        if histogram is None:
+            histogram = self.job_latency[name] = Histogram()
+
+        histogram.add((_time() - fired_at) * 1000)
+
+# ################################################################################################################################
+
+    def get_job_latency(self, name=None):
+        """ Returns firing-to-start latency statistics, in milliseconds, of all the jobs or of a single one by its name.
+        """
+        if name:
+            histogram = self.job_latency.get(name)
+            return histogram.to_dict() if histogram else None
+
+        return dict((job_name, histogram.to_dict()) for job_name, histogram in self.job_latency.items())
+
+# ################################################################################################################################
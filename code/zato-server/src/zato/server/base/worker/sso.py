@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# Zato
+from zato.server.base.worker.common import WorkerImpl
+
+# ################################################################################################################################
+
+class SSO(WorkerImpl):
+    """ Callbacks for messages related to SSO.
+    """
+
+# ################################################################################################################################
+
+    def on_broker_msg_SSO_SESSION_CACHE_DELETE(self, msg):
+        """ Removes sessions that are no longer valid from this process's cache of SSO sessions.
+        """
+        if self.server.sso_api:
+            self.server.sso_api.user.session.on_cache_delete_msg(msg)
+
+# ################################################################################################################################
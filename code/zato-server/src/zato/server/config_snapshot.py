@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime
+from errno import ENOENT
+from tempfile import mkstemp
+from traceback import format_exc
+
+# Python 2/3 compatibility
+from future.moves.pickle import dumps, HIGHEST_PROTOCOL, loads
+
+# Zato
+from zato.common.broker_message import code_to_name
+
+# ################################################################################################################################
+
+logger = logging.getLogger(__name__)
+
+# ################################################################################################################################
+
+# Bumped each time the layout of snapshots changes
+format_version = 1
+
+# Name of the file, in a server's work directory, that snapshots are kept in
+file_name = 'config-snapshot.pickle'
+
+# Broker messages with actions containing any of these parts change configuration of a cluster
+_config_action_parts = ('CREATE', 'EDIT', 'DELETE', 'CHANGE_PASSWORD', 'HOT_DEPLOY')
+
+# ################################################################################################################################
+
+class SnapshotRow(dict):
+    """ A picklable stand-in for an SQL row - its columns can be accessed as attributes, keys or through ._asdict().
+    """
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def _asdict(self):
+        return dict(self)
+
+# ################################################################################################################################
+
+class SnapshotODB(object):
+    """ Wraps an ODB manager so that results of all of its get_* queries are either recorded in a snapshot's results
+    or replayed from them, depending on whether the snapshot was loaded from a file or not. Any query not found
+    in the results is always passed through to the ODB.
+    """
+    def __init__(self, odb, results, is_replay):
+        self.odb = odb
+        self.results = results
+        self.is_replay = is_replay
+
+    def __getattr__(self, name):
+        func = getattr(self.odb, name)
+        return self._wrap(name, func) if name.startswith('get_') else func
+
+    def _wrap(self, name, func):
+        def inner(*args):
+            key = (name,) + args
+
+            if self.is_replay:
+                result = self.results.get(key)
+                if result is not None:
+                    return result[0] if result[1] is None else result
+
+            result = func(*args)
+
+            # Queries that cannot be recorded will be always sent to the ODB
+            if not self.is_replay:
+                try:
+                    self.results[key] = self.to_snapshot(result)
+                except Exception:
+                    logger.info('Could not add `%s` to config snapshot, e:`%s`', key, format_exc())
+
+            return result
+
+        return inner
+
+    @staticmethod
+    def to_snapshot(result):
+        """ Turns a result of a query, with or without its list of columns, into a (rows, columns) tuple,
+        with columns set to None in the former case.
+        """
+        if isinstance(result, tuple):
+            query, columns = result
+        else:
+            query, columns = result, None
+
+        names = list((columns if columns is not None else query.columns).keys())
+        rows = [SnapshotRow((name, getattr(item, name)) for name in names) for item in query]
+
+        return rows, (OrderedDict((name, None) for name in names) if columns is not None else None)
+
+# ################################################################################################################################
+
+class ConfigSnapshot(object):
+    """ Results of ODB queries that a server's worker needs to build its configuration, saved to a file by the first worker
+    of each deployment so that other workers of the same deployment do not need to query the ODB themselves. Secrets are kept
+    in the file as they are in the ODB, i.e. encrypted. A snapshot is deleted each time a broker message changing
+    the configuration of the cluster is received.
+    """
+    def __init__(self, work_dir, deployment_key):
+        self.path = os.path.join(work_dir, file_name)
+        self.deployment_key = deployment_key
+        self.results = {}
+        self.is_loaded = False
+
+    def load(self):
+        """ Loads results from a file, returns True if they could be used by this deployment.
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                data = loads(f.read())
+        except IOError as e:
+            if e.errno != ENOENT:
+                logger.warn('Could not read config snapshot `%s`, e:`%s`', self.path, e)
+            return False
+        except Exception:
+            logger.warn('Could not load config snapshot `%s`, e:`%s`', self.path, format_exc())
+            return False
+
+        if data.get('format_version') != format_version or data.get('deployment_key') != self.deployment_key:
+            return False
+
+        self.results = data['results']
+        self.is_loaded = True
+
+        return True
+
+    def save(self):
+        """ Atomically saves the results recorded so far in a file readable to the server's user only.
+        """
+        data = dumps({
+            'format_version': format_version,
+            'deployment_key': self.deployment_key,
+            'create_time_utc': datetime.utcnow().isoformat(),
+            'results': self.results,
+        }, HIGHEST_PROTOCOL)
+
+        fd, tmp_path = mkstemp(prefix=file_name, dir=os.path.dirname(self.path))
+
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.rename(tmp_path, self.path)
+        except Exception:
+            logger.warn('Could not save config snapshot `%s`, e:`%s`', self.path, format_exc())
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def get_odb(self, odb):
+        return SnapshotODB(odb, self.results, self.is_loaded)
+
+# ################################################################################################################################
+
+    @staticmethod
+    def delete(work_dir):
+        path = os.path.join(work_dir, file_name)
+        try:
+            os.remove(path)
+        except OSError as e:
+            if e.errno != ENOENT:
+                logger.warn('Could not delete config snapshot `%s`, e:`%s`', path, e)
+        else:
+            logger.info('Deleted config snapshot `%s`', path)
+
+    @staticmethod
+    def is_config_msg(msg, _parts=_config_action_parts):
+        action = code_to_name.get(msg.get('action'), '')
+        return any(part in action for part in _parts)
+
+# ################################################################################################################################
@@ -10,6 +10,7 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 # stdlib
 from datetime import datetime, timedelta
+from json import loads
 from logging import getLogger
 from socket import error as socket_error
 from traceback import format_exc
@@ -19,6 +20,7 @@ from amqp.exceptions import ConnectionError as AMQPConnectionError
 
 # gevent
 from gevent import sleep, spawn
+from gevent.pool import Pool
 
 # Kombu
 from kombu import Connection, Consumer as _Consumer, pools, Queue
@@ -29,8 +31,9 @@ from future.utils import itervalues
 from past.builtins import xrange
 
 # Zato
-from zato.common import AMQP, CHANNEL, SECRET_SHADOW, version
+from zato.common import AMQP, CHANNEL, GENERIC, SECRET_SHADOW, version
 from zato.common.util import get_component_name
+from zato.common.util.metrics import Histogram, monotonic
 from zato.server.connection.connector import Connector, Inactive
 
 # ################################################################################################################################
@@ -48,6 +51,8 @@ no_ack = {
     AMQP.ACK_MODE.REJECT.id: True,
 }
 
+_RECEIVED = 'RECEIVED'
+
 # ################################################################################################################################
 
 class _AMQPMessage(object):
@@ -93,10 +98,95 @@ class _AMQPProducers(object):
 
 # ################################################################################################################################
 
+class Acknowledger(object):
+    """ Acknowledges messages that a consumer processed, either one by one or in batches. A batch is confirmed with
+    a single basic.ack with multiple=True for the highest delivery tag below which all messages have been processed.
+    Messages that could not be processed are not acknowledged, just like when they are processed one by one,
+    and messages with higher tags than theirs are confirmed individually since a multiple ack would also cover them.
+    Delivery tags are scoped to an AMQP channel so a new object is needed each time a consumer reconnects.
+    Must be used from a single greenlet - the one that sends acks to the broker.
+    """
+    def __init__(self, batch_size, ack_latency):
+        self.batch_size = batch_size
+        self.ack_latency = ack_latency
+
+        # Delivery tag -> when it was received, for messages that are still being processed
+        self.in_flight = {}
+
+        # Delivery tag -> (message, when it was received), for messages processed but not acknowledged yet
+        self.processed = {}
+
+        # Delivery tags of messages that could not be processed
+        self.failed = set()
+
+    def on_received(self, msg, _monotonic=monotonic):
+        self.in_flight[msg.delivery_tag] = _monotonic()
+
+    def on_processed(self, msg, is_ok=True):
+        tag = msg.delivery_tag
+        received_at = self.in_flight.pop(tag, None)
+
+        if not is_ok:
+            self.failed.add(tag)
+
+        # A service may have acknowledged or rejected the message on its own
+        elif msg._state == _RECEIVED:
+            self.processed[tag] = (msg, received_at)
+
+    def needs_flush(self):
+        return len(self.processed) >= self.batch_size
+
+    def _ack(self, tag, multiple, tags, _monotonic=monotonic):
+        msg, _ = self.processed[tag]
+        msg.ack(multiple=multiple)
+
+        now = _monotonic()
+        for tag in tags:
+            _, received_at = self.processed.pop(tag)
+            self.ack_latency.add((now - received_at) * 1000)
+
+    def flush(self):
+        """ Acknowledges everything that can be acknowledged now.
+        """
+        if not self.processed:
+            return
+
+        # Messages processed whose tags are lower than that of any message still in flight or one that failed
+        blocked_from = min(self.in_flight) if self.in_flight else None
+        if self.failed:
+            min_failed = min(self.failed)
+            blocked_from = min_failed if blocked_from is None else min(blocked_from, min_failed)
+
+        contiguous = [tag for tag in self.processed if blocked_from is None or tag < blocked_from]
+
+        if contiguous:
+            self._ack(max(contiguous), len(contiguous) > 1, contiguous)
+
+        # Nothing above a failed message can be acknowledged with multiple=True anymore
+        if self.failed:
+            for tag in sorted(self.processed):
+                self._ack(tag, False, [tag])
+
+    def get_stats(self):
+        return {
+            'in_flight': len(self.in_flight),
+            'awaiting_ack': len(self.processed),
+            'failed': len(self.failed),
+        }
+
+# ################################################################################################################################
+
 class Consumer(object):
     """ Consumes messages from AMQP queues. There is one Consumer object for each Zato AMQP channel.
+
+    By default, messages are processed one at a time, in the order they were received in, and each one is acknowledged
+    as soon as its service completes. With concurrency greater than one, up to that many messages, though never more than
+    prefetch_count, are processed in parallel by a pool of greenlets, in which case services may complete out of order.
+    With ack_batch_size greater than one, acknowledgements are sent in batches rather than per message, and a batch
+    is sent once at least ack_batch_size messages have been processed or when there are no new messages to process,
+    whichever comes first. In either case, acknowledgements are sent from the consumer's own greenlet only.
     """
-    def __init__(self, config, on_amqp_message):
+    def __init__(self, config, on_amqp_message, _ZATO_ACK_MODE_ACK=AMQP.ACK_MODE.ACK.id):
         # type: (dict, Callable)
         self.config = config
         self.name = self.config.name
@@ -106,12 +196,96 @@ class Consumer(object):
         self.is_stopped = False
         self.is_connected = False # Instance-level flag indicating whether we have an active connection now.
         self.timeout = 0.35
+        self.ack_timeout = 0.05
+
+        # Added in 3.1, hence optional
+        self.concurrency = int(config.get('concurrency') or 1)
+        self.ack_batch_size = int(config.get('ack_batch_size') or 1)
+
+        # There is no point in having more greenlets than messages the broker will send without acknowledgements
+        if config.prefetch_count:
+            self.concurrency = min(self.concurrency, int(config.prefetch_count))
+            self.ack_batch_size = min(self.ack_batch_size, int(config.prefetch_count))
+
+        self.pool = Pool(self.concurrency) if self.concurrency > 1 else None
+
+        # Acknowledgements are sent by the consumer only if they may be sent out of order or in batches,
+        # otherwise they are sent by the connector right after each message is processed.
+        self.needs_acknowledger = config.ack_mode == _ZATO_ACK_MODE_ACK and (self.concurrency > 1 or self.ack_batch_size > 1)
+        self.acknowledger = None
+
+        # Metrics
+        self.ack_latency = Histogram()
+        self.msg_processed = 0
+        self.stats_processed = 0
+        self.stats_time = monotonic()
 
     def _on_amqp_message(self, body, msg):
+        if self.acknowledger:
+            self.acknowledger.on_received(msg)
+
+        if self.pool:
+            self.pool.spawn(self._process_message, self.acknowledger, body, msg)
+        else:
+            self._process_message(self.acknowledger, body, msg)
+
+    def _process_message(self, acknowledger, body, msg):
         try:
-            return self.on_amqp_message(body, msg, self.name, self.config)
+            self.on_amqp_message(body, msg, self.name, self.config, acknowledger)
         except Exception:
             logger.warn(format_exc())
+            if acknowledger:
+                acknowledger.on_processed(msg, False)
+        finally:
+            self.msg_processed += 1
+
+# ################################################################################################################################
+
+    def _get_drain_timeout(self):
+        """ Returns how long to wait for new messages - if any acknowledgements may be due soon, it is not for long.
+        """
+        acknowledger = self.acknowledger
+        if acknowledger and (acknowledger.in_flight or acknowledger.processed):
+            return self.ack_timeout
+        return self.timeout
+
+# ################################################################################################################################
+
+    def _flush_acks(self, needs_flush=False):
+        """ Sends pending acknowledgements, if any, unless needs_flush is True and there are not enough of them yet.
+        """
+        acknowledger = self.acknowledger
+        if acknowledger and (not needs_flush or acknowledger.needs_flush()):
+            try:
+                acknowledger.flush()
+            except Exception:
+                logger.warn('Could not acknowledge messages for channel `%s`, e:`%s`', self.name, format_exc())
+
+# ################################################################################################################################
+
+    def get_stats(self, _monotonic=monotonic):
+        """ Returns metrics of messages processed, including the throughput since the previous call.
+        """
+        now = _monotonic()
+        elapsed = now - self.stats_time
+        msg_per_sec = (self.msg_processed - self.stats_processed) / elapsed if elapsed else 0.0
+
+        self.stats_time = now
+        self.stats_processed = self.msg_processed
+
+        out = {
+            'concurrency': self.concurrency,
+            'ack_batch_size': self.ack_batch_size,
+            'in_flight': len(self.pool) if self.pool else 0,
+            'msg_processed': self.msg_processed,
+            'msg_per_sec': round(msg_per_sec, 2),
+            'ack_latency': self.ack_latency.to_dict(),
+        }
+
+        if self.acknowledger:
+            out.update(self.acknowledger.get_stats())
+
+        return out
 
 # ################################################################################################################################
 
@@ -136,6 +310,10 @@ class Consumer(object):
                         self.config.consumer_tag_prefix, get_component_name('amqp-consumer')))
                 consumer.qos(prefetch_size=0, prefetch_count=self.config.prefetch_count, apply_global=False)
                 consumer.consume()
+
+                # Delivery tags start anew with each channel
+                if self.needs_acknowledger:
+                    self.acknowledger = Acknowledger(self.ack_batch_size, self.ack_latency)
             except Exception:
                 err_conn_attempts += 1
                 noun = 'attempts' if err_conn_attempts > 1 else 'attempt'
@@ -181,9 +359,11 @@ class Consumer(object):
                     # Unfortunately, the only way to check it is to invoke the method and catch AttributeError
                     # if connection is already None.
                     try:
-                        connection.drain_events(timeout=timeout)
+                        connection.drain_events(timeout=self._get_drain_timeout())
                     except AttributeError:
                         consumer = self._get_consumer()
+                    else:
+                        self._flush_acks(True)
 
                 # Special-case AMQP-level connection errors and recreate the connection if any is caught.
                 except AMQPConnectionError:
@@ -196,6 +376,9 @@ class Consumer(object):
                 # as an opportunity to perform the heartbeat.
                 except conn_errors:
 
+                    # No new messages arrived in the meantime so this is a good time to confirm the ones processed so far
+                    self._flush_acks()
+
                     try:
                         connection.heartbeat_check()
                     except Exception:
@@ -221,6 +404,12 @@ class Consumer(object):
                                 consumer = self._get_consumer()
                                 self.is_connected = True
 
+            # Let messages still being processed complete before their acknowledgements are sent
+            if self.pool:
+                self.pool.join(timeout=self.timeout)
+
+            self._flush_acks()
+
             if connection:
                 logger.info('Closing connection for `%s`', consumer)
                 connection.close()
@@ -321,9 +510,10 @@ class ConnectorAMQP(Connector):
 
 # ################################################################################################################################
 
-    def on_amqp_message(self, body, msg, channel_name, channel_config, _AMQPMessage=_AMQPMessage, _CHANNEL_AMQP=CHANNEL.AMQP,
-        _RECEIVED='RECEIVED', _ZATO_ACK_MODE_ACK=AMQP.ACK_MODE.ACK.id):
-        """ Invoked each time a message is taken off an AMQP queue.
+    def on_amqp_message(self, body, msg, channel_name, channel_config, acknowledger=None, _AMQPMessage=_AMQPMessage,
+        _CHANNEL_AMQP=CHANNEL.AMQP, _RECEIVED=_RECEIVED, _ZATO_ACK_MODE_ACK=AMQP.ACK_MODE.ACK.id):
+        """ Invoked each time a message is taken off an AMQP queue. If there is an acknowledger, it is the consumer
+        that will acknowledge the message, otherwise it is done here.
         """
         self.on_message_callback(
             channel_config['service_name'], body, channel=_CHANNEL_AMQP,
@@ -335,7 +525,10 @@ class ConnectorAMQP(Connector):
                 'amqp_msg': msg,
             }})
 
-        if msg._state == _RECEIVED:
+        if acknowledger:
+            acknowledger.on_processed(msg)
+
+        elif msg._state == _RECEIVED:
             if channel_config['ack_mode'] == _ZATO_ACK_MODE_ACK:
                 msg.ack()
             else:
@@ -355,6 +548,12 @@ class ConnectorAMQP(Connector):
 # ################################################################################################################################
 
     def _enrich_channel_config(self, config):
+
+        # Channels read from the ODB have their opaque attributes serialized while those created in run-time do not
+        opaque = config.pop(GENERIC.ATTR_NAME, None)
+        if opaque:
+            config.update(loads(opaque))
+
         config.conn_class = self._get_conn_class('channel/{}'.format(config.name))
         config.conn_url = self.config.conn_url
 
@@ -391,6 +590,16 @@ class ConnectorAMQP(Connector):
         if config.is_active:
             consumer.start()
 
+# ################################################################################################################################
+
+    def get_channel_stats(self, name):
+        """ Returns metrics of all the consumers of a channel.
+        """
+        with self.lock:
+            consumers = self._consumers.get(name) or []
+
+        return [consumer.get_stats() for consumer in consumers]
+
 # ################################################################################################################################
 
     def _create_producers(self, config):
@@ -31,7 +31,7 @@ class SwiftWrapper(object):
 
         self.client = ConnectionQueue(
             self.config.pool_size, self.config.queue_build_cap, self.config.name, 'OpenStack Swift', self.config.auth_url,
-            self.add_client)
+            self.add_client, self.config, self.check_client)
 
         self.update_lock = RLock()
         self.logger = getLogger(self.__class__.__name__)
@@ -40,6 +40,9 @@ class SwiftWrapper(object):
         with self.update_lock:
             self.client.build_queue()
 
+    def check_client(self, conn):
+        conn.head_account()
+
     def add_client(self):
         conn = Connection(authurl=self.config.auth_url, user=self.config.user, key=self.config.key, retries=self.config.retries,
                  snet=self.config.is_snet, starting_backoff=float(self.config.starting_backoff),
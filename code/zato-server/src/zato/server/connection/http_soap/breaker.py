@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+import logging
+from collections import deque
+
+# gevent
+from gevent import Timeout
+from gevent.event import AsyncResult
+
+# Zato
+from zato.common import CircuitOpen, ConcurrencyLimitExceeded
+from zato.common.util.metrics import monotonic
+
+# ################################################################################################################################
+
+logger = logging.getLogger(__name__)
+
+# ################################################################################################################################
+
+# Opaque attributes of outgoing HTTP connections that configure their circuit breakers and concurrency limits
+config_keys = ('circuit_failure_rate', 'circuit_slow_call_time', 'circuit_open_time', 'concurrency_max',
+    'concurrency_latency_target', 'concurrency_queue_timeout')
+
+# How many seconds a circuit stays open before probe requests are let through
+default_open_time = 30
+
+# ################################################################################################################################
+
+class STATE:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+# ################################################################################################################################
+
+class CircuitBreaker(object):
+    """ Stops sending requests to a remote end once too many of the recent ones failed or were too slow. After open_time
+    seconds, a few probe requests are let through and, if all of them succeed, the circuit is closed again.
+    """
+    def __init__(self, name, failure_rate, slow_call_time=0, open_time=default_open_time, min_requests=20, window_size=100,
+            half_open_requests=3):
+        self.name = name
+        self.failure_rate = failure_rate # In percent
+        self.slow_call_time = slow_call_time # In milliseconds, 0 = latency is not taken into account
+        self.open_time = open_time # In seconds
+        self.min_requests = min_requests
+        self.half_open_requests = half_open_requests
+
+        self.state = STATE.CLOSED
+        self.open_until = None
+
+        # True for each failed request among window_size most recent ones
+        self.outcomes = deque(maxlen=window_size)
+        self.window_failures = 0
+
+        self.half_open_in_flight = 0
+        self.half_open_successes = 0
+
+        # Counters
+        self.requests = 0
+        self.failures = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+# ################################################################################################################################
+
+    def enter(self, cid, _monotonic=monotonic):
+        """ Raises CircuitOpen if a request cannot be sent to the remote end at this time.
+        """
+        if self.state == STATE.OPEN:
+            if _monotonic() < self.open_until:
+                self.rejected += 1
+                raise CircuitOpen(cid, 'Circuit breaker of `{}` is open'.format(self.name))
+            else:
+                self._set_state(STATE.HALF_OPEN)
+
+        if self.state == STATE.HALF_OPEN:
+            if self.half_open_in_flight >= self.half_open_requests:
+                self.rejected += 1
+                raise CircuitOpen(cid, 'Circuit breaker of `{}` is half-open'.format(self.name))
+            self.half_open_in_flight += 1
+
+    def cancel(self):
+        """ Called if a request was let through by .enter but eventually it was not sent.
+        """
+        if self.state == STATE.HALF_OPEN:
+            self.half_open_in_flight = max(0, self.half_open_in_flight - 1)
+
+    def exit(self, is_ok, duration):
+        """ Records an outcome of a request, duration is in milliseconds.
+        """
+        is_failure = not is_ok or bool(self.slow_call_time and duration > self.slow_call_time)
+
+        self.requests += 1
+        if is_failure:
+            self.failures += 1
+
+        if self.state == STATE.HALF_OPEN:
+            self.half_open_in_flight = max(0, self.half_open_in_flight - 1)
+
+            if is_failure:
+                self._set_state(STATE.OPEN)
+            else:
+                self.half_open_successes += 1
+                if self.half_open_successes >= self.half_open_requests:
+                    self._set_state(STATE.CLOSED)
+
+        elif self.state == STATE.CLOSED:
+
+            # The oldest outcome is about to be pushed out of the window
+            if len(self.outcomes) == self.outcomes.maxlen and self.outcomes[0]:
+                self.window_failures -= 1
+
+            self.outcomes.append(is_failure)
+            self.window_failures += is_failure
+
+            if len(self.outcomes) >= self.min_requests:
+                if self.window_failures * 100.0 / len(self.outcomes) >= self.failure_rate:
+                    self._set_state(STATE.OPEN)
+
+# ################################################################################################################################
+
+    def _set_state(self, state, _monotonic=monotonic):
+        logger.info('Circuit breaker of `%s` changed state from `%s` to `%s`', self.name, self.state, state)
+
+        self.state = state
+        self.half_open_in_flight = 0
+        self.half_open_successes = 0
+
+        if state == STATE.OPEN:
+            self.times_opened += 1
+            self.open_until = _monotonic() + self.open_time
+
+        elif state == STATE.CLOSED:
+            self.outcomes.clear()
+            self.window_failures = 0
+
+# ################################################################################################################################
+
+    def get_stats(self):
+        return {
+            'circuit_state': self.state,
+            'circuit_requests': self.requests,
+            'circuit_failures': self.failures,
+            'circuit_rejected': self.rejected,
+            'circuit_times_opened': self.times_opened,
+            'circuit_window_failure_rate': (self.window_failures * 100.0 / len(self.outcomes)) if self.outcomes else 0.0,
+        }
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class ConcurrencyLimiter(object):
+    """ Limits the number of requests sent to a remote end concurrently. The limit is adjusted in the AIMD fashion -
+    it grows by one for each limit's worth of successful requests and it is cut by backoff_ratio each time a request
+    fails or exceeds latency_target milliseconds. Requests above the limit wait up to queue_timeout seconds for a free slot,
+    in the order they arrived in, and are rejected afterwards.
+    """
+    def __init__(self, name, max_limit, latency_target=0, queue_timeout=0, min_limit=1, backoff_ratio=0.9):
+        self.name = name
+        self.max_limit = max_limit
+        self.min_limit = min(min_limit, max_limit)
+        self.latency_target = latency_target # In milliseconds, 0 = latency is not taken into account
+        self.queue_timeout = queue_timeout # In seconds, 0 = requests above the limit are rejected immediately
+        self.backoff_ratio = backoff_ratio
+
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.waiters = deque()
+
+        # Counters
+        self.requests = 0
+        self.rejected = 0
+        self.times_decreased = 0
+
+# ################################################################################################################################
+
+    def acquire(self, cid):
+        """ Obtains a slot for a request or raises ConcurrencyLimitExceeded if none became available in time.
+        """
+        if not self.waiters and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return
+
+        if self.queue_timeout:
+            waiter = AsyncResult()
+            self.waiters.append(waiter)
+            is_taken = False
+
+            try:
+                waiter.get(timeout=self.queue_timeout)
+                is_taken = True
+                return
+
+            except Timeout:
+
+                # A slot may have been handed over right before the timeout fired
+                if waiter.ready():
+                    is_taken = True
+                    return
+
+            finally:
+                # Whether it was a timeout or anything else, e.g. our greenlet was killed, we cannot leave the waiter
+                # behind because a slot handed over to it would never be released.
+                if not is_taken:
+                    self._discard_waiter(waiter)
+
+        self.rejected += 1
+        raise ConcurrencyLimitExceeded(cid, 'Concurrency limit of `{}` reached ({}/{}, waiting:{})'.format(
+            self.name, self.in_flight, int(self.limit), len(self.waiters)))
+
+    def release(self, is_ok, duration):
+        """ Gives a slot back and adjusts the limit depending on an outcome of the request, duration is in milliseconds.
+        """
+        self.in_flight -= 1
+        self.requests += 1
+
+        if not is_ok or (self.latency_target and duration > self.latency_target):
+            limit = max(self.min_limit, self.limit * self.backoff_ratio)
+            if int(limit) < int(self.limit):
+                self.times_decreased += 1
+            self.limit = limit
+        else:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+        self._hand_over()
+
+    def _hand_over(self):
+        """ Hands over free slots to waiting requests, if there are any.
+        """
+        while self.waiters and self.in_flight < int(self.limit):
+            waiter = self.waiters.popleft()
+            if not waiter.ready():
+                self.in_flight += 1
+                waiter.set(True)
+
+    def _discard_waiter(self, waiter):
+        """ Removes a waiter that will not send its request anymore, giving back the slot that may have been handed over to it.
+        """
+        try:
+            self.waiters.remove(waiter)
+        except ValueError:
+            pass # Already popped by self._hand_over
+
+        if waiter.successful():
+            self.in_flight -= 1
+            self._hand_over()
+
+# ################################################################################################################################
+
+    def get_stats(self):
+        return {
+            'concurrency_limit': int(self.limit),
+            'concurrency_in_flight': self.in_flight,
+            'concurrency_waiters': len(self.waiters),
+            'concurrency_requests': self.requests,
+            'concurrency_rejected': self.rejected,
+            'concurrency_times_decreased': self.times_decreased,
+        }
+
+# ################################################################################################################################
@@ -38,6 +38,7 @@ from zato.common import CHANNEL, DATA_FORMAT, HTTP_RESPONSES, SEC_DEF_TYPE, SIMP
 from zato.common.util import payload_from_request
 from zato.server.connection.http_soap import BadRequest, ClientHTTPError, Forbidden, MethodNotAllowed, NotFound, \
      TooManyRequests, Unauthorized
+from zato.server.connection.http_soap.timing import STAGE, TimingStore
 from zato.server.service.internal import AdminService
 
 # ################################################################################################################################
@@ -158,13 +159,14 @@ class RequestDispatcher(object):
     """ Dispatches all the incoming HTTP/SOAP requests to appropriate handlers.
     """
     def __init__(self, url_data=None, security=None, request_handler=None, simple_io_config=None, return_tracebacks=None,
-            default_error_message=None):
+            default_error_message=None, timing=None):
         self.url_data = url_data
         self.security = security
         self.request_handler = request_handler
         self.simple_io_config = simple_io_config
         self.return_tracebacks = return_tracebacks
         self.default_error_message = default_error_message
+        self.timing = timing or TimingStore()
 
 # ################################################################################################################################
 
@@ -195,12 +197,18 @@ class RequestDispatcher(object):
 
     def dispatch(self, cid, req_timestamp, wsgi_environ, worker_store, _status_response=status_response,
         no_url_match=(None, False), _response_404=response_404, _has_debug=_has_debug,
-        _http_soap_action='HTTP_SOAPACTION', _stringio=StringIO, _gzipfile=GzipFile):
+        _http_soap_action='HTTP_SOAPACTION', _stringio=StringIO, _gzipfile=GzipFile, _stage=STAGE):
         """ Base method for dispatching incoming HTTP/SOAP messages. If the security
         configuration is one of the technical account or HTTP basic auth,
         the security validation is being performed. Otherwise, that step
         is postponed until a concrete transport-specific handler is invoked.
         """
+        # Per-stage timing probes are only taken if enabled - otherwise, timing is None and each probe is a single if
+        if self.timing.is_enabled:
+            timing = wsgi_environ['zato.http.timing'] = self.timing.new_request_timing()
+        else:
+            timing = None
+
         # Needed in later steps
         path_info = wsgi_environ['PATH_INFO'] if PY3 else wsgi_environ['PATH_INFO'].decode('utf8')
 
@@ -215,6 +223,9 @@ class RequestDispatcher(object):
         # Credentials are checked in a call to self.url_data.check_security
         url_match, channel_item = self.url_data.match(path_info, soap_action, bool(soap_action))
 
+        if timing:
+            timing.mark(_stage.URL_MATCH)
+
         if _has_debug and channel_item:
             logger.debug('url_match:`%r`, channel_item:`%r`', url_match, sorted(channel_item.items()))
 
@@ -223,6 +234,9 @@ class RequestDispatcher(object):
 
         payload = wsgi_environ['wsgi.input'].read()
 
+        if timing:
+            timing.mark(_stage.BODY_READ)
+
         # OK, we can possibly handle it
         if url_match not in no_url_match:
 
@@ -267,6 +281,9 @@ class RequestDispatcher(object):
                 # This is handy if someone invoked URLData's OAuth API manually
                 wsgi_environ['zato.oauth.post_data'] = post_data
 
+                if timing:
+                    timing.mark(_stage.SECURITY)
+
                 # OK, no security exception at that point means we can finally invoke the service.
                 response = self.request_handler.handle(cid, url_match, channel_item, wsgi_environ,
                     payload, worker_store, self.simple_io_config, post_data, path_info, soap_action)
@@ -285,6 +302,9 @@ class RequestDispatcher(object):
 
                     wsgi_environ['zato.http.response.headers']['Content-Encoding'] = 'gzip'
 
+                if timing:
+                    timing.mark(_stage.RESPONSE)
+
                 # Finally return payload to the client
                 return response.payload
 
@@ -475,9 +495,11 @@ class RequestHandler(object):
 # ################################################################################################################################
 
     def handle(self, cid, url_match, channel_item, wsgi_environ, raw_request, worker_store, simple_io_config, post_data,
-            path_info, soap_action, channel_type=CHANNEL.HTTP_SOAP, _response_404=response_404):
+            path_info, soap_action, channel_type=CHANNEL.HTTP_SOAP, _response_404=response_404, _stage=STAGE):
         """ Create a new instance of a service and invoke it.
         """
+        timing = wsgi_environ.get('zato.http.timing')
+
         service, is_active = self.server.service_store.new_instance(channel_item.service_impl_name)
         if not is_active:
             logger.warn('Could not invoke an inactive service:`%s`, cid:`%s`', service.get_name(), cid)
@@ -491,6 +513,10 @@ class RequestHandler(object):
         # If caching is configured for this channel, we need to first check if there is no response already
         if channel_item['cache_type']:
             cache_key, response = self.get_response_from_cache(service, raw_request, channel_item, channel_params, wsgi_environ)
+
+            if timing:
+                timing.mark(_stage.CACHE)
+
             if response:
                 return response
 
@@ -509,6 +535,9 @@ class RequestHandler(object):
         if channel_item['cache_type']:
             self.set_response_in_cache(channel_item, cache_key, response)
 
+            if timing:
+                timing.mark(_stage.CACHE)
+
         # Having used the cache or not, we can return the response now
         return response
 
@@ -10,6 +10,7 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 # stdlib
 from copy import deepcopy
+from http.client import INTERNAL_SERVER_ERROR
 from datetime import datetime
 from io import StringIO
 from json import loads
@@ -38,6 +39,9 @@ from zato.common import CONTENT_TYPE, DATA_FORMAT, Inactive, SEC_DEF_TYPE, soape
      URL_TYPE, ZATO_NONE
 from zato.common.util import get_component_name
 from zato.common.util.json_ import dumps
+from zato.common.util.metrics import monotonic
+from zato.server.connection.http_soap.breaker import CircuitBreaker, ConcurrencyLimiter, \
+     default_open_time as default_circuit_open_time
 from zato.server.connection.queue import ConnectionQueue
 
 # ################################################################################################################################
@@ -75,6 +79,11 @@ class BaseHTTPSOAPWrapper(object):
         self.path_params = []
         self.base_headers = {}
 
+        # Both are optional and configured through opaque attributes of the connection
+        self.circuit_breaker = None
+        self.concurrency_limiter = None
+        self.set_limits()
+
         # API keys
         if self.config['sec_type'] == SEC_DEF_TYPE.APIKEY:
             username = self.config.get('orig_username')
@@ -90,17 +99,80 @@ class BaseHTTPSOAPWrapper(object):
         verify = False if self.config.get('tls_verify', ZATO_NONE) == ZATO_NONE else self.config['tls_verify']
         verify = verify if isinstance(verify, bool) else verify.encode('utf-8')
 
+        circuit_breaker = self.circuit_breaker
+        concurrency_limiter = self.concurrency_limiter
+
+        # Both will raise an exception if the request should not be sent
+        if circuit_breaker:
+            circuit_breaker.enter(cid)
+
+        if concurrency_limiter:
+            try:
+                concurrency_limiter.acquire(cid)
+            except Exception:
+                if circuit_breaker:
+                    circuit_breaker.cancel()
+                raise
+
+        start = monotonic()
+        is_ok = False
+
         try:
 
             # Suds connections don't have requests_auth
             auth = getattr(self, 'requests_auth', None)
 
-            return self.session.request(
+            response = self.session.request(
                 method, address, data=data, auth=auth, headers=headers, hooks=hooks,
                 cert=cert, verify=verify, timeout=self.config['timeout'], *args, **kwargs)
+            is_ok = response.status_code < INTERNAL_SERVER_ERROR
+
+            return response
+
         except RequestsTimeout:
             raise TimeoutException(cid, format_exc())
 
+        finally:
+            if circuit_breaker or concurrency_limiter:
+                duration = (monotonic() - start) * 1000
+
+                if concurrency_limiter:
+                    concurrency_limiter.release(is_ok, duration)
+
+                if circuit_breaker:
+                    circuit_breaker.exit(is_ok, duration)
+
+    def set_limits(self):
+        """ Creates a circuit breaker and a concurrency limiter if they are configured for this connection.
+        """
+        def _get(name):
+            value = self.config.get(name)
+            return float(value) if value not in (None, '') else 0
+
+        circuit_failure_rate = _get('circuit_failure_rate')
+        concurrency_max = int(_get('concurrency_max'))
+
+        if circuit_failure_rate:
+            self.circuit_breaker = CircuitBreaker(self.config['name'], circuit_failure_rate,
+                _get('circuit_slow_call_time'), _get('circuit_open_time') or default_circuit_open_time)
+
+        if concurrency_max:
+            self.concurrency_limiter = ConcurrencyLimiter(self.config['name'], concurrency_max,
+                _get('concurrency_latency_target'), _get('concurrency_queue_timeout'))
+
+    def get_limits_stats(self):
+        """ Returns state and counters of the connection's circuit breaker and concurrency limiter, if there are any.
+        """
+        out = {}
+
+        if self.circuit_breaker:
+            out.update(self.circuit_breaker.get_stats())
+
+        if self.concurrency_limiter:
+            out.update(self.concurrency_limiter.get_stats())
+
+        return out
+
     def ping(self, cid, _has_debug=has_debug):
         """ Pings a given HTTP/SOAP resource
         """
@@ -421,7 +493,7 @@ class SudsSOAPWrapper(BaseHTTPSOAPWrapper):
         self.conn_type = 'Suds SOAP'
         self.client = ConnectionQueue(
             self.config['pool_size'], self.config['queue_build_cap'], self.config['name'], self.conn_type, self.address,
-            self.add_client)
+            self.add_client, self.config)
 
     def set_auth(self):
         """ Configures the security for requests, if any is to be configured at all.
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+import logging
+
+# Zato
+from zato.common.util.metrics import Histogram, monotonic
+
+# ################################################################################################################################
+
+logger = logging.getLogger(__name__)
+
+# ################################################################################################################################
+
+class STAGE:
+    URL_MATCH = 'url_match'
+    BODY_READ = 'body_read'
+    SECURITY = 'security'
+    RBAC_LOOKUP = 'rbac_lookup'
+    CACHE = 'cache'
+    SIO_PARSE = 'sio_parse'
+    HANDLE = 'handle'
+    SERIALIZE = 'serialize'
+    RESPONSE = 'response'
+    TOTAL = 'total'
+
+# In the order the stages run in - used to build Server-Timing headers in a predictable way
+stage_order = (STAGE.URL_MATCH, STAGE.BODY_READ, STAGE.SECURITY, STAGE.RBAC_LOOKUP, STAGE.CACHE, STAGE.SIO_PARSE,
+    STAGE.HANDLE, STAGE.SERIALIZE, STAGE.RESPONSE, STAGE.TOTAL)
+
+# Requests that could not be matched to any channel are aggregated under this name
+no_channel_name = '-'
+
+# ################################################################################################################################
+
+class RequestTiming(object):
+    """ Collects per-stage durations, in milliseconds, of a single HTTP request. Stages are sequential by default,
+    i.e. each call to .mark measures time elapsed since the previous one, while .add can be used for stages
+    nested in other ones, such as the RBAC lookup which is a part of the security check.
+    """
+    __slots__ = ('start', 'last', 'stages')
+
+    def __init__(self, _monotonic=monotonic):
+        self.start = self.last = _monotonic()
+        self.stages = {}
+
+    def mark(self, stage, _monotonic=monotonic):
+        now = _monotonic()
+        self.stages[stage] = self.stages.get(stage, 0) + (now - self.last) * 1000
+        self.last = now
+
+    def add(self, stage, start, _monotonic=monotonic):
+        self.stages[stage] = self.stages.get(stage, 0) + (_monotonic() - start) * 1000
+
+    def finish(self, _monotonic=monotonic):
+        self.stages[STAGE.TOTAL] = (_monotonic() - self.start) * 1000
+
+    def get_server_timing(self, _stage_order=stage_order):
+        """ Returns a value for the Server-Timing response header.
+        """
+        stages = self.stages
+        return ', '.join('{};dur={:.3f}'.format(name, stages[name]) for name in _stage_order if name in stages)
+
+# ################################################################################################################################
+
+class TimingStore(object):
+    """ Keeps per-channel, per-stage histograms of HTTP request processing times. Each worker process has its own store.
+    When disabled, the only cost on the request path is a check of the .is_enabled flag.
+    """
+    def __init__(self, is_enabled=False, needs_server_timing=False):
+        self.is_enabled = is_enabled
+        self.needs_server_timing = needs_server_timing
+
+        # Channel name -> stage -> Histogram
+        self.channels = {}
+
+# ################################################################################################################################
+
+    def set_config(self, is_enabled, needs_server_timing):
+        self.is_enabled = is_enabled
+        self.needs_server_timing = needs_server_timing
+
+        logger.info('HTTP timing is_enabled:`%s`, needs_server_timing:`%s`', is_enabled, needs_server_timing)
+
+# ################################################################################################################################
+
+    def new_request_timing(self, _RequestTiming=RequestTiming):
+        return _RequestTiming()
+
+# ################################################################################################################################
+
+    def store(self, channel_name, timing, response_headers, _Histogram=Histogram):
+        """ Adds all stages of a completed request to histograms of its channel, optionally returning them to the caller
+        in the Server-Timing header too.
+        """
+        timing.finish()
+
+        channel = self.channels.get(channel_name)
+        if channel is None:
+            channel = self.channels[channel_name] = {}
+
+        for stage, value in timing.stages.items():
+            histogram = channel.get(stage)
+            if histogram is None:
+                histogram = channel[stage] = _Histogram()
+            histogram.add(value)
+
+        if self.needs_server_timing:
+            response_headers['Server-Timing'] = timing.get_server_timing()
+
+# ################################################################################################################################
+
+    def get_stats(self, channel_name=None, _stage_order=stage_order):
+        """ Returns a list of dictionaries, one for each stage of each channel, or of the input one only, if given.
+        """
+        out = []
+
+        for name in sorted(self.channels):
+            if channel_name and name != channel_name:
+                continue
+
+            channel = self.channels[name]
+
+            for stage in _stage_order:
+                histogram = channel.get(stage)
+                if histogram:
+                    item = histogram.to_dict()
+                    item['channel_name'] = name
+                    item['stage'] = stage
+                    out.append(item)
+
+        return out
+
+# ################################################################################################################################
+
+    def clear(self, channel_name=None):
+        if channel_name:
+            self.channels.pop(channel_name, None)
+        else:
+            self.channels.clear()
+
+# ################################################################################################################################
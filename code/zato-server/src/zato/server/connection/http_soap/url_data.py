@@ -31,10 +31,13 @@ from zato.common import DATA_FORMAT, MISC, SEC_DEF_TYPE, URL_TYPE, VAULT, ZATO_N
 from zato.common.broker_message import code_to_name, SECURITY, VAULT as VAULT_BROKER_MSG
 from zato.common.dispatch import dispatcher
 from zato.common.util import parse_tls_channel_security_definition, update_apikey_username_to_channel
+from zato.common.util.metrics import monotonic
 from zato.server.connection.http_soap import Forbidden, Unauthorized
+from zato.server.connection.http_soap.timing import STAGE as TIMING_STAGE
 from zato.server.jwt import JWT
+from zato.server.rbac_ import DelegatedRoleCache
 from zato.url_dispatcher import CyURLData, Matcher
-from linkaform import JWT_LKF_PUB_KEY, LkfQuerys
+from linkaform import LkfQuerys
 
 logger = logging.getLogger(__name__)
 
@@ -74,6 +77,13 @@ class URLData(CyURLData, OAuthDataStore):
         self.vault_conn_api = vault_conn_api
         self.rbac_auth_type_hooks = self.worker.server.fs_server_config.rbac.auth_type_hook
 
+        # Roles of accounts that RBAC-delegated channels look up in LinkaForm - added in 3.1, hence optional
+        rbac_config = self.worker.server.fs_server_config.rbac
+        self.rbac_delegated_cache = DelegatedRoleCache(
+            int(rbac_config.get('delegated_cache_ttl', 60)),
+            int(rbac_config.get('delegated_cache_negative_ttl', 10)),
+            int(rbac_config.get('delegated_cache_max_size', 10000)))
+
         self.sec_config_getter = Bunch()
         self.sec_config_getter[SEC_DEF_TYPE.BASIC_AUTH] = self.basic_auth_get
         self.sec_config_getter[SEC_DEF_TYPE.APIKEY] = self.apikey_get
@@ -243,8 +253,6 @@ class URLData(CyURLData, OAuthDataStore):
         """ Performs the authentication using a JavaScript Web Token (JWT).
         """
         authorization = wsgi_environ.get('HTTP_AUTHORIZATION')
-        logger.info("AUTHORIZATION=" + authorization)
-        logger.info("PRUEBAS=" + str(JWT_LKF_PUB_KEY))
         if not authorization:
             if enforce_auth:
                 msg = 'UNAUTHORIZED path_info:`{}`, cid:`{}`'.format(path_info, cid)
@@ -262,9 +270,8 @@ class URLData(CyURLData, OAuthDataStore):
                 return False
 
         token = authorization.split('Bearer ', 1)[1]
-        logger.info('TOKEN=' + token)
-        result = JWT(self.kvdb, self.odb, self.jwt_secret).validate(sec_def.username, token.encode('utf8'))
-        logger.info("RESULT=" + str(result).decode('utf-8'))
+        result = JWT(self.kvdb, self.odb, self.jwt_secret, self.worker.server.crypto_manager.pool).validate(
+            sec_def.username, token.encode('utf8'))
 
         if not result.valid:
             if enforce_auth:
@@ -528,7 +535,7 @@ class URLData(CyURLData, OAuthDataStore):
 # ################################################################################################################################
 
     def check_rbac_delegated_security(self, sec, cid, channel_item, path_info, payload, wsgi_environ, post_data, worker_store,
-            sep=MISC.SEPARATOR, plain_http=URL_TYPE.PLAIN_HTTP):
+            sep=MISC.SEPARATOR, plain_http=URL_TYPE.PLAIN_HTTP, _monotonic=monotonic, _timing_stage=TIMING_STAGE):
 
         is_allowed = False
         #logger.info("SEC= %s" % sec)
@@ -547,39 +554,43 @@ class URLData(CyURLData, OAuthDataStore):
             logger.error('Invalid HTTP method `%s`, cid:`%s`', http_method, cid)
             raise Forbidden(cid, 'You are not allowed to access this URL\n')
         
-        logger.info("SECURITY PASO 1")
-        lkf = LkfQuerys()
         _bool, account, username, user_id = self.return_data_account(cid, wsgi_environ, path_info)
-        logger.info("BOOL, ACCOUNT, USERNAME = %s, %s, %s" % (_bool, account, username))
+        logger.debug('RBAC-delegated check, account:`%s`, username:`%s`, cid:`%s`', account, username, cid)
 
         if _bool:
-            _list = lkf.get_data(account)
+
+            # The external lookup is timed separately because it is usually the most expensive part of security checks
+            timing = wsgi_environ.get('zato.http.timing')
+            if timing:
+                lookup_start = _monotonic()
+
+            # LkfQuerys objects are not shared between greenlets - if the cache needs to fetch the account's roles,
+            # it is only the bound method of the one greenlet that does it which is invoked.
+            lkf = LkfQuerys()
+
+            _list = self.rbac_delegated_cache.get(account, lkf.get_data)
             service_id = channel_item['service_id']
             check_role_in_services = lkf.role_in_service(_list, service_id, http_method_permission_id)
 
+            if timing:
+                timing.add(_timing_stage.RBAC_LOOKUP, lookup_start)
+
             if check_role_in_services:
                 if user_id is not None:
                     client_def = 'sec_def:::jwt:::{}_{}'.format(username, user_id)
                 else:
                     client_def = 'sec_def:::jwt:::{}'.format(username)
-                logger.info("DEF= %s" % client_def)
                 _, sec_type, sec_name = client_def.split(sep)
-                logger.info("SEP= %s" % _)
-                logger.info("SEC_TYPE= %s" % sec_type)
-                logger.info("SEC_NAME= %s" % sec_name)
                 _sec = Bunch()
                 _sec.is_active = True
                 _sec.transport = plain_http
                 _sec.sec_use_rbac = False
-                logger.info("ANTES DEL 3")
                 _sec.sec_def = self.sec_config_getter[sec_type](sec_name)['config']
 
-                logger.info("SECURITY PASO 3")
                 is_allowed = self.check_security(
                     _sec, cid, channel_item, path_info, payload, wsgi_environ, post_data, worker_store, False)
 
                 if is_allowed:
-                    logger.info("SECURITY PASO 4")
                     self.enrich_with_sec_data(wsgi_environ, _sec.sec_def, sec_type)
         else:
             return False
@@ -623,7 +634,8 @@ class URLData(CyURLData, OAuthDataStore):
         """
         try:
             token = authorization.split('Bearer ', 1)[1]
-            data = JWT(self.kvdb, self.odb, self.jwt_secret).validate_token(token.encode('utf8'))
+            data = JWT(self.kvdb, self.odb, self.jwt_secret, self.worker.server.crypto_manager.pool).validate_token(
+                token.encode('utf8'))
 
             if not data.valid:
                 return False, None
@@ -631,7 +643,7 @@ class URLData(CyURLData, OAuthDataStore):
             return True, data
 
         except Exception as e:
-            logger.info("EXCEPTION_CHECK_DATA_JWT= %s" % str(e))
+            logger.debug('Could not validate JWT, cid:`%s`, e:`%s`', cid, e)
             return False, None
 
 # ################################################################################################################################
@@ -641,7 +653,6 @@ class URLData(CyURLData, OAuthDataStore):
         """
         try:
             authorization = wsgi_environ.get('HTTP_AUTHORIZATION')
-            logger.info("AUTHOR= %s" % authorization)
 
             if authorization.startswith('Bearer '):
                 check, data = self._check_data_jwt(cid, authorization)
@@ -652,7 +663,6 @@ class URLData(CyURLData, OAuthDataStore):
 
                 username = data.token.username
                 if data.token.user_id and data.token.user_id is not None and data.token.user_id is not '':
-                    logger.info("ENTRO USER_ID")
                     user_id = data.token.user_id
                     account = 'account_{}'.format(user_id)
                 else:
@@ -666,8 +676,8 @@ class URLData(CyURLData, OAuthDataStore):
                 raise Unauthorized(cid, msg, 'JWT')
 
         except Exception as e:
-            logger.info("EXCEPTION_RETURN_DATA_ACCOUNT= %s" % str(e))
-            return False, None, None
+            logger.debug('Could not get account data, path_info:`%s`, cid:`%s`, e:`%s`', path_info, cid, e)
+            return False, None, None, None
 
 # ################################################################################################################################
 
@@ -42,9 +42,6 @@ from wsgiref.simple_server import make_server
 # Bunch
 from bunch import bunchify
 
-# Requests
-from requests import post as requests_post
-
 # YAML
 import yaml
 
@@ -62,6 +59,7 @@ from zato.common.util.posix_ipc_ import ConnectorConfigIPC
 from zato.server.connection.jms_wmq.jms import WebSphereMQException, NoMessageAvailableException
 from zato.server.connection.jms_wmq.jms.connection import WebSphereMQConnection
 from zato.server.connection.jms_wmq.jms.core import TextMessage
+from zato.server.connection.jms_wmq.jms.forwarder import MessageForwarder
 
 logger_zato = logging.getLogger('zato')
 
@@ -94,7 +92,8 @@ _http_503 = '{} {}'.format(SERVICE_UNAVAILABLE, responses[SERVICE_UNAVAILABLE])
 
 _path_api = '/api'
 _path_ping = '/ping'
-_paths = (_path_api, _path_ping)
+_path_stats = '/stats'
+_paths = (_path_api, _path_ping, _path_stats)
 
 _cc_failed         = 2    # pymqi.CMQC.MQCC_FAILED
 _rc_conn_broken    = 2009 # pymqi.CMQC.MQRC_CONNECTION_BROKEN
@@ -152,12 +151,6 @@ class IBMMQChannel(object):
         """
         self.keep_running = True
 
-        def _invoke_callback(msg_ctx):
-            try:
-                self.on_message_callback(msg_ctx)
-            except Exception:
-                self.logger.warn('Could not invoke message callback %s', format_exc())
-
         def _impl():
             while self.keep_running:
                 try:
@@ -172,8 +165,11 @@ class IBMMQChannel(object):
                         return
 
                     if msg:
-                        start_new_thread(_invoke_callback, (
-                            _MessageCtx(msg, self.id, self.queue_name, self.service_name, self.data_format),))
+                        try:
+                            self.on_message_callback(
+                                _MessageCtx(msg, self.id, self.queue_name, self.service_name, self.data_format))
+                        except Exception:
+                            self.logger.warn('Could not invoke message callback %s', format_exc())
 
                 except NoMessageAvailableException as e:
                     if self.has_debug:
@@ -260,6 +256,8 @@ class ConnectionContainer(object):
         self.channel_id_to_def_id = {} # Ditto but for channels
         self.outconn_name_to_id = {}   # Maps outgoing connection names to their IDs
 
+        self.forwarder = None
+
         self.set_config()
 
     def set_config(self):
@@ -289,6 +287,12 @@ class ConnectionContainer(object):
 
         self.set_up_logging(logging_config)
 
+        # Added in 3.1, hence optional
+        self.forwarder = MessageForwarder(self.server_address, self.server_auth, self.logger,
+            int(config.get('forward_pool_size', 10)), int(config.get('forward_batch_size', 1)),
+            int(config.get('forward_queue_size', 1000)), int(config.get('forward_stats_interval', 60)))
+        self.forwarder.start()
+
 # ################################################################################################################################
 
     def set_up_logging(self, config):
@@ -314,16 +318,12 @@ class ConnectionContainer(object):
         self.logger.addHandler(wmq_handler)
         self.logger.addHandler(stdout_handler)
 
-# ################################################################################################################################
-
-    def _post(self, msg, _post=requests_post):
-        self.logger.info('POST to `%s` (%s), msg:`%s`', self.server_address, self.username, msg)
-        _post(self.server_address, data=dumps(msg), auth=self.server_auth)
-
 # ################################################################################################################################
 
     def on_mq_message_received(self, msg_ctx):
-        return self._post({
+        """ Hands a message over to the forwarder which will POST it to the server. Blocks if the forwarder's queue is full.
+        """
+        self.forwarder.put({
             'msg': msg_ctx.mq_msg.to_dict(),
             'channel_id': msg_ctx.channel_id,
             'queue_name': msg_ctx.queue_name,
@@ -644,10 +644,13 @@ class ConnectionContainer(object):
     def handle_http_request(self, path, msg, ok=b'OK'):
         """ Dispatches incoming HTTP requests - either reconfigures the connector or puts messages to queues.
         """
-        self.logger.info('MSG received %s %s', path, msg)
+        if self.logger.isEnabledFor(DEBUG):
+            self.logger.debug('MSG received %s %s', path, msg)
 
         if path == _path_ping:
             return Response()
+        elif path == _path_stats:
+            return Response(data=dumps(self.forwarder.get_stats()))
         else:
             msg = msg.decode('utf8')
             msg = loads(msg)
@@ -739,6 +742,7 @@ class ConnectionContainer(object):
             try:
                 # Attempt to clean up, if possible
                 server.shutdown()
+                self.forwarder.stop()
                 for conn in self.connections.values():
                     conn.close()
             except Exception:
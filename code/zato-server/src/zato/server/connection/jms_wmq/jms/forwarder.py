@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from json import loads
+from threading import active_count, local, RLock
+from time import sleep
+from traceback import format_exc
+
+# Requests
+from requests import Session
+
+# Python 2/3 compatibility
+from six.moves.queue import Empty, Queue
+from zato.common.py23_ import start_new_thread
+
+# Zato
+from zato.common.util.json_ import dumps
+from zato.common.util.metrics import monotonic
+
+# ################################################################################################################################
+
+class MessageForwarder(object):
+    """ Forwards messages taken off IBM MQ queues to the server the connector belongs to. Messages are put on a bounded queue
+    that a fixed pool of threads reads from, each thread POST-ing messages through a keep-alive HTTP session of its own.
+    If batch_size is greater than one, a thread takes up to that many messages that are already waiting in the queue
+    and sends them all in a single request, in which case the server replies with a result for each of the messages.
+    Once the queue is full, listeners block until there is room in it again, which means that messages stay in MQ
+    rather than in the connector's memory whenever the server cannot keep up with them.
+    """
+    def __init__(self, address, auth, logger, pool_size=10, batch_size=1, queue_size=1000, stats_interval=60,
+        _Session=Session):
+        self.address = address
+        self.auth = auth
+        self.logger = logger
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+        self.stats_interval = stats_interval
+        self.queue = Queue(queue_size)
+        self.keep_running = False
+        self._Session = _Session
+
+        # Each thread has its own session because they are not safe to share between threads
+        self.local = local()
+
+        # Metrics
+        self.lock = RLock()
+        self.received = 0
+        self.forwarded = 0
+        self.failed = 0
+        self.requests = 0
+        self.stats_forwarded = 0
+        self.stats_time = monotonic()
+
+# ################################################################################################################################
+
+    def start(self):
+        self.keep_running = True
+
+        for _ in range(self.pool_size):
+            start_new_thread(self._run, ())
+
+        if self.stats_interval:
+            start_new_thread(self._log_stats, ())
+
+# ################################################################################################################################
+
+    def stop(self):
+        self.keep_running = False
+
+# ################################################################################################################################
+
+    def put(self, request):
+        """ Enqueues a request to be forwarded to the server, blocking if the queue is full.
+        """
+        self.queue.put(request)
+
+        with self.lock:
+            self.received += 1
+
+# ################################################################################################################################
+
+    def _get_session(self):
+        session = getattr(self.local, 'session', None)
+        if not session:
+            session = self.local.session = self._Session()
+            session.auth = self.auth
+        return session
+
+# ################################################################################################################################
+
+    def _get_batch(self):
+        """ Waits for a request and returns it along with any other ones already waiting in the queue, up to batch_size.
+        """
+        try:
+            batch = [self.queue.get(timeout=1)]
+        except Empty:
+            return []
+
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except Empty:
+                break
+
+        return batch
+
+# ################################################################################################################################
+
+    def _run(self):
+        while self.keep_running:
+            batch = self._get_batch()
+            if batch:
+                try:
+                    self.forward(batch)
+                except Exception:
+                    self.logger.warn('Could not forward %d message(s) to `%s`, e:`%s`',
+                        len(batch), self.address, format_exc())
+                    self._on_forwarded(0, len(batch))
+
+# ################################################################################################################################
+
+    def forward(self, batch):
+        """ Sends one or more requests to the server and records how many of them were processed successfully.
+        """
+        is_batch = len(batch) > 1
+        data = {'batch': batch} if is_batch else batch[0]
+
+        response = self._get_session().post(self.address, data=dumps(data))
+
+        if not response.ok:
+            self.logger.warn('Server returned `%s` for %d message(s), e:`%s`', response.status_code, len(batch), response.text)
+            self._on_forwarded(0, len(batch))
+            return
+
+        if not is_batch:
+            self._on_forwarded(1, 0)
+            return
+
+        ok, failed = 0, 0
+
+        for request, result in zip(batch, loads(response.text)):
+            if result['ok']:
+                ok += 1
+            else:
+                failed += 1
+                self.logger.warn('Message from queue `%s` could not be processed by `%s`, e:`%s`',
+                    request['queue_name'], request['service_name'], result['error'])
+
+        self._on_forwarded(ok, failed)
+
+# ################################################################################################################################
+
+    def _on_forwarded(self, ok, failed):
+        with self.lock:
+            self.requests += 1
+            self.forwarded += ok
+            self.failed += failed
+
+# ################################################################################################################################
+
+    def get_stats(self, _monotonic=monotonic):
+        """ Returns counters of messages forwarded so far, along with the throughput since the previous call.
+        """
+        with self.lock:
+            now = _monotonic()
+            elapsed = now - self.stats_time
+            processed = self.forwarded + self.failed
+
+            msg_per_sec = (processed - self.stats_forwarded) / elapsed if elapsed else 0.0
+
+            self.stats_time = now
+            self.stats_forwarded = processed
+
+            return {
+                'received': self.received,
+                'forwarded': self.forwarded,
+                'failed': self.failed,
+                'requests': self.requests,
+                'queue_size': self.queue.qsize(),
+                'pool_size': self.pool_size,
+                'threads': active_count(),
+                'msg_per_sec': round(msg_per_sec, 2),
+            }
+
+# ################################################################################################################################
+
+    def _log_stats(self):
+        while self.keep_running:
+            sleep(self.stats_interval)
+            self.logger.info('IBM MQ forwarder stats `%s`', self.get_stats())
+
+# ################################################################################################################################
@@ -48,7 +48,8 @@ class OdooWrapper(object):
 
         self.url = '{protocol}://{user}:******@{host}:{port}/{database}'.format(**self.config)
         self.client = ConnectionQueue(
-            self.config.pool_size, self.config.queue_build_cap, self.config.name, 'Odoo', self.url, self.add_client)
+            self.config.pool_size, self.config.queue_build_cap, self.config.name, 'Odoo', self.url, self.add_client,
+            self.config, ping_odoo)
 
         self.update_lock = RLock()
         self.logger = getLogger(self.__class__.__name__)
@@ -10,14 +10,20 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 # stdlib
 import logging
+from collections import deque
 from datetime import datetime, timedelta
 from traceback import format_exc
 
 # gevent
 import gevent
+from gevent import Timeout
+from gevent.event import AsyncResult
 from gevent.lock import RLock
 from gevent.queue import Empty, Queue
 
+# Zato
+from zato.common.util.metrics import Histogram, monotonic
+
 # A set of utilities for constructing greenlets-safe outgoing connection objects.
 # Used, for instance, in SOAP Suds and OpenStack Swift outconns.
 
@@ -25,52 +31,229 @@ logger = logging.getLogger(__name__)
 
 # ################################################################################################################################
 
+# How many seconds to wait for a free connection by default
+default_acquire_timeout = 5.0
+
+# Connections idle for longer than that many seconds are health-checked before being handed out, if there is a function to do it
+default_max_idle_time = 60.0
+
+# Connections older than that many seconds are replaced with new ones, 0 = no limit
+default_max_lifetime = 0.0
+
+# ################################################################################################################################
+
 class _Connection(object):
-    """ Meant to be used as a part of a 'with' block - returns a connection from its queue each time 'with' is entered
-    assuming the queue isn't empty.
+    """ Meant to be used as a part of a 'with' block - returns a connection from its queue each time 'with' is entered,
+    waiting up to the queue's acquire timeout if none is free at the moment.
     """
-    def __init__(self, client_queue, conn_name):
-        self.queue = client_queue
+    def __init__(self, conn_queue, conn_name):
+        self.conn_queue = conn_queue
         self.conn_name = conn_name
         self.client = None
 
     def __enter__(self):
-        try:
-            self.client = self.queue.get(block=False)
-        except Empty:
-            self.client = None
-            msg = 'No free connections to `{}`'.format(self.conn_name)
-            logger.error(msg)
-            raise Exception(msg)
-        else:
-            return self.client
+        self.client = self.conn_queue.acquire()
+        return self.client
 
     def __exit__(self, type, value, traceback):
         if self.client:
-            self.queue.put(self.client)
+            self.conn_queue.release(self.client)
 
 # ################################################################################################################################
 
 class ConnectionQueue(object):
     """ Holds connections to resources. Each time it's called a connection is fetched from its underlying queue
-    assuming any connection is still available.
+    assuming any connection is available within the acquire timeout. Greenlets waiting for a connection are served
+    in the order they started to wait in.
     """
-    def __init__(self, pool_size, queue_build_cap, conn_name, conn_type, address, add_client_func):
+    def __init__(self, pool_size, queue_build_cap, conn_name, conn_type, address, add_client_func, config=None,
+            check_client_func=None):
         self.queue = Queue(pool_size)
         self.queue_build_cap = queue_build_cap
         self.conn_name = conn_name
         self.conn_type = conn_type
         self.address = address
         self.add_client_func = add_client_func
+        self.check_client_func = check_client_func
         self.keep_connecting = True
 
+        config = config or {}
+        self.acquire_timeout = float(config.get('queue_acquire_timeout', default_acquire_timeout))
+        self.max_idle_time = float(config.get('queue_max_idle_time', default_max_idle_time))
+        self.max_lifetime = float(config.get('queue_max_lifetime', default_max_lifetime))
+
+        # Greenlets waiting for a connection, each represented by an AsyncResult to hand a connection over to
+        self.waiters = deque()
+
+        # ID of a client -> [created, last_used]
+        self.client_times = {}
+
+        # Metrics
+        self.in_use = 0
+        self.acquired = 0
+        self.timeouts = 0
+        self.health_check_failures = 0
+        self.expired = 0
+        self.wait_time = Histogram()
+
         self.logger = logging.getLogger(self.__class__.__name__)
 
     def __call__(self):
-        return _Connection(self.queue, self.conn_name)
+        return _Connection(self, self.conn_name)
+
+# ################################################################################################################################
+
+    def acquire(self, timeout=None, _monotonic=monotonic):
+        """ Returns a free connection, waiting up to timeout seconds (or the queue's own acquire timeout) for one.
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        start = _monotonic()
+
+        while True:
+            client = self._get_client(start, timeout)
+            now = _monotonic()
+
+            if self._is_usable(client, now):
+                break
+
+        self.in_use += 1
+        self.acquired += 1
+        self.wait_time.add((now - start) * 1000)
+        self.client_times[id(client)][1] = now
+
+        return client
+
+    def _get_client(self, start, timeout, _monotonic=monotonic):
+
+        # Do not let anyone jump the queue if there are greenlets already waiting
+        if not self.waiters:
+            try:
+                return self.queue.get(block=False)
+            except Empty:
+                pass
+
+        remaining = timeout - (_monotonic() - start)
+
+        if remaining > 0:
+            waiter = AsyncResult()
+            self.waiters.append(waiter)
+            is_taken = False
+
+            try:
+                client = waiter.get(timeout=remaining)
+                is_taken = True
+                return client
+
+            except Timeout:
+
+                # A connection may have been handed over right before the timeout fired
+                if waiter.ready():
+                    client = waiter.get()
+                    is_taken = True
+                    return client
+
+            finally:
+                # Whether it was a timeout or anything else, e.g. our greenlet was killed, we cannot leave the waiter
+                # behind because a connection handed over to it would never make it back to the pool.
+                if not is_taken:
+                    self._discard_waiter(waiter)
+
+        self.timeouts += 1
+        msg = 'No free connections to `{}` after {}s (in use:{}, waiting:{})'.format(
+            self.conn_name, timeout, self.in_use, len(self.waiters))
+        logger.error(msg)
+        raise Exception(msg)
+
+    def _is_usable(self, client, now):
+        """ Returns True if a client has not outlived its max lifetime and, if it has been idle for a while,
+        if it is still healthy. Otherwise, discards the client and starts to build a new one in background.
+        """
+        created, last_used = self.client_times.setdefault(id(client), [now, now])
+
+        if self.max_lifetime and now - created > self.max_lifetime:
+            self.expired += 1
+            self.logger.info('Replacing `%s` client to %s (%s) after %ss', self.conn_name, self.address, self.conn_type,
+                self.max_lifetime)
+            self._replace_client(client)
+            return False
+
+        if self.check_client_func and self.max_idle_time and now - last_used > self.max_idle_time:
+            try:
+                self.check_client_func(client)
+            except Exception:
+                self.health_check_failures += 1
+                self.logger.warn('Replacing `%s` client to %s (%s) after a failed health check, e:`%s`',
+                    self.conn_name, self.address, self.conn_type, format_exc())
+                self._replace_client(client)
+                return False
+
+        return True
+
+    def _replace_client(self, client):
+        self.client_times.pop(id(client), None)
+
+        delete = getattr(client, 'delete', None)
+        if delete:
+            try:
+                delete()
+            except Exception:
+                self.logger.info('Could not delete `%s` client, e:`%s`', self.conn_name, format_exc())
+
+        if self.keep_connecting:
+            gevent.spawn(self.add_client_func)
+
+    def release(self, client):
+        """ Returns a client to the queue or directly to the greenlet that has been waiting for one the longest.
+        """
+        self.in_use -= 1
+        self._hand_over(client)
+
+    def _discard_waiter(self, waiter):
+        """ Removes a waiter that will not use a connection anymore, giving back the one that may have been handed over to it.
+        """
+        try:
+            self.waiters.remove(waiter)
+        except ValueError:
+            pass # Already popped by self._hand_over
+
+        if waiter.successful():
+            self._hand_over(waiter.get())
+
+    def _hand_over(self, client):
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.ready():
+                waiter.set(client)
+                return
 
-    def put_client(self, client):
         self.queue.put(client)
+
+# ################################################################################################################################
+
+    def get_stats(self):
+        """ Returns metrics of the queue as a dictionary.
+        """
+        return {
+            'conn_name': self.conn_name,
+            'conn_type': self.conn_type,
+            'address': self.address,
+            'pool_size': self.queue.maxsize,
+            'idle': self.queue.qsize(),
+            'in_use': self.in_use,
+            'waiters': len(self.waiters),
+            'acquired': self.acquired,
+            'timeouts': self.timeouts,
+            'health_check_failures': self.health_check_failures,
+            'expired': self.expired,
+            'wait_time': self.wait_time.to_dict(),
+        }
+
+# ################################################################################################################################
+
+    def put_client(self, client, _monotonic=monotonic):
+        now = _monotonic()
+        self.client_times[id(client)] = [now, now]
+        self._hand_over(client)
         self.logger.info('Added `%s` client to %s (%s)', self.conn_name, self.address, self.conn_type)
 
     def _build_queue(self):
@@ -144,7 +327,7 @@ class Wrapper(object):
 
         self.client = ConnectionQueue(
             self.config.pool_size, self.config.queue_build_cap, self.config.name, self.conn_type, self.config.auth_url,
-            self.add_client)
+            self.add_client, self.config)
 
         self.delete_requested = False
         self.update_lock = RLock()
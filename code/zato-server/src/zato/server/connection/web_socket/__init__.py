@@ -39,11 +39,14 @@ from zato.common import CHANNEL, DATA_FORMAT, ParsingException, PUBSUB, SEC_DEF_
 from zato.common.exception import Reportable
 from zato.common.pubsub import HandleNewMessageCtx, MSG_PREFIX, PubSubMessage
 from zato.common.util import new_cid
+from zato.common.util.metrics import Histogram
 from zato.common.util.hook import HookTool
 from zato.common.util.wsx import cleanup_wsx_client
 from zato.server.connection.connector import Connector
 from zato.server.connection.web_socket.msg import AuthenticateResponse, InvokeClientRequest, ClientMessage, copy_forbidden, \
-     error_response, ErrorResponse, Forbidden, OKResponse, InvokeClientPubSubRequest
+     error_response, ErrorResponse, Forbidden, OKResponse, InvokeClientPubSubRequest, PubSubBodyCache
+from zato.server.connection.web_socket.outbound import depth_buckets, OutboundQueue
+from zato.server.connection.web_socket.pending import PendingResponses
 from zato.server.pubsub.task import PubSubTool
 from zato.vault.client import VAULT
 
@@ -214,8 +217,13 @@ class WebSocket(_WebSocket):
         for name in _wsgi_drop_keys:
             self.initial_http_wsgi_environ.pop(name, None)
 
-        # Responses to previously sent requests - keyed by request IDs
-        self.responses_received = {}
+        # Requests sent to the client that await its responses, shared by all the connections of this channel
+        self.pending_responses = self.container.pending_responses
+
+        # Pub/sub messages waiting to be sent to the client
+        self.outbound = OutboundQueue(self.send, self.container.outbound_depth,
+            self.config.get('outbound_queue_max_size', 100), self.config.get('outbound_queue_put_timeout', 5),
+            self.on_outbound_error)
 
         _local_address = self.sock.getsockname()
         self._local_address = '{}:{}'.format(_local_address[0], _local_address[1])
@@ -303,25 +311,15 @@ class WebSocket(_WebSocket):
             # Are we to invoke the services this time?
             if needs_services:
 
-                now_formatted = now.isoformat()
-
-                pub_sub_request = {
-                    'sub_key': self.pubsub_tool.get_sub_keys(),
-                    'last_interaction_time': now_formatted,
-                    'last_interaction_type': self.last_interact_source,
-                    'last_interaction_details': self.get_peer_info_pretty(),
-                }
+                # The metadata is not stored right away, it is collected from all connections of this server
+                # and stored in the ODB for all of them at once.
+                metadata_writer = self.config.parallel_server.worker_store.wsx_metadata_writer
 
-                wsx_request = {
-                    'id': self.sql_ws_client_id,
-                    'last_seen': now_formatted,
-                }
+                metadata_writer.set_interaction(
+                    self.pubsub_tool.get_sub_keys(), now, self.last_interact_source, self.get_peer_info_pretty())
 
-                logger.info('Setting pub/sub interaction metadata `%s`', pub_sub_request)
-                self.invoke_service('zato.pubsub.subscription.update-interaction-metadata', pub_sub_request)
-
-                logger.info('Setting WSX last seen `%s`', wsx_request)
-                self.invoke_service('zato.channel.web-socket.client.set-last-seen', wsx_request)
+                if self.sql_ws_client_id:
+                    metadata_writer.set_last_seen(self.sql_ws_client_id, now)
 
                 # Finally, store it for the future use
                 self.interact_last_updated = now
@@ -329,7 +327,8 @@ class WebSocket(_WebSocket):
 # ################################################################################################################################
 
     def deliver_pubsub_msg(self, sub_key, msg):
-        """ Delivers one or more pub/sub messages to the connected WSX client.
+        """ Delivers one or more pub/sub messages to the connected WSX client. Messages are only enqueued for sending -
+        an AsyncResult is returned which delivery tasks wait on before they confirm that the messages were delivered.
         """
         ctx = {}
 
@@ -339,32 +338,50 @@ class WebSocket(_WebSocket):
             len_msg = len(msg)
             msg = msg[0] if len_msg == 1 else msg
 
+        # Parts of messages that are common to all of their subscribers are serialized only once
+        # and then attributes specific to our own subscriber are spliced into them.
+        get_body = self.container.pubsub_body_cache.get_body
+
         # A list of messages is given on input so we need to serialize each of them individually
         if isinstance(msg, list):
             cid = new_cid()
             data = []
             for elem in msg:
-                data.append(elem.serialized if elem.serialized else elem.to_external_dict())
+                data.append(get_body(elem))
                 if elem.reply_to_sk:
                     ctx_reply_to_sk = ctx.setdefault('', [])
                     ctx_reply_to_sk.append(elem.reply_to_sk)
+            data = '[{}]'.format(','.join(data))
 
         # A single message was given on input
         else:
             cid = msg.pub_msg_id
-            data = msg.serialized if msg.serialized else msg.to_external_dict()
+            data = get_body(msg)
             if msg.reply_to_sk:
                 ctx['reply_to_sk'] = msg.reply_to_sk
 
-        logger.info('Delivering %d pub/sub message{} to sub_key `%s` (ctx:%s)'.format('s' if len_msg > 1 else ''),
-            len_msg, sub_key, ctx)
+        serialized = InvokeClientPubSubRequest(cid, None, ctx).serialize_with_data(data)
 
-        # Actually deliver messages
-        self.invoke_client(cid, data, ctx=ctx, _Class=InvokeClientPubSubRequest)
+        logger.info('Delivering %d pub/sub message{} to sub_key `%s` (ctx:%s, len:%d, cid:%s)'.format(
+            's' if len_msg > 1 else ''), len_msg, sub_key, ctx, len(serialized), cid)
+
+        # Actually deliver messages - they are sent by the connection's own greenlet, in the order they were enqueued in,
+        # and errors are set in the AsyncResult returned. Note that this raises gevent.queue.Full if the client
+        # cannot keep up with what is sent to it, in which case the delivery task retries later.
+        result = self.outbound.put(serialized)
 
         # We get here if there was no exception = we can update pub/sub metadata
         self.set_last_interaction_data('pubsub.deliver_pubsub_msg')
 
+        return result
+
+# ################################################################################################################################
+
+    def on_outbound_error(self, data, e):
+        """ Invoked by self.outbound if data enqueued in it could not be sent to the client.
+        """
+        logger.warn('Could not send data to `%s`, len:%d, e:`%s`', self.peer_conn_info_pretty, len(data), e)
+
 # ################################################################################################################################
 
     def add_sub_key(self, sub_key):
@@ -781,17 +798,9 @@ class WebSocket(_WebSocket):
                 request['msg'] = msg
                 hook(**request)
 
-        # Regular synchronous response, simply enqueue it and someone else will take care of it
+        # Regular synchronous response, hand it over to whoever is waiting for it
         else:
-            self.responses_received[msg.in_reply_to] = msg
-
-    def _has_client_response(self, request_id):
-        return self.responses_received.get(request_id)
-
-    def _wait_for_client_response(self, request_id, wait_time=5):
-        """ Wait until a response from client arrives and return it or return None if there is no response up to wait_time.
-        """
-        return self._wait_for_event(wait_time, self._has_client_response, request_id=request_id)
+            self.pending_responses.set_response(self.pub_client_id, msg.in_reply_to, msg)
 
 # ################################################################################################################################
 
@@ -907,19 +916,29 @@ class WebSocket(_WebSocket):
         msg = _Class(cid, request, ctx)
         serialized = msg.serialize()
 
+        # Pub/sub messages are always asynchronous and that channel's WSX hook will process the response, if any arrives,
+        # but for anything else we will be waiting for a response so we need to say so before anything is sent.
+        needs_response = _Class is not InvokeClientPubSubRequest
+
+        if needs_response:
+            result = self.pending_responses.register(self.pub_client_id, msg.id)
+
         # Log what is about to be sent
         if use_send:
             logger.info('Sending message `%s` from `%s` to `%s` `%s` `%s` `%s`', serialized,
                 self.python_id, self.pub_client_id, self.ext_client_id, self.ext_client_name, self.peer_conn_info_pretty)
 
         # Actually send the message now
-        (self.send if use_send else self.ping)(serialized)
+        try:
+            (self.send if use_send else self.ping)(serialized)
+        except Exception:
+            if needs_response:
+                self.pending_responses.discard(self.pub_client_id, msg.id)
+            raise
 
-        # Wait for response but only if it is not a pub/sub message,
-        # these are always asynchronous and that channel's WSX hook
-        # will process the response, if any arrives.
-        if _Class is not InvokeClientPubSubRequest:
-            response = self._wait_for_client_response(msg.id, timeout)
+        # Wait for response but only if it is not a pub/sub message
+        if needs_response:
+            response = self.pending_responses.wait(self.pub_client_id, msg.id, result, timeout)
             if response:
                 return response if isinstance(response, bool) else response.data # It will be bool in pong responses
 
@@ -930,6 +949,7 @@ class WebSocket(_WebSocket):
             self._peer_address, self._peer_fqdn, self._local_address, self.config.name, self.ext_client_id,
             self.pub_client_id, ' {})'.format(self.ext_client_name) if self.ext_client_name else ')')
 
+        self.outbound.stop()
         self.unregister_auth_client()
         del self.container.clients[self.pub_client_id]
 
@@ -967,7 +987,7 @@ class WebSocket(_WebSocket):
         # Pretend it's an actual response from the client,
         # we cannot use in_reply_to because pong messages are 1:1 copies of ping ones.
         # TODO: Use lxml for XML eventually but for now we are always using JSON
-        self.responses_received[_loads(msg.data.decode('utf8'))['meta']['id']] = True
+        self.pending_responses.set_response(self.pub_client_id, _loads(msg.data.decode('utf8'))['meta']['id'], True)
 
         # Since we received a pong response, it means that the peer is connected,
         # in which case we update its pub/sub metadata.
@@ -1008,6 +1028,13 @@ class WebSocketContainer(WebSocketWSGIApplication):
     def __init__(self, config, *args, **kwargs):
         self.config = config
         self.clients = {}
+        self.pending_responses = PendingResponses()
+
+        # Pub/sub messages are serialized only once for all the clients of this channel they are delivered to
+        self.pubsub_body_cache = PubSubBodyCache()
+
+        # How many pub/sub messages were waiting to be sent to a client each time a new one was enqueued for it
+        self.outbound_depth = Histogram(depth_buckets)
         super(WebSocketContainer, self).__init__(*args, **kwargs)
 
     def make_websocket(self, sock, protocols, extensions, environ):
@@ -1042,6 +1069,15 @@ class WebSocketContainer(WebSocketWSGIApplication):
     def get_client_by_pub_id(self, pub_client_id):
         return self.clients[pub_client_id]
 
+    def get_pending_responses_stats(self):
+        return self.pending_responses.get_stats()
+
+    def get_outbound_stats(self):
+        return {
+            'depth': self.outbound_depth.to_dict(),
+            'body_cache': self.pubsub_body_cache.get_stats(),
+        }
+
 # ################################################################################################################################
 
 class WebSocketServer(WSGIServer):
@@ -1103,6 +1139,12 @@ class WebSocketServer(WSGIServer):
     def get_client_by_pub_id(self, pub_client_id):
         return self.application.get_client_by_pub_id(pub_client_id)
 
+    def get_pending_responses_stats(self):
+        return self.application.get_pending_responses_stats()
+
+    def get_outbound_stats(self):
+        return self.application.get_outbound_stats()
+
 # ################################################################################################################################
 
 class ChannelWebSocket(Connector):
@@ -1133,4 +1175,16 @@ class ChannelWebSocket(Connector):
     def get_client_by_pub_id(self, pub_client_id):
         return self.server.get_client_by_pub_id(pub_client_id)
 
+    def get_pending_responses_stats(self):
+        """ Returns the number of requests sent to clients of this channel that await responses, how many of them timed out,
+        how many responses arrived too late and round-trip times of requests.
+        """
+        return self.server.get_pending_responses_stats()
+
+    def get_outbound_stats(self):
+        """ Returns depths of queues of pub/sub messages waiting to be sent to clients of this channel
+        and statistics of the cache of serialized messages.
+        """
+        return self.server.get_outbound_stats()
+
 # ################################################################################################################################
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from logging import getLogger
+from traceback import format_exc
+
+# gevent
+from gevent import sleep, spawn
+
+# Zato
+from zato.common.util import grouper
+
+# ################################################################################################################################
+
+logger = getLogger('zato_web_socket')
+
+# ################################################################################################################################
+
+class MetadataWriter(object):
+    """ Collects last-seen and pub/sub interaction metadata of all the WebSocket connections of a server
+    and stores it in the ODB every flush_interval seconds, using one UPDATE statement per batch of up to max_batch_size rows
+    rather than a transaction per connection. If a connection reports its metadata more than once between flushes,
+    only the most recent values are stored.
+    """
+    def __init__(self, invoke, flush_interval=5, max_batch_size=1000):
+        self.invoke = invoke
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        self.is_running = False
+
+        # WSX client ID -> last seen
+        self.last_seen = {}
+
+        # Sub key -> last interaction metadata
+        self.interaction = {}
+
+# ################################################################################################################################
+
+    def set_last_seen(self, ws_client_id, last_seen):
+        self.last_seen[ws_client_id] = last_seen
+        self._ensure_running()
+
+# ################################################################################################################################
+
+    def set_interaction(self, sub_keys, last_interaction_time, last_interaction_type, last_interaction_details):
+        for sub_key in sub_keys:
+            self.interaction[sub_key] = {
+                'sub_key': sub_key,
+                'last_interaction_time': last_interaction_time,
+                'last_interaction_type': last_interaction_type,
+                'last_interaction_details': last_interaction_details,
+            }
+
+        self._ensure_running()
+
+# ################################################################################################################################
+
+    def _ensure_running(self):
+        if not self.is_running:
+            self.is_running = True
+            spawn(self._run)
+
+# ################################################################################################################################
+
+    def _run(self):
+        while self.is_running:
+            sleep(self.flush_interval)
+
+            try:
+                self.flush()
+            except Exception:
+                logger.warn('Could not store WSX metadata, e:`%s`', format_exc())
+
+# ################################################################################################################################
+
+    def _invoke_in_batches(self, service, items):
+        for batch in grouper(self.max_batch_size, items):
+            self.invoke(service, {'items': [item for item in batch if item is not None]})
+
+# ################################################################################################################################
+
+    def flush(self):
+        """ Stores all the metadata collected since the previous flush.
+        """
+        # Swapped out before anything is stored so that what connections report in the meantime goes to the next flush
+        last_seen, self.last_seen = self.last_seen, {}
+        interaction, self.interaction = self.interaction, {}
+
+        if last_seen:
+            logger.info('Setting WSX last seen for %d client(s)', len(last_seen))
+            self._invoke_in_batches('zato.channel.web-socket.client.set-last-seen-many',
+                [{'id': ws_client_id, 'last_seen': value} for ws_client_id, value in last_seen.items()])
+
+        if interaction:
+            logger.info('Setting pub/sub interaction metadata for %d sub key(s)', len(interaction))
+            self._invoke_in_batches('zato.pubsub.subscription.update-interaction-metadata-many', list(interaction.values()))
+
+# ################################################################################################################################
+
+    def stop(self):
+        self.is_running = False
+
+# ################################################################################################################################
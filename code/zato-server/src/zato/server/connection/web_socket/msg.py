@@ -9,6 +9,7 @@ Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 # stdlib
+from collections import OrderedDict
 from datetime import datetime
 from http.client import FORBIDDEN, NOT_FOUND, OK
 
@@ -22,6 +23,9 @@ from rapidjson import dumps
 from zato.common import DATA_FORMAT
 from zato.common.util import make_repr, new_cid
 
+# Python 2/3 compatibility
+from past.builtins import unicode
+
 # ################################################################################################################################
 
 xml_error_template = '<?xml version="1.0" encoding="utf-8"?><error>{}</error>'
@@ -38,6 +42,14 @@ error_response = {
 
 }
 
+# Attributes of pub/sub messages that are different for each subscriber of the same message
+pubsub_per_sub_attrs = ('sub_key', 'delivery_count', 'is_in_sub_queue')
+
+# ################################################################################################################################
+
+def _to_text(value):
+    return value.decode('utf8') if isinstance(value, bytes) else value
+
 # ################################################################################################################################
 
 class MSG_TYPE:
@@ -124,6 +136,12 @@ class ServerMessage(object):
             msg['data'] = self.data
         return dumps(msg)
 
+    def serialize_with_data(self, data):
+        """ Like self.serialize but with data that is already serialized to JSON, e.g. because it is shared
+        by many messages.
+        """
+        return '{{"meta":{},"data":{}}}'.format(_to_text(dumps(self.meta)), data)
+
 # ################################################################################################################################
 
 class AuthenticateResponse(ServerMessage):
@@ -168,3 +186,64 @@ class Forbidden(ServerMessage):
         self.data = data
 
 # ################################################################################################################################
+
+class PubSubBodyCache(object):
+    """ Keeps JSON representation of the parts of pub/sub messages that are the same for all of their subscribers
+    so that a message delivered to many WebSocket clients is serialized only once rather than for each of them.
+    Messages are looked up by their IDs and data, the latter in case a hook changed it for a particular subscriber.
+    """
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_body(self, msg, _per_sub_attrs=pubsub_per_sub_attrs):
+        """ Returns a pub/sub message serialized to JSON, as it is to be sent to its subscriber.
+        """
+        # Hooks may have provided their own output for this message - if it is a string, it is already JSON
+        # and can be spliced into the envelope as it is, otherwise it still needs to be serialized.
+        if msg.serialized:
+            if isinstance(msg.serialized, (bytes, unicode)):
+                return _to_text(msg.serialized)
+            return _to_text(dumps(msg.serialized))
+
+        key = (msg.pub_msg_id, msg.data)
+        shared = self.cache.get(key)
+
+        if shared is None:
+            self.misses += 1
+
+            external = msg.to_external_dict()
+            for name in _per_sub_attrs:
+                external.pop(name, None)
+
+            shared = self.cache[key] = _to_text(dumps(external))
+
+            if len(self.cache) > self.max_size:
+                self.cache.popitem(last=False)
+        else:
+            self.hits += 1
+
+        per_sub = {}
+        for name in _per_sub_attrs:
+            value = getattr(msg, name, None)
+            if value is not None:
+                per_sub[name] = value
+
+        if not per_sub:
+            return shared
+
+        per_sub = _to_text(dumps(per_sub))
+
+        # Splice attributes of this particular subscriber into the shared JSON object
+        return per_sub if shared == '{}' else '{},{}'.format(per_sub[:-1], shared[1:])
+
+    def get_stats(self):
+        return {
+            'size': len(self.cache),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+# ################################################################################################################################
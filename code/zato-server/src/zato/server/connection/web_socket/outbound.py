@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from logging import getLogger
+from traceback import format_exc
+
+# gevent
+from gevent import spawn
+from gevent.event import AsyncResult
+from gevent.queue import Empty, Full, Queue
+
+# ################################################################################################################################
+
+logger = getLogger('zato_web_socket')
+
+# ################################################################################################################################
+
+# Tells the sender greenlet to stop
+_stop = object()
+
+# Upper bounds of histogram buckets for queue depths, i.e. how many messages were already waiting to be sent
+depth_buckets = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+# ################################################################################################################################
+
+class OutboundQueue(object):
+    """ Messages waiting to be sent to a single WebSocket client. They are written to the client's socket, in the order
+    they were enqueued in, by a greenlet of its own so that a client that is slow to read what is sent to it holds up
+    only the deliveries to that very client. The queue is bounded - once it is full, no more messages can be enqueued
+    for put_timeout seconds, after which the delivery is considered failed and is retried later by its caller.
+    Callers do not need to wait until their data is sent - if sending it fails, on_error is given the data and the exception.
+    """
+    def __init__(self, send, depth, max_size=100, put_timeout=5, on_error=None):
+        self.send = send
+        self.depth = depth
+        self.on_error = on_error
+        self.queue = Queue(max_size)
+        self.put_timeout = put_timeout
+        self.is_running = False
+        self.is_stopped = False
+
+# ################################################################################################################################
+
+    def _run(self):
+        while True:
+            data, result = self.queue.get()
+
+            if data is _stop:
+                self._cancel_pending()
+                return
+
+            try:
+                self.send(data)
+            except Exception as e:
+                result.set_exception(e)
+                if self.on_error:
+                    try:
+                        self.on_error(data, e)
+                    except Exception:
+                        logger.warn('Error in on_error callback, e:`%s`', format_exc())
+            else:
+                result.set(True)
+
+# ################################################################################################################################
+
+    def _cancel_pending(self):
+        """ Lets whoever waits for messages that will not be sent anymore know about it.
+        """
+        while True:
+            try:
+                data, result = self.queue.get_nowait()
+            except Empty:
+                return
+            else:
+                if result:
+                    result.set_exception(RuntimeError('Cannot send on a terminated websocket'))
+
+# ################################################################################################################################
+
+    def put(self, data, _AsyncResult=AsyncResult):
+        """ Enqueues data to be sent and returns an AsyncResult set once it is sent or with an exception if it could not be.
+        Raises gevent.queue.Full if the queue is full for longer than put_timeout seconds.
+        """
+        if self.is_stopped:
+            raise RuntimeError('Cannot send on a terminated websocket')
+
+        if not self.is_running:
+            self.is_running = True
+            spawn(self._run)
+
+        # How many messages were waiting to be sent when this one arrived
+        self.depth.add(self.queue.qsize())
+
+        result = _AsyncResult()
+        self.queue.put((data, result), timeout=self.put_timeout)
+
+        return result
+
+# ################################################################################################################################
+
+    def send_and_wait(self, data):
+        """ Enqueues data and waits until it is sent, re-raising any exception that sending it resulted in.
+        """
+        return self.put(data).get()
+
+# ################################################################################################################################
+
+    def stop(self):
+        self.is_stopped = True
+
+        if self.is_running:
+            self.is_running = False
+
+            # The sender greenlet will stop once it gets to this message. If the queue is full, the greenlet is still
+            # trying to send data, which will fail with an exception, so it will read the message soon enough.
+            try:
+                self.queue.put_nowait((_stop, None))
+            except Full:
+                spawn(self.queue.put, (_stop, None))
+
+# ################################################################################################################################
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from logging import getLogger
+
+# gevent
+from gevent.event import AsyncResult
+
+# Zato
+from zato.common.util.metrics import Histogram, monotonic
+
+# ################################################################################################################################
+
+logger = getLogger('zato_web_socket')
+
+# ################################################################################################################################
+
+class PendingResponses(object):
+    """ Correlates responses from WebSocket clients with requests that were sent to them. Each request awaiting a response
+    has its own AsyncResult which is set as soon as the response arrives so there is no need to poll for it.
+    A request stops being pending once its response arrives or when the caller stops waiting for it, hence responses
+    that nobody waits for anymore, e.g. because they arrived after a timeout, are discarded rather than kept around.
+
+    All connections of a channel share the same object so requests are keyed by IDs of connections they were sent over too -
+    a client can only respond to requests sent to itself, not to the ones sent to other clients.
+    """
+    def __init__(self):
+
+        # (Connection ID, request ID) -> (AsyncResult, monotonic time the request was sent at)
+        self.pending = {}
+
+        # How many requests did not receive a response in time
+        self.timeouts = 0
+
+        # How many responses arrived that nobody was waiting for
+        self.unclaimed = 0
+
+        # Round-trip time of requests, in milliseconds
+        self.rtt = Histogram()
+
+# ################################################################################################################################
+
+    def register(self, conn_id, request_id, _AsyncResult=AsyncResult, _monotonic=monotonic):
+        """ Marks a request sent over a given connection as awaiting a response. Must be called before the request is sent
+        so that even the quickest of responses is not missed.
+        """
+        result = _AsyncResult()
+        self.pending[(conn_id, request_id)] = (result, _monotonic())
+
+        return result
+
+# ################################################################################################################################
+
+    def discard(self, conn_id, request_id):
+        """ Stops waiting for a response to a request, e.g. because it could not be sent.
+        """
+        self.pending.pop((conn_id, request_id), None)
+
+# ################################################################################################################################
+
+    def set_response(self, conn_id, request_id, response, _monotonic=monotonic):
+        """ Hands a response received over a given connection to whoever waits for it, returning True if anyone does.
+        Responses to requests that were sent over other connections are discarded.
+        """
+        item = self.pending.pop((conn_id, request_id), None)
+
+        if item is None:
+            self.unclaimed += 1
+            logger.info('Discarding unclaimed response to `%s` from `%s`', request_id, conn_id)
+            return False
+
+        result, sent_at = item
+        self.rtt.add((_monotonic() - sent_at) * 1000)
+        result.set(response)
+
+        return True
+
+# ################################################################################################################################
+
+    def wait(self, conn_id, request_id, result, timeout):
+        """ Waits up to timeout seconds for a response to a previously registered request and returns it,
+        or returns None if there is none in time.
+        """
+        try:
+            response = result.wait(timeout)
+            if not result.ready():
+                self.timeouts += 1
+            return response
+        finally:
+            self.pending.pop((conn_id, request_id), None)
+
+# ################################################################################################################################
+
+    def get_stats(self):
+        return {
+            'pending': len(self.pending),
+            'timeouts': self.timeouts,
+            'unclaimed': self.unclaimed,
+            'rtt': self.rtt.to_dict(),
+        }
+
+# ################################################################################################################################
@@ -24,6 +24,7 @@ from cryptography.fernet import Fernet
 import jwt
 
 # Zato
+from zato.common.crypto import CryptoPool
 from zato.common.odb.model import JWT as JWT_
 from zato.server.cache import RobustCache
 
@@ -44,16 +45,15 @@ class JWT(object):
 
 # ################################################################################################################################
 
-    def __init__(self, kvdb, odb, secret):
+    def __init__(self, kvdb, odb, secret, crypto_pool=None):
         self.odb = odb
-        logger.info('ODB=' + str(odb))
-        self.cache = RobustCache(kvdb, odb)
-        logger.info('CACHE=' + str(self.cache))
 
+        # RSA signatures are verified in this pool, if given on input, so as not to block other greenlets
+        self.crypto_pool = crypto_pool or CryptoPool()
+
+        self.cache = RobustCache(kvdb, odb)
         self.secret = secret
-        logger.info('SECRET=' + str(secret))
         self.fernet = Fernet(self.secret)
-        logger.info('FERNET=' + str(self.fernet))
 
 # ################################################################################################################################
 
@@ -73,6 +73,12 @@ class JWT(object):
         token = jwt.encode(token_data, self.secret, algorithm=self.ALGORITHM)
         return self.fernet.encrypt(token.encode('utf-8'))
 
+# ################################################################################################################################
+
+    def _decode(self, token, _options={'verify_signature': True}):
+        return bunchify(self.crypto_pool.run(jwt.decode, token, self.JWT_PUB_KEY, lkf.JWT_VERIFY, options=_options,
+            leeway=lkf.JWT_LEEWAY))
+
 # ################################################################################################################################
 
     def authenticate(self, username, password):
@@ -107,17 +113,9 @@ class JWT(object):
             5. renew the cache expiration asyncronouysly (do not wait for the update confirmation).
             5. return "valid" + the token contents
         """
-        logger.info('USERNAME=' + expected_username)
-        logger.info('PUB_KEY=' + self.JWT_PUB_KEY)
-
         if token:
-            options = {
-                    'verify_signature': True
-            }
-
-            token_data = bunchify(jwt.decode(token, self.JWT_PUB_KEY, lkf.JWT_VERIFY, options=options, leeway=lkf.JWT_LEEWAY))
+            token_data = self._decode(token)
 
-            logger.info('TOKEN_DATA_USERNAME=' + token_data.username)
             if token_data.username == expected_username:
                 return Bunch(valid=True, token=token_data)
             else:
@@ -134,8 +132,7 @@ class JWT(object):
 
         """
         if token:
-            options = { 'verify_signature': True }
-            token_data = bunchify(jwt.decode(token, self.JWT_PUB_KEY, lkf.JWT_VERIFY, options=options, leeway=lkf.JWT_LEEWAY))
+            token_data = self._decode(token)
 
             if token_data:
                 return Bunch(valid=True, token=token_data)
@@ -11,6 +11,7 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 # stdlib
 import logging
 from decimal import Decimal
+from json import loads
 from threading import RLock
 from traceback import format_exc
 
@@ -33,16 +34,27 @@ from lxml import etree
 from paste.util.converters import asbool
 
 # Python 2/3 compatibility
-from past.builtins import long
+from past.builtins import basestring, long, unicode
 
 # Zato
-from zato.common import MSG_MAPPER, ZATO_NOT_GIVEN
+from zato.common import DATA_FORMAT, MSG_MAPPER, ZATO_NOT_GIVEN
 from zato.common.nav import DictNav
 
 logger = logging.getLogger(__name__)
 
 # ################################################################################################################################
 
+def parse_xml(data):
+    return etree.fromstring(data.encode('utf8') if isinstance(data, unicode) else data)
+
+# Data format -> a function that parses strings in that format
+parsers = {
+    DATA_FORMAT.XML: parse_xml,
+    DATA_FORMAT.JSON: loads,
+}
+
+# ################################################################################################################################
+
 class JSONPointerAPI(object):
     """ User-visible API to a store of JSON Pointers.
     """
@@ -53,6 +65,9 @@ class JSONPointerAPI(object):
     def get(self, name, default=None):
         return self._store.get(name, self._doc, default)
 
+    def get_many(self, names, default=None):
+        return self._store.get_many(names, self._doc, default)
+
     def set(self, name, value, return_on_missing=False, in_place=True):
         return self._store.set(name, self._doc, value, return_on_missing, in_place)
 
@@ -67,6 +82,9 @@ class XPathAPI(object):
     def get(self, name, default=None):
         return self._store.get(name, self._doc, default)
 
+    def get_many(self, names, default=None):
+        return self._store.get_many(names, self._doc, default)
+
     def set(self, name, value):
         return self._store.set(name, self._doc, value, self._ns_store.ns_map)
 
@@ -74,22 +92,55 @@ class MessageFacade(object):
     """ An object through which services access all the message-related features,
     such as namespaces, JSON Pointer or XPath.
     """
-    def __init__(self, json_pointer_store=None, xpath_store=None, ns_store=None, payload=None, time_util=None):
+    def __init__(self, json_pointer_store=None, xpath_store=None, ns_store=None, payload=None, time_util=None,
+            mapper_plans=None):
         self._json_pointer_store = json_pointer_store
         self._xpath_store = xpath_store
         self._ns_store = ns_store
         self._payload = payload
         self._time_util = time_util
+        self._mapper_plans = mapper_plans if mapper_plans is not None else {}
+
+        # (Data format, string) -> a document parsed from that string
+        self._docs = {}
+
+    def parse(self, data_format, data=None, _parsers=parsers):
+        """ Returns data, or the message's payload if no data is given, parsed as XML or JSON. Each string is parsed
+        at most once per data format for as long as the facade exists, i.e. during a single invocation of a service,
+        whereas documents that are not strings are returned as they are.
+        """
+        data = data if data is not None else self._payload
+
+        if not isinstance(data, basestring) or not data:
+            return data
+
+        key = (data_format, data)
+        doc = self._docs.get(key)
+
+        if doc is None:
+            doc = self._docs[key] = _parsers[data_format](data)
+
+        return doc
 
     def json_pointer(self, doc=None):
-        return JSONPointerAPI(doc if doc is not None else self._payload, self._json_pointer_store)
+        return JSONPointerAPI(self.parse(DATA_FORMAT.JSON, doc), self._json_pointer_store)
 
     def xpath(self, msg=None):
-        return XPathAPI(msg if msg is not None else self._payload, self._xpath_store, self._ns_store)
+        return XPathAPI(self.parse(DATA_FORMAT.XML, msg), self._xpath_store, self._ns_store)
 
     def mapper(self, source, target=None, *args, **kwargs):
         return Mapper(source, target, time_util=self._time_util, *args, **kwargs)
 
+    def mapper_plan(self, name, items, *args, **kwargs):
+        """ Returns a MapperPlan of items, (from_, to) pairs as in Mapper.map_many, compiling it the first time a plan
+        of that name is needed. Plans are shared by all instances of the same service class. Any additional arguments
+        are passed to the Mapper that the plan is compiled with.
+        """
+        plan = self._mapper_plans.get(name)
+        if plan is None:
+            plan = self._mapper_plans[name] = Mapper(None, time_util=self._time_util, *args, **kwargs).compile(items)
+        return plan
+
 # ################################################################################################################################
 
 class NamespaceStore(object):
@@ -203,6 +254,13 @@ class XPathStore(BaseStore):
 
         return result if result is not None else default
 
+    def get_many(self, names, doc, default=None, needs_text=True):
+        """ Evaluates expressions under all of the names given against the same document and returns a dictionary
+        of their results keyed by these names.
+        """
+        get = self.get
+        return dict((name, get(name, doc, default, needs_text)) for name in names)
+
     def set(self, name, doc, value, ns_map=None):
         """ Sets a value of element(s) under a given name in a doc.
         If value is False, element(s) are deleted.
@@ -263,6 +321,13 @@ class JSONPointerStore(BaseStore):
         else:
             return default
 
+    def get_many(self, names, doc, default=None):
+        """ Resolves pointers under all of the names given against the same document and returns a dictionary
+        of their values keyed by these names.
+        """
+        get = self.get
+        return dict((name, get(name, doc, default)) for name in names)
+
     def set(self, name, doc, value, return_on_missing=False, in_place=True):
         if return_on_missing:
             if not self.get(name, doc):
@@ -399,3 +464,114 @@ class Mapper(object):
         path = path.split('time:')[1]
         sep_idx = path.find(':')
         return self.times[path[:sep_idx]], path[sep_idx+1:]
+
+    def compile(self, items, separator='/'):
+        """ Returns a MapperPlan of items, (from_, to) pairs as in map_many, using substitutions, functions and time formats
+        configured in this mapper.
+        """
+        return MapperPlan(self, items, separator)
+
+# ################################################################################################################################
+
+class MapperPlan(object):
+    """ Rules of a Mapper compiled once so that they can be applied to many source documents. Substitutions, functions
+    and time formats are resolved and paths are split when the plan is created, leaving only the values to be looked up,
+    converted and set in target documents. Missing values are skipped or replaced with defaults as in Mapper.map.
+    """
+    def __init__(self, mapper, items, separator='/'):
+        self.time_util = mapper.time_util
+        self.skip_missing = mapper.skip_missing
+        self.default = mapper.default
+        self.rules = [self._compile_rule(mapper, from_, to, separator) for from_, to in items]
+
+    def _compile_rule(self, mapper, from_, to, separator):
+
+        if mapper.subs:
+            from_ = from_.format(**mapper.subs)
+            to = to.format(**mapper.subs)
+
+        func = None
+        from_format, to_format = None, None
+
+        for key in mapper.func_keys:
+            if from_.startswith(key):
+                from_ = from_.replace('{}:'.format(key), '', 1)
+                func = mapper.funcs[key]
+                break
+
+        if from_.startswith('time:'):
+            from_format, from_ = mapper._get_time_format(from_)
+            to_format, to = mapper._get_time_format(to)
+
+        # As in Mapper.map, the separator applies to source paths only
+        from_keys = from_.split(separator)[1:]
+        to_keys = to.lstrip('/').split('/')
+
+        return from_keys, to, to_keys, func, from_format, to_format
+
+    def _get(self, obj, keys):
+        """ Same as DictNav.get, without the DictNav object.
+        """
+        try:
+            for key in keys:
+                if isinstance(obj, (list, dict)):
+                    obj = obj[key]
+                else:
+                    return None
+            return obj
+        except (LookupError, TypeError):
+            return None
+
+    def _set(self, target, to, keys, value):
+        """ Same as dpath.util.new for paths made of dictionaries only, which are created along the path if needed.
+        Paths that lead through other containers, such as lists, are left to dpath.
+        """
+        obj = target
+        for key in keys[:-1]:
+            if not isinstance(obj, dict):
+                break
+            if key not in obj:
+                obj[key] = {}
+            obj = obj[key]
+        else:
+            if isinstance(obj, dict):
+                obj[keys[-1]] = value
+                return
+
+        dpath_util.new(target, to, value)
+
+    def apply(self, source, target=None):
+        """ Maps a source document into a target one, a new dictionary if none is given, and returns the target.
+        """
+        target = target if target is not None else {}
+        skip_missing = self.skip_missing
+        default = self.default
+
+        if isinstance(source, DictNav):
+            source = source.obj
+
+        for from_keys, to, to_keys, func, from_format, to_format in self.rules:
+
+            value = self._get(source, from_keys)
+
+            if from_format:
+                value = self.time_util.reformat(value, from_format, to_format)
+
+            if not value:
+                if skip_missing:
+                    continue
+                else:
+                    value = default
+
+            if func:
+                value = func(value)
+
+            self._set(target, to, to_keys, value)
+
+        return target
+
+    def apply_many(self, sources):
+        """ Maps each of the source documents into a new dictionary and returns a list of them.
+        """
+        apply = self.apply
+        return [apply(source) for source in sources]
@@ -12,11 +12,17 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 from bunch import Bunch
 from json import loads
 from logging import DEBUG, getLogger
+from traceback import format_exc
+
+# gevent
+from gevent import spawn
+from gevent.pool import Pool
 
 # Python 2/3 compatibility
 from past.builtins import basestring
 
 # Zato
+from zato.common.util import new_cid
 from zato.common.util.json_ import dumps
 
 # ################################################################################################################################
@@ -49,9 +55,10 @@ class ParallelBase(object):
 
 # ################################################################################################################################
 
-    def invoke(self, targets, on_final, on_target=None, cid=None):
+    def invoke(self, targets, on_final, on_target=None, cid=None, is_local=False, pool_size=None):
         """ Invokes targets collecting their responses, can be both as a whole or individual ones,
-        and executes callback(s).
+        and executes callback(s). If is_local is True, targets are invoked in a pool of up to pool_size greenlets
+        in the current worker process, with their responses kept in RAM rather than in KVDB.
         """
         # Can be user-provided or what our source gave us
         cid = cid or self.cid
@@ -62,6 +69,21 @@ class ParallelBase(object):
         on_final = on_final or ''
         on_target = on_target or ''
 
+        if is_local:
+            ctx = Bunch()
+            ctx.cid = cid
+            ctx.source = self.source.name
+            ctx.on_final = on_final
+            ctx.on_target = on_target
+            ctx.req_ts_utc = self.source.time.utcnow()
+            ctx.remaining = len(targets)
+            ctx.data = {}
+
+            # Spawned so as not to block our caller if there are more targets than the pool's size
+            spawn(self._invoke_local, ctx, targets, pool_size)
+
+            return cid
+
         # Keep everything under a distributed lock
         with self.source.lock(self.lock_pattern.format(cid)):
 
@@ -82,6 +104,77 @@ class ParallelBase(object):
 
         return cid
 
+# ################################################################################################################################
+
+    def _invoke_local(self, ctx, targets, pool_size):
+        pool = Pool(pool_size)
+
+        for name, payload in targets.items():
+            pool.spawn(self._invoke_local_target, ctx, name, payload)
+
+    def _invoke_local_target(self, ctx, name, payload):
+
+        # Set by on_call_finished which is invoked from Service.update_handle
+        is_finished = []
+
+        def on_call_finished(invoked_service, response, exception):
+            is_finished.append(True)
+            spawn(self.on_local_call_finished, ctx, invoked_service.get_name(), invoked_service, response, exception)
+
+        wsgi_environ = {
+            'zato.request_ctx.{}'.format(self.request_ctx_cid_key): ctx.cid,
+            'zato.request_ctx.on_call_finished': on_call_finished,
+        }
+
+        try:
+            self.source.invoke(name, payload, self.call_channel, serialize=True, cid=new_cid(), wsgi_environ=wsgi_environ)
+        except Exception:
+
+            # The target could not be invoked at all, e.g. it was inactive, so we need to report it ourselves.
+            if not is_finished:
+                self.on_local_call_finished(ctx, name, self.source, '', format_exc())
+
+# ################################################################################################################################
+
+    def on_local_call_finished(self, ctx, target, invoked_service, response, exception):
+
+        data = Bunch()
+        data.cid = ctx.cid
+        data.resp_ts_utc = invoked_service.time.utcnow()
+        data.response = response
+        data.exception = exception
+        data.ok = False if exception else True
+        data.source = ctx.source
+        data.target = target
+        data.req_ts_utc = ctx.req_ts_utc
+
+        # No need for any locks - there is no context switch until we know if this was the last target
+        ctx.data[target] = data
+        ctx.remaining -= 1
+        is_last = not ctx.remaining
+
+        if logger.isEnabledFor(DEBUG):
+            self._log_before_callbacks('on_target', ctx.on_target, invoked_service)
+
+        # We always invoke 'on_target' callbacks, if there are any
+        self.invoke_callbacks(invoked_service, data, ctx.on_target, self.on_target_channel, ctx.cid)
+
+        # Not every subclass will need final callbacks
+        if is_last and self.needs_on_final:
+
+            payload = {
+                'source': ctx.source,
+                'on_final': ctx.on_final,
+                'on_target': ctx.on_target,
+                'req_ts_utc': ctx.req_ts_utc,
+                'data': ctx.data,
+            }
+
+            if logger.isEnabledFor(DEBUG):
+                self._log_before_callbacks('on_final', ctx.on_final, invoked_service)
+
+            self.invoke_callbacks(invoked_service, payload, ctx.on_final, self.on_final_channel, ctx.cid)
+
 # ################################################################################################################################
 
     def _log_before_callbacks(self, cb_type, cb_list, invoked_service):
@@ -9,25 +9,41 @@ Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 # stdlib
+import csv
 import logging
 import os
 from datetime import datetime
 from importlib import import_module
+from io import open as io_open
+from json import dumps, loads
 from shutil import copy as shutil_copy
 from traceback import format_exc
 
 # Bunch
 from bunch import Bunch
 
+# gevent
+from gevent import sleep, spawn
+
 # Watchdog
 from watchdog.events import FileSystemEventHandler
 from watchdog.observers.polling import PollingObserver
 
+# Python 2/3 compatibility
+from six import PY2
+
 # Zato
 from zato.common.util import hot_deploy, spawn_greenlet
 
 # ################################################################################################################################
 
+if 0:
+    from typing import Callable
+
+    Callable = Callable
+
+# ################################################################################################################################
+
 logger = logging.getLogger(__name__)
 
 # ################################################################################################################################
@@ -36,6 +52,34 @@ _singleton = object()
 
 # ################################################################################################################################
 
+def get_pubsub_request(topic_name, endpoint_id, request):
+    """ Returns input to zato.pubsub.publish.publish for a picked up file or, if the file is streamed,
+    for a single batch of its records.
+    """
+    meta = {
+        'pickup_ts_utc': request['ts_utc'],
+        'stanza': request['stanza'],
+        'full_path': request['full_path'],
+        'file_name': request['file_name'],
+    }
+
+    if 'records' in request:
+        meta['batch_no'] = request['batch_no']
+        meta['first_record_no'] = request['first_record_no']
+        meta['is_last'] = request['is_last']
+        data = {'records': request['records']}
+    else:
+        data = {'raw': request['raw_data']}
+
+    return {
+        'topic_name': topic_name,
+        'endpoint_id': endpoint_id,
+        'has_gd': False,
+        'data': dumps({'meta': meta, 'data': data}),
+    }
+
+# ################################################################################################################################
+
 class PickupEventHandler(FileSystemEventHandler):
 
     def __init__(self, manager, stanza, config):
@@ -50,6 +94,10 @@ class PickupEventHandler(FileSystemEventHandler):
 
         try:
 
+            if self.config.get('stream'):
+                self._on_stream_event(wd_event)
+                return
+
             file_name = os.path.basename(wd_event.src_path) # type: str
 
             if not self.manager.should_pick_up(file_name, self.config.patterns):
@@ -88,6 +136,30 @@ class PickupEventHandler(FileSystemEventHandler):
 
     on_modified = on_created
 
+    def _on_stream_event(self, wd_event):
+        """ Handles files that are read record by record - each file is streamed once it is known to have been written
+        in full, which is either when a ready marker file is created for it or when its size and modification time
+        no longer change.
+        """
+        if wd_event.is_directory:
+            return
+
+        full_path = wd_event.src_path # type: str
+        ready_marker = self.config.ready_marker
+
+        if ready_marker:
+
+            # Only marker files start processing of files they accompany
+            if not full_path.endswith(ready_marker):
+                return
+
+            full_path = full_path[:-len(ready_marker)]
+
+        if not self.manager.should_pick_up(os.path.basename(full_path), self.config.patterns):
+            return
+
+        self.manager.stream_file(full_path, self.stanza, self.config)
+
 # ################################################################################################################################
 
 class PickupEvent(object):
@@ -110,6 +182,168 @@ class PickupEvent(object):
 
 # ################################################################################################################################
 
+def split_lines(f, encoding, config):
+    """ Yields each line of a file as a record.
+    """
+    for line in iter(f.readline, b''):
+        yield line.rstrip(b'\r\n').decode(encoding)
+
+def split_csv(f, encoding, config):
+    """ Yields each row of a CSV file as a list of fields.
+    """
+    lines = iter(f.readline, b'')
+    delimiter = config.get('csv_delimiter') or ','
+
+    if PY2:
+        for row in csv.reader(lines, delimiter=delimiter.encode('utf8')):
+            yield [elem.decode(encoding) for elem in row]
+    else:
+        for row in csv.reader((line.decode(encoding) for line in lines), delimiter=delimiter):
+            yield row
+
+def split_json_lines(f, encoding, config):
+    """ Yields each non-empty line of a JSON Lines file as a deserialized object.
+    """
+    for line in iter(f.readline, b''):
+        line = line.strip()
+        if line:
+            yield loads(line.decode(encoding))
+
+# Splitters read files only a line at a time, which lets the file's offset be checked after each record
+splitters = {
+    'lines': split_lines,
+    'csv': split_csv,
+    'jsonl': split_json_lines,
+}
+
+# ################################################################################################################################
+
+class FileStreamer(object):
+    """ Reads a picked up file in chunks, splits it into records and invokes callbacks with batches of records,
+    so that memory used stays the same regardless of the file's size. After each batch, the file's offset is stored
+    in a checkpoint file which lets processing resume from that point if the server is restarted before it completes.
+    Batches are delivered in order and each one is handed to callbacks only after the previous one was processed.
+    """
+    def __init__(self, full_path, stanza, config, on_batch):
+        # type: (str, str, Bunch, Callable)
+
+        self.full_path = full_path
+        self.stanza = stanza
+        self.config = config
+        self.on_batch = on_batch
+        self.file_name = os.path.basename(full_path)
+        self.checkpoint_path = os.path.join(config.checkpoint_dir, '{}.json'.format(self.file_name))
+        self.split = splitters[config.split_with]
+
+# ################################################################################################################################
+
+    def load_checkpoint(self, stat):
+        """ Returns a previously stored checkpoint if it was stored for the same contents of the file, or None otherwise.
+        """
+        if not os.path.exists(self.checkpoint_path):
+            return
+
+        with open(self.checkpoint_path) as f:
+            checkpoint = loads(f.read())
+
+        if checkpoint['size'] == stat.st_size and checkpoint['mtime'] == stat.st_mtime:
+            return checkpoint
+
+    def save_checkpoint(self, checkpoint):
+        if not os.path.exists(self.config.checkpoint_dir):
+            os.makedirs(self.config.checkpoint_dir)
+
+        # Written under a temporary name first so that a checkpoint is never left half-written
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(dumps(checkpoint))
+        os.rename(tmp_path, self.checkpoint_path)
+
+    def delete_checkpoint(self):
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+# ################################################################################################################################
+
+    def _on_batch(self, records, checkpoint, offset, is_last):
+        """ Hands a batch to callbacks and, only once they all returned, moves the checkpoint past it. If any callback
+        raises an exception, the checkpoint stays where it was and the batch will be processed again after a restart.
+        """
+        self.on_batch({
+            'base_dir': os.path.dirname(self.full_path),
+            'file_name': self.file_name,
+            'full_path': self.full_path,
+            'stanza': self.stanza,
+            'ts_utc': datetime.utcnow().isoformat(),
+            'records': records,
+            'batch_no': checkpoint['batch_no'],
+            'first_record_no': checkpoint['record_no'],
+            'offset': offset,
+            'size': checkpoint['size'],
+            'is_last': is_last,
+        })
+
+        checkpoint['batch_no'] += 1
+        checkpoint['record_no'] += len(records)
+        checkpoint['offset'] = offset
+
+        # There is no need to store a checkpoint for the last batch because the file is complete
+        if not is_last:
+            self.save_checkpoint(checkpoint)
+
+# ################################################################################################################################
+
+    def _log_progress(self, checkpoint, logged_pct):
+        """ Logs progress each time another 10% of the file has been processed.
+        """
+        pct = int(checkpoint['offset'] * 100 / checkpoint['size']) if checkpoint['size'] else 100
+        pct -= pct % 10
+
+        if pct > logged_pct:
+            logger.info('Processed %s%% of `%s` (%s) - %s record(s) in %s batch(es)',
+                pct, self.full_path, self.stanza, checkpoint['record_no'], checkpoint['batch_no'])
+
+        return max(pct, logged_pct)
+
+# ################################################################################################################################
+
+    def run(self):
+        """ Processes the whole file, starting from its last checkpoint, if there is any.
+        """
+        stat = os.stat(self.full_path)
+        checkpoint = self.load_checkpoint(stat)
+
+        if checkpoint:
+            logger.info('Resuming `%s` (%s) at offset %s, record %s', self.full_path, self.stanza,
+                checkpoint['offset'], checkpoint['record_no'])
+        else:
+            checkpoint = {'size': stat.st_size, 'mtime': stat.st_mtime, 'offset': 0, 'batch_no': 0, 'record_no': 0}
+            logger.info('Streaming `%s` (%s), size:%s', self.full_path, self.stanza, stat.st_size)
+
+        batch_size = self.config.batch_size
+        logged_pct = 0
+
+        with io_open(self.full_path, 'rb', buffering=self.config.chunk_size) as f:
+            f.seek(checkpoint['offset'])
+
+            records = []
+            for record in self.split(f, self.config.encoding, self.config):
+                records.append(record)
+
+                if len(records) == batch_size:
+                    self._on_batch(records, checkpoint, f.tell(), False)
+                    logged_pct = self._log_progress(checkpoint, logged_pct)
+                    records = []
+
+            # The last batch is always sent, even if empty, so that callbacks know that the file is complete
+            self._on_batch(records, checkpoint, f.tell(), True)
+
+        self.delete_checkpoint()
+        logger.info('Streamed `%s` (%s) - %s record(s) in %s batch(es)', self.full_path, self.stanza,
+            checkpoint['record_no'], checkpoint['batch_no'])
+
+# ################################################################################################################################
+
 class PickupManager(object):
     """ Manages inotify listeners and callbacks.
     """
@@ -120,6 +354,10 @@ class PickupManager(object):
         self.keep_running = True
 
         self.observers = []
+        self._parser_cache = {}
+
+        # Full paths of files that are being streamed at the moment
+        self.streaming = set()
 
         # Unlike the main config dictionary, this one is keyed by incoming directories
         self.callback_config = Bunch()
@@ -206,6 +444,85 @@ class PickupManager(object):
         if config.delete_after_pickup:
             os.remove(full_path)
 
+# ################################################################################################################################
+
+    def stream_file(self, full_path, stanza, config):
+        """ Starts to stream a file in a new greenlet unless it is already being streamed.
+        """
+        if full_path in self.streaming:
+            return
+
+        self.streaming.add(full_path)
+        spawn(self._stream_file, full_path, stanza, config)
+
+# ################################################################################################################################
+
+    def wait_until_complete(self, full_path, config, _sleep=sleep):
+        """ Waits until a file's size and modification time stop changing, which is taken as a sign that it has been
+        written in full. Not needed if there is a ready marker for the file because such markers are created only
+        for files already complete. Returns False if the file disappeared in the meantime.
+        """
+        if config.ready_marker:
+            return os.path.exists(full_path)
+
+        previous = None
+
+        while self.keep_running:
+            try:
+                stat = os.stat(full_path)
+            except OSError:
+                return False
+
+            current = (stat.st_size, stat.st_mtime)
+            if current == previous:
+                return True
+
+            previous = current
+            _sleep(config.stable_after)
+
+# ################################################################################################################################
+
+    def _stream_file(self, full_path, stanza, config):
+        try:
+            if not self.wait_until_complete(full_path, config):
+                return
+
+            def on_batch(request):
+                for service in config.services:
+                    self.server.invoke(service, request)
+
+                for topic in config.topics:
+                    self.server.publish_pickup(topic, request)
+
+            FileStreamer(full_path, stanza, config, on_batch).run()
+            self.post_handle(full_path, config)
+
+            marker_path = full_path + config.ready_marker if config.ready_marker else None
+            if marker_path and os.path.exists(marker_path):
+                os.remove(marker_path)
+
+        except Exception:
+            logger.warn('Could not stream `%s` (%s), e:`%s`', full_path, stanza, format_exc())
+
+        finally:
+            self.streaming.discard(full_path)
+
+# ################################################################################################################################
+
+    def resume_streaming(self):
+        """ Resumes streaming of files whose processing was interrupted by a restart, as indicated by their checkpoints.
+        """
+        for stanza, config in self.config.items():
+            if not config.get('stream') or not os.path.exists(config.checkpoint_dir):
+                continue
+
+            for name in os.listdir(config.checkpoint_dir):
+                if name.endswith('.json'):
+                    full_path = os.path.join(config.pickup_from, name[:-len('.json')])
+
+                    if os.path.exists(full_path):
+                        self.stream_file(full_path, stanza, config)
+
 # ################################################################################################################################
 
     def run(self):
@@ -213,4 +530,6 @@ class PickupManager(object):
         for observer in self.observers:
             observer.start()
 
+        self.resume_streaming()
+
 # ################################################################################################################################
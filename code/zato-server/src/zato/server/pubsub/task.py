@@ -18,6 +18,7 @@ from traceback import format_exc
 
 # gevent
 from gevent import sleep, spawn
+from gevent.event import AsyncResult
 from gevent.lock import RLock
 
 # sortedcontainers
@@ -289,7 +290,12 @@ class DeliveryTask(object):
                 logger.info('Skipping messages `%s`', to_skip)
 
             # This is the call that actually delivers messages
-            deliver_pubsub_msg(self.sub_key, to_deliver if self.wrap_in_list else to_deliver[0])
+            result = deliver_pubsub_msg(self.sub_key, to_deliver if self.wrap_in_list else to_deliver[0])
+
+            # WebSocket deliveries only enqueue messages to be sent by the connection's own greenlet - we need to wait
+            # until they are actually sent before confirming their delivery. This re-raises any exception from the socket.
+            if isinstance(result, AsyncResult):
+                result.get()
 
         except Exception as e:
             # Do not attempt to deliver any other message in case of an error. Our parent will sleep for a small amount of
@@ -9,17 +9,20 @@ Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 # stdlib
+from collections import OrderedDict
 from logging import getLogger
 
 # simple-rbac
 from rbac.acl import Registry as _Registry
 
 # gevent
+from gevent.event import AsyncResult
 from gevent.lock import RLock
 
 # Zato
 from zato.common import ZATO_NONE
 from zato.common.util import make_repr
+from zato.common.util.metrics import monotonic
 
 # ################################################################################################################################
 
@@ -77,9 +80,170 @@ class Registry(_Registry):
 
 # ################################################################################################################################
 
+class PermissionMatrix(object):
+    """ RBAC rules of a Registry compiled so that checking if any of a client's roles is allowed to access a resource
+    takes two bitwise ANDs rather than walking role hierarchies and rules for each check. Each role is given a bit of its own,
+    each client has a bitset of its roles and each (permission, resource) pair has a bitset of roles that are allowed
+    and of ones that are denied it, taking role hierarchies into account. The latter are compiled on first use and dropped
+    whenever rules for the resource change, while changes to roles, which may affect any rule, drop all of them.
+    """
+    def __init__(self, registry):
+        self.registry = registry
+
+        # Role ID -> a bit of that role
+        self.role_bit = {}
+
+        # Client definition -> a bitset of its roles
+        self.client_bits = {}
+
+        # Role ID -> a bitset of the role and all of its descendants, i.e. all roles a rule for that role applies to
+        self.role_subtree = None
+
+        # A bitset of all roles that exist in the registry
+        self.all_roles = None
+
+        # (perm_id, resource) -> a set of role IDs with rules for them, built out of the registry's own rules
+        self.allowed_roles = None
+        self.denied_roles = None
+
+        # (perm_id, resource) -> (allowed bitset, denied bitset)
+        self.compiled = {}
+
+# ################################################################################################################################
+
+    def get_role_bit(self, role_id):
+        bit = self.role_bit.get(role_id)
+        if bit is None:
+            bit = self.role_bit[role_id] = 1 << len(self.role_bit)
+        return bit
+
+# ################################################################################################################################
+
+    def set_client_roles(self, client_def, role_ids):
+        bits = 0
+        for role_id in role_ids:
+            bits |= self.get_role_bit(role_id)
+        self.client_bits[client_def] = bits
+
+# ################################################################################################################################
+
+    def on_roles_changed(self):
+        self.role_subtree = None
+        self.all_roles = None
+        self.compiled.clear()
+
+    def on_rules_changed(self):
+        """ Invoked when rules may have been deleted from the registry directly, e.g. along with a permission.
+        """
+        self.allowed_roles = None
+        self.denied_roles = None
+        self.compiled.clear()
+
+    def on_rule_changed(self, is_allow, is_added, role_id, perm_id, resource):
+        """ Updates the index of rules with a single rule and drops compiled bitsets of the resource it is about.
+        """
+        rules = self.allowed_roles if is_allow else self.denied_roles
+        if rules is not None:
+            roles = rules.setdefault((perm_id, resource), set())
+            if is_added:
+                roles.add(role_id)
+            else:
+                roles.discard(role_id)
+
+        if resource is None:
+            self.compiled.clear()
+        else:
+            for key in [key for key in self.compiled if key[1] == resource]:
+                del self.compiled[key]
+
+# ################################################################################################################################
+
+    def _get_role_subtree(self):
+        roles = self.registry._roles
+        subtree = {}
+
+        for role_id in roles:
+            bit = self.get_role_bit(role_id)
+            subtree[role_id] = subtree.get(role_id, 0) | bit
+
+            # The role's bit is set in bitsets of all of its ancestors
+            visited = set()
+            parents = list(roles[role_id])
+
+            while parents:
+                parent_id = parents.pop()
+                if parent_id not in visited:
+                    visited.add(parent_id)
+                    subtree[parent_id] = subtree.get(parent_id, 0) | bit
+                    parents.extend(roles.get(parent_id, ()))
+
+        return subtree
+
+# ################################################################################################################################
+
+    def _index_rules(self, rules):
+        out = {}
+        for role_id, perm_id, resource in rules:
+            out.setdefault((perm_id, resource), set()).add(role_id)
+        return out
+
+# ################################################################################################################################
+
+    def _compile(self, perm_id, resource):
+
+        if self.role_subtree is None:
+            self.role_subtree = self._get_role_subtree()
+            self.all_roles = 0
+            for role_id in self.registry._roles:
+                self.all_roles |= self.role_bit[role_id]
+
+        if self.allowed_roles is None:
+            self.allowed_roles = self._index_rules(self.registry._allowed)
+            self.denied_roles = self._index_rules(self.registry._denied)
+
+        out = []
+
+        for rules in (self.allowed_roles, self.denied_roles):
+            bits = 0
+
+            # Rules without a permission or resource match any permission or resource, respectively
+            for key in ((perm_id, resource), (None, resource), (perm_id, None), (None, None)):
+                for role_id in rules.get(key, ()):
+                    # A rule without a role applies to all of them
+                    bits |= self.all_roles if role_id is None else self.role_subtree.get(role_id, 0)
+
+            out.append(bits)
+
+        return tuple(out)
+
+# ################################################################################################################################
+
+    def is_any_allowed(self, client_def, perm_id, resource):
+        """ Returns False if any of the client's roles is denied the permission, True if any is allowed it
+        and None if there are no rules for any of them, which is what Registry.is_any_allowed returns too.
+        """
+        client_bits = self.client_bits.get(client_def)
+        if not client_bits:
+            return False
+
+        key = (perm_id, resource)
+        compiled = self.compiled.get(key)
+        if compiled is None:
+            compiled = self.compiled[key] = self._compile(perm_id, resource)
+
+        allowed, denied = compiled
+
+        if client_bits & denied:
+            return False
+
+        return True if client_bits & allowed else None
+
+# ################################################################################################################################
+
 class RBAC(object):
     def __init__(self):
         self.registry = Registry(self._delete_callback)
+        self.matrix = PermissionMatrix(self.registry)
         self.update_lock = RLock()
         self.permissions = {}
         self.http_permissions = {}
@@ -109,6 +273,7 @@ class RBAC(object):
         with self.update_lock:
             del self.permissions[id]
             self.registry.delete_from_permissions('operation', id)
+            self.matrix.on_rules_changed()
 
     def set_http_permissions(self):
         """ Maps HTTP verbs to CRUD permissions.
@@ -144,16 +309,20 @@ class RBAC(object):
     def create_role(self, id, name, parent_id):
         with self.update_lock:
             self._rbac_create_role(id, name, parent_id)
+            self.matrix.on_roles_changed()
 
     def edit_role(self, id, old_name, name, parent_id):
         with self.update_lock:
             self._rbac_delete_role(id, old_name)
             self.registry._roles[id].clear() # Roles can have one parent only
             self._rbac_create_role(id, name, parent_id)
+            self.matrix.on_roles_changed()
 
     def delete_role(self, id, name):
         with self.update_lock:
             self.registry.delete_role(id)
+            self.matrix.on_roles_changed()
+            self.matrix.on_rules_changed()
 
 # ################################################################################################################################
 
@@ -165,11 +334,13 @@ class RBAC(object):
 
             self.client_def_to_role_id.setdefault(client_def, set()).add(role_id)
             self.role_id_to_client_def.setdefault(role_id, set()).add(client_def)
+            self.matrix.set_client_roles(client_def, self.client_def_to_role_id[client_def])
 
     def delete_client_role(self, client_def, role_id):
         with self.update_lock:
             self.client_def_to_role_id[client_def].remove(role_id)
             self.role_id_to_client_def[role_id].remove(client_def)
+            self.matrix.set_client_roles(client_def, self.client_def_to_role_id[client_def])
 
 # ################################################################################################################################
 
@@ -180,24 +351,29 @@ class RBAC(object):
     def delete_resource(self, resource):
         with self.update_lock:
             self.registry.delete_resource(resource)
+            self.matrix.on_rules_changed()
 
 # ################################################################################################################################
 
     def create_role_permission_allow(self, role_id, perm_id, resource):
         with self.update_lock:
             self.registry.allow(role_id, perm_id, resource)
+            self.matrix.on_rule_changed(True, True, role_id, perm_id, resource)
 
     def create_role_permission_deny(self, role_id, perm_id, resource):
         with self.update_lock:
             self.registry.deny(role_id, perm_id, resource)
+            self.matrix.on_rule_changed(False, True, role_id, perm_id, resource)
 
     def delete_role_permission_allow(self, role_id, perm_id, resource):
         with self.update_lock:
             self.registry.delete_allow((role_id, perm_id, resource))
+            self.matrix.on_rule_changed(True, False, role_id, perm_id, resource)
 
     def delete_role_permission_deny(self, role_id, perm_id, resource):
         with self.update_lock:
             self.registry.delete_deny((role_id, perm_id, resource))
+            self.matrix.on_rule_changed(False, False, role_id, perm_id, resource)
 
 # ################################################################################################################################
 
@@ -210,8 +386,7 @@ class RBAC(object):
         """ Returns True/False depending on whether a given client is allowed to obtain a selected permission for a resource.
         All of the client's roles are consulted and if any is allowed, True is returned. If none is, False is returned.
         """
-        roles = self.client_def_to_role_id.get(client_def, ZATO_NONE)
-        return self.registry.is_any_allowed(roles, perm_id, resource) if roles != ZATO_NONE else False
+        return self.matrix.is_any_allowed(client_def, perm_id, resource)
 
     def is_http_client_allowed(self, client_def, http_verb, resource):
         """ Same as is_client_allowed but accepts a HTTP verb rather than a permission ID.
@@ -219,3 +394,107 @@ class RBAC(object):
         return self.is_client_allowed(client_def, self.http_permissions[http_verb], resource)
 
 # ################################################################################################################################
+
+class DelegatedRoleCache(object):
+    """ Roles of accounts, keyed by account names, that RBAC-delegated channels obtain from an external system.
+    Roles are kept for up to ttl seconds and an account that has no roles, possibly because it does not exist,
+    is kept for up to negative_ttl seconds. If a lookup for an account is already in progress, whoever asks
+    for the same account waits for its result rather than starting a lookup of its own. The cache is local
+    to a server process, which is why its entries are deleted through a broker message sent to all of them.
+    """
+    def __init__(self, ttl=60, negative_ttl=10, max_size=10000):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+
+        # Account name -> (roles, cached_until)
+        self.entries = OrderedDict()
+
+        # Account name -> AsyncResult of a lookup in progress
+        self.pending = {}
+
+        # Incremented each time entries are deleted so that lookups started before that are not cached
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.errors = 0
+
+# ################################################################################################################################
+
+    def get(self, account, fetch, _monotonic=monotonic, _AsyncResult=AsyncResult):
+        """ Returns roles of an account, calling fetch(account) to look them up if they are not in the cache.
+        """
+        entry = self.entries.get(account)
+
+        if entry and entry[1] > _monotonic():
+
+            # Recently used entries are evicted last
+            del self.entries[account]
+            self.entries[account] = entry
+
+            self.hits += 1
+            return entry[0]
+
+        result = self.pending.get(account)
+        if result:
+            self.waits += 1
+            return result.get()
+
+        self.misses += 1
+        result = self.pending[account] = _AsyncResult()
+        generation = self.generation
+
+        try:
+            roles = fetch(account)
+        except Exception as e:
+            self.errors += 1
+            result.set_exception(e)
+            raise
+        else:
+            if generation == self.generation:
+                self._set(account, roles)
+            result.set(roles)
+            return roles
+        finally:
+            del self.pending[account]
+
+# ################################################################################################################################
+
+    def _set(self, account, roles, _monotonic=monotonic):
+        ttl = self.ttl if roles else self.negative_ttl
+        if not ttl:
+            return
+
+        self.entries.pop(account, None)
+        self.entries[account] = (roles, _monotonic() + ttl)
+
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+# ################################################################################################################################
+
+    def delete(self, account=None):
+        """ Deletes an account's roles or, if no account is given, all of them.
+        """
+        self.generation += 1
+
+        if account:
+            self.entries.pop(account, None)
+        else:
+            self.entries.clear()
+
+# ################################################################################################################################
+
+    def get_stats(self):
+        return {
+            'size': len(self.entries),
+            'pending': len(self.pending),
+            'hits': self.hits,
+            'misses': self.misses,
+            'waits': self.waits,
+            'errors': self.errors,
+        }
+
+# ################################################################################################################################
@@ -39,8 +39,10 @@ from zato.common.broker_message import SERVICE
 from zato.common.exception import Reportable
 from zato.common.nav import DictNav, ListNav
 from zato.common.util import get_response_value, make_repr, new_cid, payload_from_request, service_name_from_impl, uncamelify
+from zato.distlock import LOCK_SCOPE
 from zato.server.connection import slow_response
 from zato.server.connection.email import EMailAPI
+from zato.server.connection.http_soap.timing import STAGE as TIMING_STAGE
 from zato.server.connection.jms_wmq.outgoing import WMQFacade
 from zato.server.connection.search import SearchAPI
 from zato.server.connection.sms import SMSAPI
@@ -205,6 +207,7 @@ class Service(object):
     _ns_store = None
     _json_pointer_store = None
     _xpath_store = None
+    _mapper_plans = {}
     _out_ftp = None
     _out_plain_http = None
 
@@ -351,7 +354,8 @@ class Service(object):
                 Service.search = SearchAPI(self._worker_store.search_es_api, self._worker_store.search_solr_api)
         if self.component_enabled_msg_path:
             self.msg = MessageFacade(
-                self._json_pointer_store, self._xpath_store, self._msg_ns_store, self.request.payload, self.time)
+                self._json_pointer_store, self._xpath_store, self._msg_ns_store, self.request.payload, self.time,
+                self._mapper_plans)
 
         if self.component_enabled_patterns:
             self.patterns = PatternsFacade(self)
@@ -431,11 +435,14 @@ class Service(object):
             transport, server, broker_client, worker_store, cid, simple_io_config, _utcnow=datetime.utcnow,
             _call_hook_with_service=call_hook_with_service, _call_hook_no_service=call_hook_no_service,
             _CHANNEL_SCHEDULER=CHANNEL.SCHEDULER, _pattern_channels=(CHANNEL.FANOUT_CALL, CHANNEL.PARALLEL_EXEC_CALL),
-            *args, **kwargs):
+            _timing_stage=TIMING_STAGE, *args, **kwargs):
 
         wsgi_environ = kwargs.get('wsgi_environ', {})
         payload = wsgi_environ.get('zato.request.payload')
 
+        # Set by RequestDispatcher only if HTTP timing is enabled
+        timing = wsgi_environ.get('zato.http.timing')
+
         # Here's an edge case. If a SOAP request has a single child in Body and this child is an empty element
         # (though possibly with attributes), checking for 'not payload' alone won't suffice - this evaluates
         # to False so we'd be parsing the payload again superfluously.
@@ -454,6 +461,9 @@ class Service(object):
             in_reply_to=wsgi_environ.get('zato.request_ctx.in_reply_to', None), environ=kwargs.get('environ'),
             wmq_ctx=kwargs.get('wmq_ctx'))
 
+        if timing:
+            timing.mark(_timing_stage.SIO_PARSE)
+
         # It's possible the call will be completely filtered out. The uncommonly looking not self.accept shortcuts
         # if ServiceStore replaces self.accept with None in the most common case of this method's not being
         # implemented by user services.
@@ -515,13 +525,27 @@ class Service(object):
 
             finally:
                 try:
+                    if timing:
+                        timing.mark(_timing_stage.HANDLE)
+
                     response = set_response_func(service, data_format=data_format, transport=transport, **kwargs)
 
+                    if timing:
+                        timing.mark(_timing_stage.SERIALIZE)
+
                     # If this was fan-out/fan-in we need to always notify our callbacks no matter the result
                     if channel in _pattern_channels:
-                        func = self.patterns.fanout.on_call_finished if channel == CHANNEL.FANOUT_CALL else \
-                            self.patterns.parallel.on_call_finished
-                        spawn(func, self, service.response.payload, exc_formatted)
+
+                        # Set only if the pattern runs locally, in the invoking service's worker process,
+                        # in which case the callback does not block so it can be called directly.
+                        local_func = wsgi_environ.get('zato.request_ctx.on_call_finished')
+
+                        if local_func:
+                            local_func(service, service.response.payload, exc_formatted)
+                        else:
+                            func = self.patterns.fanout.on_call_finished if channel == CHANNEL.FANOUT_CALL else \
+                                self.patterns.parallel.on_call_finished
+                            spawn(func, self, service.response.payload, exc_formatted)
 
                 except Exception as resp_e:
 
@@ -768,6 +792,9 @@ class Service(object):
     def translate(self, *args, **kwargs):
         raise NotImplementedError('An initializer should override this method')
 
+    def translate_many(self, *args, **kwargs):
+        raise NotImplementedError('An initializer should override this method')
+
     def handle(self):
         """ The only method Zato services need to implement in order to process
         incoming requests.
@@ -780,6 +807,8 @@ class Service(object):
         name - defaults to self.name effectively making access to this service serialized
         ttl - defaults to 20 seconds and is the max time the lock will be held
         block - how long (in seconds) we will wait to acquire the lock before giving up
+        scope - who the lock is held against - greenlets of the current worker only ('worker'), all workers
+                of the current server ('server') or all servers in the cluster ('cluster', the default)
         """
 
         # The relevant part of signature in 2.0 was `expires=20, timeout=10`
@@ -796,7 +825,8 @@ class Service(object):
                 ttl = args[0]
                 block = args[1]
 
-        return self.server.zato_lock_manager(name or self.name, ttl=ttl, block=block)
+        lock_manager = self.server.lock_managers[kwargs.get('scope') or LOCK_SCOPE.CLUSTER]
+        return lock_manager(name or self.name, ttl=ttl, block=block)
 
 # ################################################################################################################################
 
@@ -943,6 +973,7 @@ class Service(object):
         service.wsgi_environ = wsgi_environ
         service.job_type = job_type
         service.translate = server.kvdb.translate
+        service.translate_many = server.kvdb.translate_many
         service.user_config = server.user_config
         service.static_config = server.static_config
         service.time = server.time_util
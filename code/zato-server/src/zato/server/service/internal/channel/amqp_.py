@@ -16,10 +16,17 @@ from traceback import format_exc
 from zato.common.broker_message import CHANNEL
 from zato.common.odb.model import ChannelAMQP, Cluster, ConnDefAMQP, Service
 from zato.common.odb.query import channel_amqp_list
+from zato.common.util.sql import elems_with_opaque, set_instance_opaque_attrs
+from zato.server.service import Int
 from zato.server.service.internal import AdminService, AdminSIO, GetListAdminSIO
 
 # ################################################################################################################################
 
+# Added in 3.1, stored in opaque attributes
+_opaque_attrs = ('concurrency', 'ack_batch_size')
+
+# ################################################################################################################################
+
 class GetList(AdminService):
     """ Returns a list of AMQP channels.
     """
@@ -32,10 +39,10 @@ class GetList(AdminService):
         input_required = ('cluster_id',)
         output_required = ('id', 'name', 'is_active', 'queue', 'consumer_tag_prefix', 'def_name', 'def_id', 'service_name',
             'pool_size', 'ack_mode','prefetch_count')
-        output_optional = ('data_format',)
+        output_optional = ('data_format', Int('concurrency'), Int('ack_batch_size'))
 
     def get_data(self, session):
-        return self._search(channel_amqp_list, session, self.request.input.cluster_id, False)
+        return elems_with_opaque(self._search(channel_amqp_list, session, self.request.input.cluster_id, False))
 
     def handle(self):
         with closing(self.odb.session()) as session:
@@ -53,7 +60,7 @@ class Create(AdminService):
         response_elem = 'zato_channel_amqp_create_response'
         input_required = ('cluster_id', 'name', 'is_active', 'def_id', 'queue', 'consumer_tag_prefix', 'service', 'pool_size',
             'ack_mode','prefetch_count')
-        input_optional = ('data_format',)
+        input_optional = ('data_format', Int('concurrency'), Int('ack_batch_size'))
         output_required = ('id', 'name')
 
     def handle(self):
@@ -95,6 +102,8 @@ class Create(AdminService):
                 item.prefetch_count = input.prefetch_count
                 item.data_format = input.data_format
 
+                set_instance_opaque_attrs(item, input, only=_opaque_attrs)
+
                 session.add(item)
                 session.commit()
 
@@ -125,7 +134,7 @@ class Edit(AdminService):
         response_elem = 'zato_channel_amqp_edit_response'
         input_required = ('id', 'cluster_id', 'name', 'is_active', 'def_id', 'queue', 'consumer_tag_prefix', 'service',
             'pool_size', 'ack_mode','prefetch_count')
-        input_optional = ('data_format',)
+        input_optional = ('data_format', Int('concurrency'), Int('ack_batch_size'))
         output_required = ('id', 'name')
 
     def handle(self):
@@ -169,6 +178,8 @@ class Edit(AdminService):
                 item.prefetch_count = input.prefetch_count
                 item.data_format = input.data_format
 
+                set_instance_opaque_attrs(item, input, only=_opaque_attrs)
+
                 session.add(item)
                 session.commit()
 
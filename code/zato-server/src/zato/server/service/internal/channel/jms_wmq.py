@@ -26,6 +26,7 @@ from zato.common.broker_message import CHANNEL as BROKER_MSG_CHANNEL
 from zato.common.odb.model import ChannelWMQ, Cluster, ConnDefWMQ, Service
 from zato.common.odb.query import channel_wmq_list
 from zato.common.util import payload_from_request
+from zato.common.util.json_ import dumps
 from zato.common.util.time_ import datetime_from_ms
 from zato.server.service.internal import AdminService, AdminSIO, GetListAdminSIO
 
@@ -212,14 +213,34 @@ class Delete(AdminService):
 # ################################################################################################################################
 
 class OnMessageReceived(AdminService):
-    """ A callback service invoked by WebSphere connectors for each taken off a queue.
+    """ A callback service invoked by WebSphere connectors for each taken off a queue. Connectors may also send a batch
+    of messages at a time, in which case each one is processed in turn and a list of per-message results is returned.
     """
     class SimpleIO(AdminSIO):
         request_elem = 'zato_channel_jms_wmq_on_message_received_request'
         response_elem = 'zato_channel_jms_wmq_on_message_received_response'
 
-    def handle(self, _channel=CHANNEL.WEBSPHERE_MQ, ts_format='YYYYMMDDHHmmssSS'):
+    def handle(self):
         request = loads(self.request.raw_request)
+        batch = request.get('batch')
+
+        if batch is None:
+            self._on_message(request)
+        else:
+            results = []
+
+            for item in batch:
+                try:
+                    self._on_message(item)
+                except Exception:
+                    results.append({'ok': False, 'error': format_exc()})
+                else:
+                    results.append({'ok': True})
+
+            self.response.content_type = 'application/json'
+            self.response.payload = dumps(results)
+
+    def _on_message(self, request, _channel=CHANNEL.WEBSPHERE_MQ, ts_format='YYYYMMDDHHmmssSS'):
         msg = request['msg']
         service_name = request['service_name']
 
@@ -15,12 +15,15 @@ from traceback import format_exc
 # dateutil
 from dateutil.parser import parse
 
+# SQLAlchemy
+from sqlalchemy import bindparam
+
 # Zato
 from zato.common.broker_message import PUBSUB as BROKER_MSG_PUBSUB
 from zato.common.odb.model import ChannelWebSocket, Cluster, WebSocketClient
 from zato.common.odb.query import web_socket_client_by_pub_id, web_socket_clients_by_server_id
 from zato.common.util.sql import set_instance_opaque_attrs
-from zato.server.service import AsIs, List
+from zato.server.service import AsIs, List, Opaque
 from zato.server.service.internal import AdminService, AdminSIO
 
 # ################################################################################################################################
@@ -167,3 +170,26 @@ class SetLastSeen(AdminService):
             session.commit()
 
 # ################################################################################################################################
+
+class SetLastSeenMany(AdminService):
+    """ Sets last_seen for many WSX clients at once, each of them with its own value.
+    """
+    class SimpleIO(AdminSIO):
+        input_required = (Opaque('items'),)
+
+    def handle(self):
+
+        params = [{'_id':item['id'], '_last_seen':item['last_seen']} for item in self.request.input['items']]
+
+        if not params:
+            return
+
+        with closing(self.odb.session()) as session:
+            session.execute(
+                _wsx_client_table.update().\
+                values(last_seen=bindparam('_last_seen')).\
+                where(_wsx_client_table.c.id==bindparam('_id')), params)
+
+            session.commit()
+
+# ################################################################################################################################
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# Zato
+from zato.server.service import Integer, Opaque
+from zato.server.service.internal import AdminService, AdminSIO
+
+# ################################################################################################################################
+
+class GetStats(AdminService):
+    """ Returns metrics of queue-based outgoing connection pools, e.g. Suds SOAP, Odoo, SAP or OpenStack Swift ones,
+    as collected by the worker process this service runs in.
+    """
+    class SimpleIO(AdminSIO):
+        request_elem = 'zato_conn_pool_get_stats_request'
+        response_elem = 'zato_conn_pool_get_stats_response'
+        input_optional = ('conn_name',)
+        output_required = ('conn_name', 'conn_type', 'address', Integer('pool_size'), Integer('idle'), Integer('in_use'),
+            Integer('waiters'), Integer('acquired'), Integer('timeouts'), Integer('health_check_failures'),
+            Integer('expired'))
+        output_optional = (Opaque('wait_time'),)
+        output_repeated = True
+
+    def handle(self):
+        self.response.payload[:] = self.worker_store.get_conn_pool_stats(self.request.input.conn_name)
+
+# ################################################################################################################################
@@ -10,6 +10,7 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 # stdlib
 from contextlib import closing
+from operator import itemgetter
 from traceback import format_exc
 
 # Paste
@@ -24,7 +25,8 @@ from zato.common.broker_message import CHANNEL, OUTGOING
 from zato.common.odb.model import Cluster, HTTPSOAP, SecurityBase, Service, TLSCACert, to_json
 from zato.common.odb.query import cache_by_id, http_soap, http_soap_list
 from zato.common.util.json_ import dumps
-from zato.server.service import Boolean, Integer
+from zato.server.connection.http_soap.breaker import config_keys as breaker_config_keys
+from zato.server.service import Boolean, Float, Integer, Opaque
 from zato.server.service.internal import AdminService, AdminSIO, GetListAdminSIO
 
 # ################################################################################################################################
@@ -85,7 +87,7 @@ class _BaseGet(AdminService):
             'method', 'soap_action', 'soap_version', 'data_format', 'host', 'ping_method', 'pool_size', 'merge_url_params_req',
             'url_params_pri', 'params_pri', 'serialization_type', 'timeout', 'sec_tls_ca_cert_id', Boolean('has_rbac'),
             'content_type', Boolean('sec_use_rbac'), 'cache_id', 'cache_name', Integer('cache_expiry'), 'cache_type',
-            'content_encoding', Boolean('match_slash'))
+            'content_encoding', Boolean('match_slash')) + breaker_config_keys
 
 # ################################################################################################################################
 
@@ -159,7 +161,7 @@ class Create(_CreateEdit):
         input_optional = ('service', 'security_id', 'method', 'soap_action', 'soap_version', 'data_format',
             'host', 'ping_method', 'pool_size', Boolean('merge_url_params_req'), 'url_params_pri', 'params_pri',
             'serialization_type', 'timeout', 'sec_tls_ca_cert_id', Boolean('has_rbac'), 'content_type',
-            'cache_id', Integer('cache_expiry'), 'content_encoding', Boolean('match_slash'))
+            'cache_id', Integer('cache_expiry'), 'content_encoding', Boolean('match_slash')) + breaker_config_keys
         output_required = ('id', 'name')
 
     def handle(self):
@@ -293,7 +295,7 @@ class Edit(_CreateEdit):
         input_optional = ('service', 'security_id', 'method', 'soap_action', 'soap_version', 'data_format',
             'host', 'ping_method', 'pool_size', Boolean('merge_url_params_req'), 'url_params_pri', 'params_pri',
             'serialization_type', 'timeout', 'sec_tls_ca_cert_id', Boolean('has_rbac'), 'content_type',
-            'cache_id', Integer('cache_expiry'), 'content_encoding', Boolean('match_slash'))
+            'cache_id', Integer('cache_expiry'), 'content_encoding', Boolean('match_slash')) + breaker_config_keys
         output_required = ('id', 'name')
 
     def handle(self):
@@ -513,3 +515,86 @@ class GetURLSecurity(AdminService):
         self.response.content_type = 'application/json'
 
 # ################################################################################################################################
+
+class GetTimingStats(AdminService):
+    """ Returns per-stage timing statistics of HTTP channels, as collected by the worker process this service runs in.
+    """
+    class SimpleIO(AdminSIO):
+        request_elem = 'zato_http_soap_get_timing_stats_request'
+        response_elem = 'zato_http_soap_get_timing_stats_response'
+        input_optional = ('channel_name',)
+        output_required = ('channel_name', 'stage', Integer('count'))
+        output_optional = (Float('total'), Float('min'), Float('max'), Float('mean'), Float('p50'), Float('p90'),
+            Float('p99'), Opaque('buckets'))
+        output_repeated = True
+        skip_empty_keys = True
+
+    def handle(self):
+        self.response.payload[:] = self.worker_store.request_dispatcher.timing.get_stats(self.request.input.channel_name)
+
+# ################################################################################################################################
+
+class ClearTimingStats(AdminService):
+    """ Clears per-stage timing statistics of all HTTP channels or of the input one only.
+    """
+    class SimpleIO(AdminSIO):
+        request_elem = 'zato_http_soap_clear_timing_stats_request'
+        response_elem = 'zato_http_soap_clear_timing_stats_response'
+        input_optional = ('channel_name',)
+
+    def handle(self):
+        self.worker_store.request_dispatcher.timing.clear(self.request.input.channel_name)
+
+# ################################################################################################################################
+
+class SetTimingConfig(AdminService):
+    """ Enables or disables per-stage timing of HTTP requests, and Server-Timing response headers, in all server processes.
+    """
+    class SimpleIO(AdminSIO):
+        request_elem = 'zato_http_soap_set_timing_config_request'
+        response_elem = 'zato_http_soap_set_timing_config_response'
+        input_required = (Boolean('is_enabled'),)
+        input_optional = (Boolean('needs_server_timing'), Boolean('needs_clear'))
+
+    def handle(self):
+        self.broker_client.publish({
+            'action': CHANNEL.HTTP_SOAP_TIMING_SET_CONFIG.value,
+            'is_enabled': self.request.input.is_enabled,
+            'needs_server_timing': bool(self.request.input.get('needs_server_timing')),
+            'needs_clear': bool(self.request.input.get('needs_clear')),
+        })
+
+# ################################################################################################################################
+
+class GetLimitsStats(AdminService):
+    """ Returns state and counters of circuit breakers and concurrency limiters of outgoing HTTP connections,
+    as collected by the worker process this service runs in.
+    """
+    class SimpleIO(AdminSIO):
+        request_elem = 'zato_http_soap_get_limits_stats_request'
+        response_elem = 'zato_http_soap_get_limits_stats_response'
+        input_optional = ('name',)
+        output_required = ('name', 'transport')
+        output_optional = ('circuit_state', Integer('circuit_requests'), Integer('circuit_failures'),
+            Integer('circuit_rejected'), Integer('circuit_times_opened'), Float('circuit_window_failure_rate'),
+            Integer('concurrency_limit'), Integer('concurrency_in_flight'), Integer('concurrency_waiters'),
+            Integer('concurrency_requests'), Integer('concurrency_rejected'), Integer('concurrency_times_decreased'))
+        output_repeated = True
+        skip_empty_keys = True
+
+    def handle(self):
+        out = []
+
+        for config_dict, config_data in self.worker_store.yield_outconn_http_config_dicts():
+            if self.request.input.name and config_data.config.name != self.request.input.name:
+                continue
+
+            stats = config_data.conn.get_limits_stats()
+            if stats:
+                stats['name'] = config_data.config.name
+                stats['transport'] = config_data.config.transport
+                out.append(stats)
+
+        self.response.payload[:] = sorted(out, key=itemgetter('name'))
+
+# ################################################################################################################################
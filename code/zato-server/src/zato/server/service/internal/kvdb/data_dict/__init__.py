@@ -13,6 +13,7 @@ from future.utils import iteritems
 
 # Zato
 from zato.common import KVDB, ZatoException
+from zato.common.broker_message import KVDB as KVDB_BROKER_MSG
 from zato.common.util import multikeysort, translation_name
 from zato.server.service.internal import AdminService
 
@@ -24,6 +25,15 @@ class DataDictService(AdminService):
     def _name(self, system1, key1, value1, system2, key2):
         return translation_name(system1, key1, value1, system2, key2)
 
+    def _on_translations_changed(self, names=None):
+        """ Lets all server processes know that translations under names given, or all of them if names are not given,
+        were created, edited or deleted so that they can update their local copies of translations.
+        """
+        self.broker_client.publish({
+            'action': KVDB_BROKER_MSG.TRANSLATION_CHANGED.value,
+            'names': list(names) if names is not None else None,
+        })
+
     def _get_dict_item(self, id):
         """ Returns a dictionary entry by its ID.
         """
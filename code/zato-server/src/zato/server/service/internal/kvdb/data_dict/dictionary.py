@@ -100,6 +100,8 @@ class Edit(_CreateEdit):
         response_elem = 'zato_kvdb_data_dict_dictionary_edit_response'
 
     def _handle(self, id):
+        changed = set()
+
         for item in self._get_translations():
             if item['id1'] == id or item['id2'] == id:
                 existing_name = self._name(item['system1'], item['key1'], item['value1'], item['system2'], item['key2'])
@@ -117,6 +119,11 @@ class Edit(_CreateEdit):
                 if item['id2'] == id:
                     self.server.kvdb.conn.hset(hash_name, 'value2', self.request.input.value)
 
+                changed.update((existing_name, hash_name))
+
+        if changed:
+            self._on_translations_changed(changed)
+
 class Delete(DataDictService):
     """ Deletes a dictionary entry by its ID.
     """
@@ -129,9 +136,15 @@ class Delete(DataDictService):
     def handle(self):
         id = str(self.request.input.id)
         self.server.kvdb.conn.hdel(KVDB.DICTIONARY_ITEM, id)
+        deleted = []
+
         for item in self._get_translations():
             if item['id1'] == id or item['id2'] == id:
-                self.server.kvdb.conn.delete(self._name(item['system1'], item['key1'], item['value1'], item['system2'], item['key2']))
+                deleted.append(self._name(item['system1'], item['key1'], item['value1'], item['system2'], item['key2']))
+                self.server.kvdb.conn.delete(deleted[-1])
+
+        if deleted:
+            self._on_translations_changed(deleted)
 
         self.response.payload.id = self.request.input.id
 
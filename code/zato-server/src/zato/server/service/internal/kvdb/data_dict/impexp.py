@@ -62,3 +62,6 @@ class Import(DataDictService):
                     p.hset(key, value_key, value)
 
             p.execute()
+
+        # All the translations were replaced
+        self._on_translations_changed()
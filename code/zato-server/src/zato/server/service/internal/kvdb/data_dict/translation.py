@@ -26,6 +26,7 @@ class _DeletingService(DataDictService):
             if int(item['id']) == id:
                 delete_key = KVDB.SEPARATOR.join((KVDB.TRANSLATION, item['system1'], item['key1'], item['value1'], item['system2'], item['key2']))
                 self.server.kvdb.conn.delete(delete_key)
+                self._on_translations_changed([delete_key])
 
 class GetList(DataDictService):
     """ Returns a list of translations.
@@ -122,6 +123,7 @@ class Create(_CreateEdit):
         id = self.server.kvdb.conn.incr(KVDB.TRANSLATION_ID)
         self.server.kvdb.conn.hset(hash_name, 'id', id)
         self._set_hash_fields(hash_name, item_ids)
+        self._on_translations_changed([hash_name])
         return id
 
 class Edit(_CreateEdit):
@@ -140,6 +142,7 @@ class Edit(_CreateEdit):
                 if existing_name != hash_name:
                     self.server.kvdb.conn.renamenx(existing_name, hash_name)
                     self._set_hash_fields(hash_name, item_ids)
+                    self._on_translations_changed([existing_name, hash_name])
                 break
 
         return self.request.input.id
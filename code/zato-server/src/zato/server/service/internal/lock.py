@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# Zato
+from zato.server.service import Integer, Opaque
+from zato.server.service.internal import AdminService, AdminSIO
+
+# ################################################################################################################################
+
+class GetStats(AdminService):
+    """ Returns per-name statistics of locks obtained through self.lock in services - how many times they were acquired,
+    how many times they could not be acquired in time and how long it took to acquire them and they were held for.
+    Worker-scoped locks are reported as collected by the worker process this service runs in.
+    """
+    class SimpleIO(AdminSIO):
+        request_elem = 'zato_lock_get_stats_request'
+        response_elem = 'zato_lock_get_stats_response'
+        input_optional = ('name', 'scope')
+        output_required = ('name', 'scope', Integer('acquired'), Integer('timeouts'))
+        output_optional = (Opaque('wait_time'), Opaque('hold_time'))
+        output_repeated = True
+
+    def handle(self):
+        input = self.request.input
+        out = []
+
+        for scope, lock_manager in sorted(self.server.lock_managers.items()):
+            if input.scope and scope != input.scope:
+                continue
+
+            for item in lock_manager.stats.get_stats(input.name):
+                item['scope'] = scope
+                out.append(item)
+
+        self.response.payload[:] = out
+
+# ################################################################################################################################
@@ -18,6 +18,7 @@ from bunch import Bunch
 # Zato
 from zato.common.broker_message import HOT_DEPLOY, MESSAGE_TYPE
 from zato.common.util import get_config, get_user_config_name
+from zato.distlock import LOCK_SCOPE
 from zato.server.service import Service
 
 # ################################################################################################################################
@@ -55,7 +56,7 @@ class OnUpdateStatic(Service):
         input = self.request.input
         static_config = self.server.static_config
 
-        with self.lock('{}-{}-{}'.format(self.name, self.server.name, input.data)):
+        with self.lock('{}-{}-{}'.format(self.name, self.server.name, input.data), scope=LOCK_SCOPE.SERVER):
             with open(os.path.join(static_config.base_dir, input.file_name), 'wb') as f:
                 f.write(input.data)
 
@@ -79,7 +80,7 @@ class OnUpdateUserConf(Service):
     def handle(self):
         input = self.request.input
 
-        with self.lock('{}-{}-{}'.format(self.name, self.server.name, input.data)):
+        with self.lock('{}-{}-{}'.format(self.name, self.server.name, input.data), scope=LOCK_SCOPE.SERVER):
             with open(os.path.join(self.server.user_conf_location, input.file_name), 'wb') as f:
                 f.write(input.data)
 
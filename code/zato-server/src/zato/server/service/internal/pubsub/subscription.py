@@ -19,7 +19,7 @@ from bunch import Bunch
 from dateutil.parser import parse as dt_parse
 
 # SQLAlchemy
-from sqlalchemy import update
+from sqlalchemy import bindparam, update
 
 # Zato
 from zato.common import PUBSUB
@@ -35,7 +35,7 @@ from zato.common.util import get_sa_model_columns, make_repr
 from zato.common.util.time_ import datetime_to_ms, utcnow_as_ms
 from zato.server.connection.web_socket import WebSocket
 from zato.server.pubsub import PubSub, Topic
-from zato.server.service import Bool, Int, List
+from zato.server.service import Bool, Int, List, Opaque
 from zato.server.service.internal import AdminService, AdminSIO
 from zato.server.service.internal.pubsub import common_sub_data
 
@@ -757,3 +757,42 @@ class UpdateInteractionMetadata(AdminService):
             session.commit()
 
 # ################################################################################################################################
+
+class UpdateInteractionMetadataMany(AdminService):
+    """ Updates last interaction metadata for many sub keys at once, each of them with its own values.
+    """
+    class SimpleIO:
+        input_required = (Opaque('items'),)
+
+    def handle(self):
+
+        params = []
+
+        for item in self.request.input['items']:
+            params.append({
+                '_sub_key': item['sub_key'],
+                '_last_interaction_time': datetime_to_ms(item['last_interaction_time']) / 1000.0,
+                '_last_interaction_type': item['last_interaction_type'],
+                '_last_interaction_details': item['last_interaction_details'].encode('utf8'),
+            })
+
+        if not params:
+            return
+
+        with closing(self.odb.session()) as session:
+
+            # Run the query, once for all the sub keys
+            session.execute(
+                update(PubSubSubscription).\
+                values({
+                    'last_interaction_time': bindparam('_last_interaction_time'),
+                    'last_interaction_type': bindparam('_last_interaction_type'),
+                    'last_interaction_details': bindparam('_last_interaction_details'),
+                    }).\
+                where(PubSubSubscription.sub_key==bindparam('_sub_key')), params
+            )
+
+            # And commit it to the database
+            session.commit()
+
+# ################################################################################################################################
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# Zato
+from zato.common.broker_message import RBAC
+from zato.server.service import Integer
+from zato.server.service.internal import AdminService, AdminSIO
+
+# ################################################################################################################################
+
+class Delete(AdminService):
+    """ Deletes cached roles of an account, or of all accounts if none is given, used by RBAC-delegated channels.
+    Roles are deleted in all server processes and will be looked up again the next time they are needed.
+    """
+    class SimpleIO(AdminSIO):
+        request_elem = 'zato_security_rbac_delegated_cache_delete_request'
+        response_elem = 'zato_security_rbac_delegated_cache_delete_response'
+        input_optional = ('account',)
+
+    def handle(self):
+        self.broker_client.publish({
+            'action': RBAC.DELEGATED_CACHE_DELETE.value,
+            'account': self.request.input.account or None,
+        })
+
+# ################################################################################################################################
+
+class GetStats(AdminService):
+    """ Returns statistics of the cache of roles used by RBAC-delegated channels, as collected by the worker process
+    this service runs in.
+    """
+    class SimpleIO(AdminSIO):
+        request_elem = 'zato_security_rbac_delegated_cache_get_stats_request'
+        response_elem = 'zato_security_rbac_delegated_cache_get_stats_response'
+        output_required = (Integer('size'), Integer('pending'), Integer('hits'), Integer('misses'), Integer('waits'),
+            Integer('errors'))
+
+    def handle(self):
+        self.response.payload = self.worker_store.request_dispatcher.url_data.rbac_delegated_cache.get_stats()
+
+# ################################################################################################################################
@@ -34,7 +34,7 @@ from zato.common.odb.model import Cluster, ChannelAMQP, ChannelWMQ, ChannelZMQ,
 from zato.common.odb.query import service_list
 from zato.common.util import hot_deploy, payload_from_request
 from zato.common.util.json_ import dumps
-from zato.server.service import Boolean, Integer
+from zato.server.service import Boolean, Integer, Opaque
 from zato.server.service.internal import AdminService, AdminSIO, GetListAdminSIO
 
 # ################################################################################################################################
@@ -324,6 +324,47 @@ class Invoke(AdminService):
 
 # ################################################################################################################################
 
+class InvokeMany(AdminService):
+    """ Invokes a service once for each of the requests given on input, in the order they were given in, and returns
+    a list of results, one for each request processed. Processing stops at the first request that could not be handled.
+    Used by enmasse to create or update many objects of the same type in a single round-trip.
+    """
+    class SimpleIO(AdminSIO):
+        request_elem = 'zato_service_invoke_many_request'
+        response_elem = 'zato_service_invoke_many_response'
+        input_required = ('name', Opaque('requests'))
+
+    def handle(self):
+        name = self.request.input.name
+        results = []
+
+        for request in self.request.input.requests:
+            try:
+                response = self.invoke(name, request, serialize=True)
+            except Exception:
+                results.append({'ok': False, 'details': format_exc()})
+                break
+            else:
+                data = response
+
+                if isinstance(data, basestring):
+                    try:
+                        data = loads(data) if data else None
+                    except ValueError:
+                        pass # Not a JSON response
+
+                # Responses from SimpleIO services are wrapped in their response elements
+                if isinstance(data, dict) and len(data) == 1:
+                    key = list(data)[0]
+                    if key.startswith('zato'):
+                        data = data[key]
+
+                results.append({'ok': True, 'data': data})
+
+        self.response.payload = dumps({'results': results})
+
+# ################################################################################################################################
+
 class GetDeploymentInfoList(AdminService):
     """ Returns detailed information regarding the service's deployment status on each of the servers it's been deployed to.
     """
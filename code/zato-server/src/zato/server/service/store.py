@@ -135,6 +135,9 @@ def set_up_class_attributes(class_, service_store=None, name=None):
     except AttributeError:
         class_.has_sio = False
 
+    # Each service class has its own plans of self.msg.mapper_plan
+    class_._mapper_plans = {}
+
     # May be None during unit-tests. Not every one will provide it because it's not always needed in a given test.
     if service_store:
 
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# Benchmarks of Mapper, run as `python bench_mapper.py [num_records]`.
+# Reports how long it takes to map a list of records with a new Mapper for each record and with a compiled MapperPlan.
+
+# stdlib
+import sys
+
+# Zato
+from zato.common.util.metrics import monotonic
+from zato.server.message import Mapper
+
+# ################################################################################################################################
+
+items = [
+    ('/customer/id', '/id'),
+    ('/customer/name/first', '/name/first'),
+    ('/customer/name/last', '/name/last'),
+    ('/customer/address/street', '/address/street'),
+    ('/customer/address/city', '/address/city'),
+    ('/customer/address/zip', '/address/postal_code'),
+    ('int:/account/balance', '/account/balance'),
+    ('bool:/account/is_active', '/account/is_active'),
+    ('/account/currency', '/account/currency'),
+    ('/account/missing', '/account/missing'),
+]
+
+# ################################################################################################################################
+
+def get_record(idx):
+    return {
+        'customer': {
+            'id': idx,
+            'name': {'first': 'First {}'.format(idx), 'last': 'Last {}'.format(idx)},
+            'address': {'street': 'Street {}'.format(idx), 'city': 'City', 'zip': '{:05}'.format(idx)},
+        },
+        'account': {'balance': str(idx * 10), 'is_active': 'true', 'currency': 'EUR'}
+    }
+
+# ################################################################################################################################
+
+def run(num_records):
+
+    records = [get_record(idx) for idx in range(num_records)]
+    print('Mapping {} records with {} rules'.format(num_records, len(items)))
+
+    start = monotonic()
+    mapped = []
+    for record in records:
+        mapper = Mapper(record)
+        mapper.map_many(items)
+        mapped.append(mapper.target)
+    mapper_time = monotonic() - start
+
+    start = monotonic()
+    plan = Mapper(None).compile(items)
+    planned = plan.apply_many(records)
+    plan_time = monotonic() - start
+
+    assert mapped == planned
+
+    print('Mapper:{:.3f}s ({:.2f} us/record), plan:{:.3f}s ({:.2f} us/record)'.format(
+        mapper_time, mapper_time / num_records * 10**6, plan_time, plan_time / num_records * 10**6))
+
+# ################################################################################################################################
+
+if __name__ == '__main__':
+    num_records = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    run(num_records)
+
+# ################################################################################################################################
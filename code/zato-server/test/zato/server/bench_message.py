@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# Benchmarks of XPath expressions evaluated over a SOAP request, run as `python bench_message.py [size_kb] [num_exprs]`.
+# Reports how long it takes to evaluate all the expressions if the request is parsed for each of them
+# and if it is parsed once by MessageFacade and the expressions are evaluated through get_many.
+
+# stdlib
+import sys
+
+# Bunch
+from bunch import Bunch
+
+# lxml
+from lxml import etree
+
+# Zato
+from zato.common.util.metrics import monotonic
+from zato.server.message import MessageFacade, NamespaceStore, XPathStore
+
+# ################################################################################################################################
+
+envelope = """<?xml version="1.0" encoding="utf-8"?>
+<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" xmlns:my="http://example.com/my">
+<soapenv:Header/>
+<soapenv:Body><my:request>{}</my:request></soapenv:Body>
+</soapenv:Envelope>
+"""
+
+item = '<my:item><my:id>{0}</my:id><my:name>Item {0}</my:name><my:price>{0}.99</my:price></my:item>'
+
+# ################################################################################################################################
+
+def get_request(size_kb):
+    items = []
+    size = 0
+    idx = 0
+
+    while size < size_kb * 1024:
+        items.append(item.format(idx))
+        size += len(items[-1])
+        idx += 1
+
+    return envelope.format(''.join(items)).encode('utf8'), idx
+
+# ################################################################################################################################
+
+def run(size_kb, num_exprs):
+
+    request, num_items = get_request(size_kb)
+
+    ns_store = NamespaceStore()
+    ns_store.add('soapenv', Bunch(value='http://schemas.xmlsoap.org/soap/envelope/'))
+    ns_store.add('my', Bunch(value='http://example.com/my'))
+
+    xpath_store = XPathStore()
+    names = []
+
+    for idx in range(num_exprs):
+        name = 'expr{}'.format(idx)
+        names.append(name)
+        value = '/soapenv:Envelope/soapenv:Body/my:request/my:item[{}]/my:name'.format(idx * num_items // num_exprs + 1)
+        xpath_store.add(name, Bunch(value=value), ns_store.ns_map)
+
+    print('Request of {} bytes, {} items, {} expressions'.format(len(request), num_items, num_exprs))
+
+    # Each expression is evaluated over a document parsed from the request again
+    start = monotonic()
+    for name in names:
+        MessageFacade(None, xpath_store, ns_store).xpath(etree.fromstring(request)).get(name)
+    parse_each_time = monotonic() - start
+
+    # The request is parsed once and all the expressions are evaluated over the same document
+    start = monotonic()
+    facade = MessageFacade(None, xpath_store, ns_store, request)
+    result = facade.xpath().get_many(names)
+    parse_once = monotonic() - start
+
+    assert len(result) == num_exprs
+
+    print('Parsed for each expression:{:.3f}s, parsed once:{:.3f}s'.format(parse_each_time, parse_once))
+
+# ################################################################################################################################
+
+if __name__ == '__main__':
+    size_kb = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    num_exprs = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    run(size_kb, num_exprs)
+
+# ################################################################################################################################
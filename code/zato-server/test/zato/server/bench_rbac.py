@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# Benchmarks of RBAC checks, run as `python bench_rbac.py [num_roles] [num_services] [num_checks]`.
+# Roles form trees ten levels deep, each service has a few roles allowed to invoke it and each client has three roles.
+# Reports how long it takes to check permissions by walking the registry and through the compiled permission matrix.
+
+# stdlib
+import sys
+from random import Random
+
+# Zato
+from zato.common.util.metrics import monotonic
+from zato.server.rbac_ import RBAC
+
+# ################################################################################################################################
+
+def get_rbac(num_roles, num_services, num_clients):
+    random = Random(42)
+    rbac = RBAC()
+
+    for role_id in range(num_roles):
+        rbac.create_role(role_id, 'role.{}'.format(role_id), role_id - 1 if role_id % 10 else None)
+
+    rbac.create_permission(1, 'Read')
+    rbac.create_permission(2, 'Update')
+
+    for service_id in range(num_services):
+        rbac.create_resource(service_id)
+
+        for _ in range(3):
+            rbac.create_role_permission_allow(random.randrange(num_roles), random.choice((1, 2)), service_id)
+
+        if not service_id % 10:
+            rbac.create_role_permission_deny(random.randrange(num_roles), 2, service_id)
+
+    for client_id in range(num_clients):
+        for _ in range(3):
+            rbac.create_client_role('client.{}'.format(client_id), random.randrange(num_roles))
+
+    return rbac
+
+# ################################################################################################################################
+
+def run(num_roles, num_services, num_checks, num_clients=1000):
+
+    start = monotonic()
+    rbac = get_rbac(num_roles, num_services, num_clients)
+    print('Created {} roles and {} services in {:.3f}s'.format(num_roles, num_services, monotonic() - start))
+
+    random = Random(7)
+    checks = [('client.{}'.format(random.randrange(num_clients)), random.choice((1, 2)), random.randrange(num_services))
+        for _ in range(num_checks)]
+
+    start = monotonic()
+    for client_def, perm_id, service_id in checks:
+        rbac.registry.is_any_allowed(rbac.client_def_to_role_id[client_def], perm_id, service_id)
+    registry_time = monotonic() - start
+
+    # The first pass compiles bitsets of services checked, the second one uses them
+    for label in ('first', 'second'):
+        start = monotonic()
+        for client_def, perm_id, service_id in checks:
+            rbac.is_client_allowed(client_def, perm_id, service_id)
+        matrix_time = monotonic() - start
+
+        print('{} checks - registry:{:.3f}s ({:.2f} us/check), matrix, {} pass:{:.3f}s ({:.2f} us/check)'.format(
+            num_checks, registry_time, registry_time / num_checks * 10**6, label, matrix_time,
+            matrix_time / num_checks * 10**6))
+
+# ################################################################################################################################
+
+if __name__ == '__main__':
+    num_roles = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    num_services = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    num_checks = int(sys.argv[3]) if len(sys.argv) > 3 else 100000
+
+    run(num_roles, num_services, num_checks)
+
+# ################################################################################################################################
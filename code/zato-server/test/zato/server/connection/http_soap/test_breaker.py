@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from unittest import TestCase
+
+# gevent
+import gevent
+
+# Zato
+from zato.common import CircuitOpen, ConcurrencyLimitExceeded
+from zato.server.connection.http_soap.breaker import CircuitBreaker, ConcurrencyLimiter, STATE
+
+# ################################################################################################################################
+
+class CircuitBreakerTestCase(TestCase):
+
+    def get_breaker(self, **kwargs):
+        config = {'failure_rate':50, 'open_time':0.01, 'min_requests':4, 'window_size':10, 'half_open_requests':2}
+        config.update(kwargs)
+        return CircuitBreaker('my.conn', **config)
+
+    def call(self, breaker, is_ok, duration=1.0):
+        breaker.enter('abc')
+        breaker.exit(is_ok, duration)
+
+# ################################################################################################################################
+
+    def test_opens_on_failure_rate(self):
+        breaker = self.get_breaker()
+
+        # Not enough requests yet
+        for x in range(3):
+            self.call(breaker, False)
+        self.assertEqual(breaker.state, STATE.CLOSED)
+
+        self.call(breaker, True)
+        self.assertEqual(breaker.state, STATE.OPEN)
+
+        with self.assertRaises(CircuitOpen):
+            breaker.enter('abc')
+
+        stats = breaker.get_stats()
+        self.assertEqual(stats['circuit_times_opened'], 1)
+        self.assertEqual(stats['circuit_rejected'], 1)
+        self.assertEqual(stats['circuit_failures'], 3)
+
+# ################################################################################################################################
+
+    def test_slow_calls_are_failures(self):
+        breaker = self.get_breaker(slow_call_time=100)
+
+        for x in range(4):
+            self.call(breaker, True, 150)
+
+        self.assertEqual(breaker.state, STATE.OPEN)
+
+# ################################################################################################################################
+
+    def test_sliding_window(self):
+        breaker = self.get_breaker(failure_rate=60, min_requests=2, window_size=4)
+
+        self.call(breaker, False)
+
+        # The failure is eventually pushed out of the window by successful requests
+        for x in range(4):
+            self.call(breaker, True)
+
+        self.assertEqual(breaker.window_failures, 0)
+        self.assertEqual(breaker.state, STATE.CLOSED)
+
+# ################################################################################################################################
+
+    def test_half_open_closes(self):
+        breaker = self.get_breaker()
+
+        for x in range(4):
+            self.call(breaker, False)
+
+        gevent.sleep(0.02)
+
+        # Two probes are allowed, the third one is not
+        breaker.enter('abc')
+        breaker.enter('abc')
+        self.assertEqual(breaker.state, STATE.HALF_OPEN)
+
+        with self.assertRaises(CircuitOpen):
+            breaker.enter('abc')
+
+        breaker.exit(True, 1.0)
+        breaker.exit(True, 1.0)
+        self.assertEqual(breaker.state, STATE.CLOSED)
+
+# ################################################################################################################################
+
+    def test_half_open_reopens(self):
+        breaker = self.get_breaker()
+
+        for x in range(4):
+            self.call(breaker, False)
+
+        gevent.sleep(0.02)
+
+        self.call(breaker, False)
+        self.assertEqual(breaker.state, STATE.OPEN)
+        self.assertEqual(breaker.times_opened, 2)
+
+# ################################################################################################################################
+
+class ConcurrencyLimiterTestCase(TestCase):
+
+    def test_limit_reached(self):
+        limiter = ConcurrencyLimiter('my.conn', 2)
+        limiter.acquire('abc')
+        limiter.acquire('abc')
+
+        with self.assertRaises(ConcurrencyLimitExceeded):
+            limiter.acquire('abc')
+
+        self.assertEqual(limiter.rejected, 1)
+
+# ################################################################################################################################
+
+    def test_aimd(self):
+        limiter = ConcurrencyLimiter('my.conn', 10, latency_target=100)
+
+        limiter.acquire('abc')
+        limiter.release(False, 1.0)
+        self.assertEqual(int(limiter.limit), 9)
+
+        limiter.acquire('abc')
+        limiter.release(True, 200.0)
+        self.assertEqual(int(limiter.limit), 8)
+        self.assertEqual(limiter.times_decreased, 2)
+
+        # Additive increase - one for each limit's worth of successful requests
+        for x in range(9):
+            limiter.acquire('abc')
+            limiter.release(True, 1.0)
+
+        self.assertEqual(int(limiter.limit), 9)
+
+# ################################################################################################################################
+
+    def test_min_limit(self):
+        limiter = ConcurrencyLimiter('my.conn', 2)
+
+        for x in range(20):
+            limiter.acquire('abc')
+            limiter.release(False, 1.0)
+
+        self.assertEqual(limiter.limit, 1)
+
+# ################################################################################################################################
+
+    def test_queue_timeout(self):
+        limiter = ConcurrencyLimiter('my.conn', 1, queue_timeout=1)
+        limiter.acquire('abc')
+
+        result = []
+
+        def wait():
+            limiter.acquire('abc')
+            result.append(limiter.in_flight)
+
+        greenlet = gevent.spawn(wait)
+        gevent.sleep(0)
+        self.assertEqual(limiter.get_stats()['concurrency_waiters'], 1)
+
+        limiter.release(True, 1.0)
+        greenlet.join()
+
+        self.assertListEqual(result, [1])
+
+# ################################################################################################################################
+
+    def test_waiter_killed(self):
+        limiter = ConcurrencyLimiter('my.conn', 1, queue_timeout=5)
+        limiter.acquire('abc')
+
+        # This waiter goes away before any slot is handed over to it
+        waiter1 = gevent.spawn(limiter.acquire, 'abc')
+        gevent.sleep(0)
+        self.assertEqual(limiter.get_stats()['concurrency_waiters'], 1)
+
+        waiter1.kill()
+        self.assertEqual(limiter.get_stats()['concurrency_waiters'], 0)
+
+        # This one is killed after a slot was already handed over to it but before it could use it
+        waiter2 = gevent.spawn(limiter.acquire, 'abc')
+        gevent.sleep(0)
+
+        waiter2.kill(block=False)
+        limiter.release(True, 1.0)
+        gevent.sleep(0)
+        self.assertTrue(waiter2.dead)
+
+        # In either case, the slot is free again
+        self.assertEqual(limiter.in_flight, 0)
+        self.assertEqual(limiter.get_stats()['concurrency_waiters'], 0)
+
+        limiter.acquire('abc')
+        self.assertEqual(limiter.in_flight, 1)
+
+# ################################################################################################################################
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from unittest import TestCase
+
+# Zato
+from zato.server.connection.http_soap.timing import RequestTiming, STAGE, TimingStore
+
+# ################################################################################################################################
+
+class _FakeClock(object):
+    """ Returns consecutive values from a list, each in seconds.
+    """
+    def __init__(self, *values):
+        self.values = list(values)
+
+    def __call__(self):
+        return self.values.pop(0)
+
+# ################################################################################################################################
+
+class RequestTimingTestCase(TestCase):
+
+    def test_mark_is_sequential(self):
+        timing = RequestTiming(_monotonic=_FakeClock(10.0))
+        timing.mark(STAGE.URL_MATCH, _monotonic=_FakeClock(10.001))
+        timing.mark(STAGE.BODY_READ, _monotonic=_FakeClock(10.003))
+        timing.mark(STAGE.CACHE, _monotonic=_FakeClock(10.004))
+        timing.mark(STAGE.CACHE, _monotonic=_FakeClock(10.006))
+
+        self.assertAlmostEqual(timing.stages[STAGE.URL_MATCH], 1.0)
+        self.assertAlmostEqual(timing.stages[STAGE.BODY_READ], 2.0)
+        self.assertAlmostEqual(timing.stages[STAGE.CACHE], 3.0)
+
+# ################################################################################################################################
+
+    def test_add_does_not_move_cursor(self):
+        timing = RequestTiming(_monotonic=_FakeClock(10.0))
+        timing.add(STAGE.RBAC_LOOKUP, 10.0, _monotonic=_FakeClock(10.005))
+        timing.mark(STAGE.SECURITY, _monotonic=_FakeClock(10.007))
+
+        self.assertAlmostEqual(timing.stages[STAGE.RBAC_LOOKUP], 5.0)
+        self.assertAlmostEqual(timing.stages[STAGE.SECURITY], 7.0)
+
+# ################################################################################################################################
+
+    def test_server_timing(self):
+        timing = RequestTiming(_monotonic=_FakeClock(10.0))
+        timing.mark(STAGE.HANDLE, _monotonic=_FakeClock(10.002))
+        timing.mark(STAGE.URL_MATCH, _monotonic=_FakeClock(10.003))
+
+        self.assertEqual(timing.get_server_timing(), 'url_match;dur=1.000, handle;dur=2.000')
+
+# ################################################################################################################################
+
+class TimingStoreTestCase(TestCase):
+
+    def test_store(self):
+        store = TimingStore(True, False)
+        headers = {}
+
+        for x in range(3):
+            timing = store.new_request_timing()
+            timing.stages[STAGE.HANDLE] = 5.0
+            store.store('my.channel', timing, headers)
+
+        self.assertDictEqual(headers, {})
+
+        stats = store.get_stats()
+        self.assertEqual(len(stats), 2)
+
+        handle = stats[0]
+        self.assertEqual(handle['channel_name'], 'my.channel')
+        self.assertEqual(handle['stage'], STAGE.HANDLE)
+        self.assertEqual(handle['count'], 3)
+        self.assertEqual(handle['mean'], 5.0)
+
+        total = stats[1]
+        self.assertEqual(total['stage'], STAGE.TOTAL)
+        self.assertEqual(total['count'], 3)
+
+# ################################################################################################################################
+
+    def test_store_server_timing_header(self):
+        store = TimingStore(True, True)
+        headers = {}
+
+        timing = store.new_request_timing()
+        timing.stages[STAGE.URL_MATCH] = 0.5
+        store.store('my.channel', timing, headers)
+
+        self.assertTrue(headers['Server-Timing'].startswith('url_match;dur=0.500, total;dur='))
+
+# ################################################################################################################################
+
+    def test_get_stats_clear(self):
+        store = TimingStore(True, False)
+
+        for name in ('channel1', 'channel2'):
+            store.store(name, store.new_request_timing(), {})
+
+        self.assertEqual(len(store.get_stats()), 2)
+        self.assertEqual(len(store.get_stats('channel1')), 1)
+
+        store.clear('channel1')
+        self.assertListEqual([elem['channel_name'] for elem in store.get_stats()], ['channel2'])
+
+        store.clear()
+        self.assertListEqual(store.get_stats(), [])
+
+# ################################################################################################################################
+
+    def test_set_config(self):
+        store = TimingStore()
+        self.assertFalse(store.is_enabled)
+        self.assertFalse(store.needs_server_timing)
+
+        store.set_config(True, True)
+        self.assertTrue(store.is_enabled)
+        self.assertTrue(store.needs_server_timing)
+
+# ################################################################################################################################
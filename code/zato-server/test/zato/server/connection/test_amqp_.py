@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from unittest import TestCase
+
+# Zato
+from zato.common.util.metrics import Histogram
+from zato.server.connection.amqp_ import Acknowledger
+
+# ################################################################################################################################
+
+class _Message(object):
+    def __init__(self, delivery_tag, acks):
+        self.delivery_tag = delivery_tag
+        self.acks = acks
+        self._state = 'RECEIVED'
+
+    def ack(self, multiple=False):
+        self.acks.append((self.delivery_tag, multiple))
+        self._state = 'ACK'
+
+# ################################################################################################################################
+
+class AcknowledgerTestCase(TestCase):
+
+    def get_messages(self, acknowledger, count):
+        acks = []
+        messages = [_Message(tag, acks) for tag in range(1, count + 1)]
+
+        for msg in messages:
+            acknowledger.on_received(msg)
+
+        return acks, messages
+
+    def test_contiguous(self):
+        acknowledger = Acknowledger(3, Histogram())
+        acks, messages = self.get_messages(acknowledger, 5)
+
+        acknowledger.on_processed(messages[1])
+        acknowledger.on_processed(messages[0])
+        acknowledger.on_processed(messages[3])
+        self.assertTrue(acknowledger.needs_flush())
+
+        # Message 3 is still in flight so only the first two can be acknowledged, with a single ack
+        acknowledger.flush()
+        self.assertListEqual(acks, [(2, True)])
+
+        acknowledger.on_processed(messages[2])
+        acknowledger.on_processed(messages[4])
+        acknowledger.flush()
+
+        self.assertListEqual(acks, [(2, True), (5, True)])
+        self.assertEqual(acknowledger.ack_latency.count, 5)
+        self.assertDictEqual(acknowledger.get_stats(), {'in_flight': 0, 'awaiting_ack': 0, 'failed': 0})
+
+    def test_failed_and_acked_by_service(self):
+        acknowledger = Acknowledger(10, Histogram())
+        acks, messages = self.get_messages(acknowledger, 4)
+
+        # The service acknowledged the first message on its own
+        messages[0].ack()
+        acknowledger.on_processed(messages[0])
+
+        acknowledger.on_processed(messages[1], False)
+        acknowledger.on_processed(messages[2])
+        acknowledger.on_processed(messages[3])
+        acknowledger.flush()
+
+        # The failed message is never acknowledged and neither is it covered by a multiple ack
+        self.assertListEqual(acks, [(1, False), (3, False), (4, False)])
+        self.assertDictEqual(acknowledger.get_stats(), {'in_flight': 0, 'awaiting_ack': 0, 'failed': 1})
+
+# ################################################################################################################################
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from json import loads
+from logging import getLogger
+from unittest import TestCase
+
+# Zato
+from zato.common.util.json_ import dumps
+from zato.server.connection.jms_wmq.jms.forwarder import MessageForwarder
+
+# ################################################################################################################################
+
+class _Response(object):
+    def __init__(self, text, status_code=200):
+        self.text = text
+        self.status_code = status_code
+        self.ok = status_code == 200
+
+class _Session(object):
+    def __init__(self):
+        self.auth = None
+        self.posted = []
+
+    def post(self, address, data):
+        data = loads(data)
+        self.posted.append(data)
+
+        if 'batch' in data:
+            return _Response(dumps([{'ok': 'fail' not in item['msg'], 'error': 'e'} for item in data['batch']]))
+
+        return _Response('')
+
+# ################################################################################################################################
+
+def get_request(text):
+    return {'msg': text, 'queue_name': 'MY.QUEUE', 'service_name': 'my.service'}
+
+# ################################################################################################################################
+
+class MessageForwarderTestCase(TestCase):
+
+    def get_forwarder(self, batch_size):
+        return MessageForwarder('http://localhost/test', ('user', 'password'), getLogger(__name__), batch_size=batch_size,
+            _Session=_Session)
+
+    def test_forward_batch(self):
+        forwarder = self.get_forwarder(3)
+
+        for text in ('msg1', 'msg2-fail', 'msg3', 'msg4'):
+            forwarder.put(get_request(text))
+
+        # Messages waiting in the queue are sent together, up to batch_size of them
+        forwarder.forward(forwarder._get_batch())
+        forwarder.forward(forwarder._get_batch())
+
+        session = forwarder.local.session
+        self.assertEqual(session.auth, ('user', 'password'))
+        self.assertEqual(len(session.posted), 2)
+        self.assertListEqual([item['msg'] for item in session.posted[0]['batch']], ['msg1', 'msg2-fail', 'msg3'])
+        self.assertEqual(session.posted[1]['msg'], 'msg4')
+
+        stats = forwarder.get_stats()
+        self.assertEqual(stats['received'], 4)
+        self.assertEqual(stats['forwarded'], 3)
+        self.assertEqual(stats['failed'], 1)
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(stats['queue_size'], 0)
+
+    def test_forward_no_batch(self):
+        forwarder = self.get_forwarder(1)
+        forwarder.put(get_request('msg1'))
+        forwarder.put(get_request('msg2'))
+
+        # The same session is reused for all the requests of a thread
+        forwarder.forward(forwarder._get_batch())
+        session = forwarder.local.session
+        forwarder.forward(forwarder._get_batch())
+
+        self.assertIs(forwarder.local.session, session)
+        self.assertListEqual([item['msg'] for item in session.posted], ['msg1', 'msg2'])
+        self.assertEqual(forwarder.get_stats()['forwarded'], 2)
+
+# ################################################################################################################################
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from unittest import TestCase
+
+# gevent
+import gevent
+
+# Zato
+from zato.server.connection.queue import ConnectionQueue
+
+# ################################################################################################################################
+
+class _Client(object):
+    def __init__(self, name):
+        self.name = name
+        self.is_deleted = False
+
+    def delete(self):
+        self.is_deleted = True
+
+# ################################################################################################################################
+
+class ConnectionQueueTestCase(TestCase):
+
+    def get_queue(self, pool_size=1, add_client_func=None, check_client_func=None, **config):
+        return ConnectionQueue(pool_size, 1, 'my.conn', 'Test', 'test://', add_client_func or (lambda: None), config,
+            check_client_func)
+
+# ################################################################################################################################
+
+    def test_acquire_release(self):
+        queue = self.get_queue()
+        queue.put_client(_Client('a'))
+
+        with queue() as client:
+            self.assertEqual(client.name, 'a')
+            self.assertEqual(queue.in_use, 1)
+
+        stats = queue.get_stats()
+        self.assertEqual(stats['in_use'], 0)
+        self.assertEqual(stats['idle'], 1)
+        self.assertEqual(stats['acquired'], 1)
+        self.assertEqual(stats['wait_time']['count'], 1)
+
+# ################################################################################################################################
+
+    def test_acquire_timeout(self):
+        queue = self.get_queue(queue_acquire_timeout=0.01)
+
+        with self.assertRaises(Exception) as ctx:
+            queue.acquire()
+
+        self.assertIn('No free connections to `my.conn`', ctx.exception.args[0])
+        self.assertEqual(queue.timeouts, 1)
+        self.assertEqual(len(queue.waiters), 0)
+
+# ################################################################################################################################
+
+    def test_acquire_no_wait(self):
+        queue = self.get_queue(queue_acquire_timeout=0)
+
+        with self.assertRaises(Exception):
+            queue.acquire()
+
+        self.assertEqual(queue.timeouts, 1)
+
+# ################################################################################################################################
+
+    def test_waiters_are_fifo(self):
+        queue = self.get_queue()
+        queue.put_client(_Client('a'))
+
+        order = []
+        client = queue.acquire()
+
+        def wait(name):
+            with queue():
+                order.append(name)
+                gevent.sleep(0)
+
+        greenlets = [gevent.spawn(wait, name) for name in ('w1', 'w2', 'w3')]
+        gevent.sleep(0)
+        self.assertEqual(queue.get_stats()['waiters'], 3)
+
+        queue.release(client)
+        gevent.joinall(greenlets)
+
+        self.assertListEqual(order, ['w1', 'w2', 'w3'])
+        self.assertEqual(queue.timeouts, 0)
+
+# ################################################################################################################################
+
+    def test_waiter_killed(self):
+        queue = self.get_queue()
+        queue.put_client(_Client('a'))
+        client = queue.acquire()
+
+        # This waiter goes away before any connection is handed over to it
+        waiter1 = gevent.spawn(queue.acquire, 5)
+        gevent.sleep(0)
+        self.assertEqual(queue.get_stats()['waiters'], 1)
+
+        waiter1.kill()
+        self.assertEqual(queue.get_stats()['waiters'], 0)
+
+        # This one is killed after a connection was already handed over to it but before it could use it
+        waiter2 = gevent.spawn(queue.acquire, 5)
+        gevent.sleep(0)
+
+        waiter2.kill(block=False)
+        queue.release(client)
+        gevent.sleep(0)
+        self.assertTrue(waiter2.dead)
+
+        # In either case, the connection is back in the pool
+        stats = queue.get_stats()
+        self.assertEqual(stats['waiters'], 0)
+        self.assertEqual(stats['idle'], 1)
+        self.assertEqual(stats['in_use'], 0)
+
+        with queue() as client:
+            self.assertEqual(client.name, 'a')
+
+# ################################################################################################################################
+
+    def test_max_lifetime(self):
+        queue = self.get_queue(queue_max_lifetime=0.01)
+
+        def add_client():
+            queue.put_client(_Client('new'))
+
+        queue.add_client_func = add_client
+
+        old = _Client('old')
+        queue.put_client(old)
+        gevent.sleep(0.02)
+
+        with queue() as client:
+            self.assertEqual(client.name, 'new')
+
+        self.assertTrue(old.is_deleted)
+        self.assertEqual(queue.expired, 1)
+
+# ################################################################################################################################
+
+    def test_health_check(self):
+
+        def check_client(client):
+            if client.name == 'bad':
+                raise Exception('Unhealthy')
+
+        queue = self.get_queue(check_client_func=check_client, queue_max_idle_time=0.01)
+
+        def add_client():
+            queue.put_client(_Client('good'))
+
+        queue.add_client_func = add_client
+        queue.put_client(_Client('bad'))
+        gevent.sleep(0.02)
+
+        with queue() as client:
+            self.assertEqual(client.name, 'good')
+
+        self.assertEqual(queue.health_check_failures, 1)
+
+# ################################################################################################################################
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+# Zato
+from zato.server.connection.web_socket.metadata import MetadataWriter
+
+# ################################################################################################################################
+
+class MetadataWriterTestCase(TestCase):
+
+    def test_flush(self):
+        invoked = []
+        writer = MetadataWriter(lambda service, request: invoked.append((service, request)), max_batch_size=2)
+        writer._ensure_running = lambda: None
+
+        now = datetime.utcnow()
+        later = now + timedelta(seconds=1)
+
+        writer.set_last_seen(1, now)
+        writer.set_last_seen(2, now)
+        writer.set_last_seen(3, now)
+        writer.set_last_seen(1, later)
+
+        writer.set_interaction(['sk1', 'sk2'], now, 'wsx.ponged', 'details')
+        writer.set_interaction(['sk1'], later, 'pubsub.deliver_pubsub_msg', 'details')
+
+        writer.flush()
+
+        # Three clients in batches of up to two, followed by sub keys
+        self.assertListEqual([service for service, _ in invoked], [
+            'zato.channel.web-socket.client.set-last-seen-many',
+            'zato.channel.web-socket.client.set-last-seen-many',
+            'zato.pubsub.subscription.update-interaction-metadata-many',
+        ])
+
+        last_seen = dict((item['id'], item['last_seen']) for _, request in invoked[:2] for item in request['items'])
+        self.assertDictEqual(last_seen, {1:later, 2:now, 3:now})
+
+        interaction = dict((item['sub_key'], item) for item in invoked[2][1]['items'])
+        self.assertEqual(interaction['sk1']['last_interaction_time'], later)
+        self.assertEqual(interaction['sk1']['last_interaction_type'], 'pubsub.deliver_pubsub_msg')
+        self.assertEqual(interaction['sk2']['last_interaction_time'], now)
+
+        # Nothing is left to store
+        del invoked[:]
+        writer.flush()
+        self.assertListEqual(invoked, [])
+
+# ################################################################################################################################
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from unittest import TestCase
+
+# gevent
+from gevent import sleep
+
+# pyrapidjson
+from rapidjson import loads
+
+# Zato
+from zato.common.pubsub import PubSubMessage
+from zato.common.util.metrics import Histogram
+from zato.server.connection.web_socket.msg import InvokeClientPubSubRequest, PubSubBodyCache
+from zato.server.connection.web_socket.outbound import depth_buckets, OutboundQueue
+
+# ################################################################################################################################
+
+def get_msg(sub_key, delivery_count=0):
+    msg = PubSubMessage()
+    msg.pub_msg_id = 'zpsm123'
+    msg.sub_key = sub_key
+    msg.data = 'my-data'
+    msg.topic_name = '/my/topic'
+    msg.delivery_count = delivery_count
+
+    return msg
+
+# ################################################################################################################################
+
+class PubSubBodyCacheTestCase(TestCase):
+
+    def test_get_body(self):
+        cache = PubSubBodyCache()
+
+        body1 = loads(cache.get_body(get_msg('sk.1')))
+        body2 = loads(cache.get_body(get_msg('sk.2', 1)))
+
+        # The message was serialized once and its subscribers' own attributes were added to it
+        self.assertDictEqual(cache.get_stats(), {'size':1, 'hits':1, 'misses':1})
+        self.assertDictEqual(body1, get_msg('sk.1').to_external_dict())
+        self.assertDictEqual(body2, get_msg('sk.2', 1).to_external_dict())
+
+    def test_envelope(self):
+        cache = PubSubBodyCache()
+        msg = get_msg('sk.1')
+
+        request = InvokeClientPubSubRequest(msg.pub_msg_id, None, {'reply_to_sk': ['sk.2']})
+        serialized = loads(request.serialize_with_data(cache.get_body(msg)))
+
+        self.assertEqual(serialized['meta']['id'], 'zpsm123')
+        self.assertDictEqual(serialized['meta']['ctx'], {'reply_to_sk': ['sk.2']})
+        self.assertDictEqual(serialized['data'], msg.to_external_dict())
+
+    def test_hook_serialized(self):
+        cache = PubSubBodyCache()
+
+        # Output of hooks is sent as it was given, without being encoded again, and it is not cached
+        msg = get_msg('sk.1')
+        msg.serialized = '{"custom": 1}'
+
+        request = InvokeClientPubSubRequest(msg.pub_msg_id, None, {})
+        serialized = loads(request.serialize_with_data(cache.get_body(msg)))
+
+        self.assertDictEqual(serialized['data'], {'custom': 1})
+        self.assertDictEqual(cache.get_stats(), {'size':0, 'hits':0, 'misses':0})
+
+        # Hooks may also return Python objects that still need to be serialized
+        msg.serialized = {'custom': 2}
+        self.assertDictEqual(loads(cache.get_body(msg)), {'custom': 2})
+
+# ################################################################################################################################
+
+class OutboundQueueTestCase(TestCase):
+
+    def test_send(self):
+        sent = []
+        depth = Histogram(depth_buckets)
+        queue = OutboundQueue(sent.append, depth)
+
+        results = [queue.put('msg{}'.format(idx)) for idx in range(3)]
+        self.assertTrue(queue.send_and_wait('msg3'))
+
+        self.assertListEqual(sent, ['msg0', 'msg1', 'msg2', 'msg3'])
+        self.assertTrue(all(result.get() for result in results))
+        self.assertEqual(depth.count, 4)
+        self.assertEqual(depth.max, 3)
+
+    def test_stop(self):
+
+        def send(data):
+            sleep(0.01)
+            raise RuntimeError('Socket error')
+
+        queue = OutboundQueue(send, Histogram(depth_buckets))
+        result1 = queue.put('msg1')
+        result2 = queue.put('msg2')
+        queue.stop()
+
+        self.assertRaises(RuntimeError, result1.get)
+        self.assertRaises(RuntimeError, result2.get)
+        self.assertRaises(RuntimeError, queue.put, 'msg3')
+
+    def test_on_error(self):
+        errors = []
+
+        def send(data):
+            raise RuntimeError('Socket error')
+
+        def on_error(data, e):
+            errors.append((data, e))
+
+        # Nothing waits for the result so the failure is reported through on_error
+        queue = OutboundQueue(send, Histogram(depth_buckets), on_error=on_error)
+        result = queue.put('msg1')
+        sleep(0.01)
+
+        self.assertTrue(result.ready())
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0][0], 'msg1')
+        self.assertIsInstance(errors[0][1], RuntimeError)
+
+# ################################################################################################################################
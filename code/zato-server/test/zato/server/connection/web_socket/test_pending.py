@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from unittest import TestCase
+
+# gevent
+from gevent import sleep, spawn
+
+# Zato
+from zato.server.connection.web_socket.pending import PendingResponses
+
+# ################################################################################################################################
+
+class PendingResponsesTestCase(TestCase):
+
+    def test_response(self):
+        pending = PendingResponses()
+        result = pending.register('ws.1', 'id1')
+
+        spawn(pending.set_response, 'ws.1', 'id1', 'my-response')
+
+        self.assertEqual(pending.wait('ws.1', 'id1', result, 1), 'my-response')
+        self.assertDictEqual(pending.pending, {})
+        self.assertEqual(pending.rtt.count, 1)
+
+    def test_timeout_and_late_response(self):
+        pending = PendingResponses()
+        result = pending.register('ws.1', 'id1')
+
+        self.assertIsNone(pending.wait('ws.1', 'id1', result, 0.01))
+        self.assertEqual(pending.timeouts, 1)
+
+        # The response arrives once nobody waits for it anymore so it is not kept around
+        sleep(0)
+        self.assertFalse(pending.set_response('ws.1', 'id1', 'my-response'))
+
+        stats = pending.get_stats()
+        self.assertEqual(stats['pending'], 0)
+        self.assertEqual(stats['unclaimed'], 1)
+        self.assertEqual(stats['rtt']['count'], 0)
+
+# ################################################################################################################################
+
+    def test_response_from_other_connection(self):
+        pending = PendingResponses()
+        result = pending.register('ws.1', 'id1')
+
+        # Another client of the same channel cannot respond to a request that was not sent to it
+        self.assertFalse(pending.set_response('ws.2', 'id1', 'spoofed'))
+        self.assertFalse(result.ready())
+        self.assertEqual(pending.unclaimed, 1)
+
+        # The actual recipient of the request still can
+        self.assertTrue(pending.set_response('ws.1', 'id1', 'my-response'))
+        self.assertEqual(pending.wait('ws.1', 'id1', result, 1), 'my-response')
+
+# ################################################################################################################################
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from datetime import datetime
+from unittest import TestCase
+
+# bunch
+from bunch import Bunch
+
+# gevent
+import gevent
+
+# Zato
+from zato.common import CHANNEL
+from zato.server.pattern.fanout import FanOut
+from zato.server.pattern.parallel import ParallelExec
+
+# ################################################################################################################################
+
+class DummyService(object):
+    def __init__(self, name, callbacks_invoked):
+        self.name = name
+        self.cid = 'source-cid'
+        self.time = Bunch(utcnow=datetime.utcnow)
+        self.callbacks_invoked = callbacks_invoked
+
+    def get_name(self):
+        return self.name
+
+    def invoke(self, name, payload, channel, **kwargs):
+        if name == 'inactive':
+            raise Exception('Service `{}` is not active'.format(name))
+
+        on_call_finished = kwargs['wsgi_environ']['zato.request_ctx.on_call_finished']
+        exception = 'Error' if name == 'failing' else None
+
+        on_call_finished(DummyService(name, self.callbacks_invoked), {'name':name, 'payload':payload}, exception)
+
+    def invoke_async(self, name, payload, channel, **kwargs):
+        self.callbacks_invoked.append((name, payload, channel))
+
+# ################################################################################################################################
+
+class LocalParallelTestCase(TestCase):
+
+    def test_fanout(self):
+        callbacks_invoked = []
+        source = DummyService('my.source', callbacks_invoked)
+
+        cid = FanOut(source).invoke({'target1':'abc', 'failing':'def'}, 'my.on_final', 'my.on_target', is_local=True)
+        gevent.sleep(0.01)
+
+        self.assertEqual(cid, 'source-cid')
+        self.assertEqual(len(callbacks_invoked), 3)
+
+        on_target = [elem for elem in callbacks_invoked if elem[0] == 'my.on_target']
+        self.assertEqual(len(on_target), 2)
+        for name, payload, channel in on_target:
+            self.assertEqual(channel, CHANNEL.FANOUT_ON_TARGET)
+
+        name, payload, channel = callbacks_invoked[-1]
+        self.assertEqual(name, 'my.on_final')
+        self.assertEqual(channel, CHANNEL.FANOUT_ON_FINAL)
+        self.assertEqual(payload['source'], 'my.source')
+        self.assertListEqual(payload['on_final'], ['my.on_final'])
+        self.assertListEqual(payload['on_target'], ['my.on_target'])
+        self.assertListEqual(sorted(payload['data']), ['failing', 'target1'])
+
+        self.assertTrue(payload['data']['target1'].ok)
+        self.assertDictEqual(payload['data']['target1'].response, {'name':'target1', 'payload':'abc'})
+        self.assertFalse(payload['data']['failing'].ok)
+        self.assertEqual(payload['data']['failing'].exception, 'Error')
+
+# ################################################################################################################################
+
+    def test_parallel_exec_invoke_error(self):
+        callbacks_invoked = []
+        source = DummyService('my.source', callbacks_invoked)
+
+        ParallelExec(source).invoke({'target1':'abc', 'inactive':'def'}, 'my.on_target', is_local=True, pool_size=1)
+        gevent.sleep(0.01)
+
+        # No final callbacks in parallel execution
+        self.assertEqual(len(callbacks_invoked), 2)
+
+        data = dict((payload.target, payload) for name, payload, channel in callbacks_invoked)
+        self.assertTrue(data['target1'].ok)
+        self.assertFalse(data['inactive'].ok)
+        self.assertIn('is not active', data['inactive'].exception)
+
+# ################################################################################################################################
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+import os
+from json import loads
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+# Bunch
+from bunch import Bunch
+
+# Zato
+from zato.server.pickup import FileStreamer, get_pubsub_request, PickupManager
+
+# ################################################################################################################################
+
+class FileStreamerTestCase(TestCase):
+
+    def setUp(self):
+        self.dir = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.dir)
+
+    def get_streamer(self, data, split_with, batch_size=2):
+        full_path = os.path.join(self.dir, 'my.file')
+        with open(full_path, 'wb') as f:
+            f.write(data)
+
+        config = Bunch(split_with=split_with, batch_size=batch_size, chunk_size=4, encoding='utf8',
+            checkpoint_dir=os.path.join(self.dir, 'checkpoint'))
+
+        self.batches = []
+        return FileStreamer(full_path, 'my.stanza', config, self.batches.append)
+
+    def test_lines(self):
+        self.get_streamer(b'a\nb\r\nc\nd\ne', 'lines').run()
+
+        self.assertListEqual([batch['records'] for batch in self.batches], [['a', 'b'], ['c', 'd'], ['e']])
+        self.assertListEqual([batch['first_record_no'] for batch in self.batches], [0, 2, 4])
+        self.assertListEqual([batch['is_last'] for batch in self.batches], [False, False, True])
+        self.assertEqual(self.batches[-1]['offset'], 10)
+
+    def test_csv_and_json_lines(self):
+        self.get_streamer('a,"b\nc"\nżółć,d\n'.encode('utf8'), 'csv', 10).run()
+        self.assertListEqual(self.batches[0]['records'], [['a', 'b\nc'], ['żółć', 'd']])
+
+        self.get_streamer(b'{"a":1}\n\n{"b":2}\n', 'jsonl', 10).run()
+        self.assertListEqual(self.batches[0]['records'], [{'a':1}, {'b':2}])
+
+    def test_resume_from_checkpoint(self):
+        streamer = self.get_streamer(b'a\nb\nc\nd\ne\n', 'lines')
+
+        def on_batch(request):
+            if request['batch_no'] == 1:
+                raise Exception('Interrupted')
+            self.batches.append(request)
+
+        streamer.on_batch = on_batch
+        self.assertRaises(Exception, streamer.run)
+        self.assertTrue(os.path.exists(streamer.checkpoint_path))
+
+        # Only records not processed before are processed after resuming
+        streamer.on_batch = self.batches.append
+        streamer.run()
+
+        self.assertListEqual([batch['records'] for batch in self.batches], [['a', 'b'], ['c', 'd'], ['e']])
+        self.assertFalse(os.path.exists(streamer.checkpoint_path))
+
+# ################################################################################################################################
+
+class _Server(object):
+    default_internal_pubsub_endpoint_id = 123
+
+    def __init__(self):
+        self.invoked = []
+
+    def invoke(self, service, request):
+        self.invoked.append((service, request))
+
+    def publish_pickup(self, topic_name, request):
+        self.invoke('zato.pubsub.publish.publish',
+            get_pubsub_request(topic_name, self.default_internal_pubsub_endpoint_id, request))
+
+# ################################################################################################################################
+
+class PickupManagerStreamTestCase(TestCase):
+
+    def setUp(self):
+        self.dir = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.dir)
+
+    def test_stream_to_topic(self):
+        full_path = os.path.join(self.dir, 'my.file')
+        with open(full_path, 'wb') as f:
+            f.write(b'a\nb\nc\n')
+
+        config = Bunch(split_with='lines', batch_size=2, chunk_size=4, encoding='utf8',
+            checkpoint_dir=os.path.join(self.dir, 'checkpoint'), services=['my.service'], topics=['/my/topic'],
+            ready_marker='', stable_after=0, move_processed_to=None, delete_after_pickup=False)
+
+        server = _Server()
+        manager = PickupManager(server, Bunch())
+        manager._stream_file(full_path, 'my.stanza', config)
+
+        # Each batch is first handed to services and then published
+        self.assertListEqual([service for service, _ in server.invoked], ['my.service', 'zato.pubsub.publish.publish'] * 2)
+
+        published = [request for service, request in server.invoked if service == 'zato.pubsub.publish.publish']
+        self.assertTrue(all(request['topic_name'] == '/my/topic' for request in published))
+        self.assertTrue(all(request['endpoint_id'] == 123 for request in published))
+
+        data = [loads(request['data']) for request in published]
+        self.assertListEqual([item['data']['records'] for item in data], [['a', 'b'], ['c']])
+        self.assertListEqual([item['meta']['is_last'] for item in data], [False, True])
+        self.assertEqual(data[0]['meta']['stanza'], 'my.stanza')
+
+        # The whole file was streamed so there is nothing to resume
+        self.assertFalse(os.path.exists(os.path.join(config.checkpoint_dir, 'my.file.json')))
+
+# ################################################################################################################################
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2019, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+import os
+from collections import OrderedDict
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+# Zato
+from zato.common.broker_message import SECURITY, SERVICE
+from zato.server.config import ConfigDict
+from zato.server.config_snapshot import ConfigSnapshot, file_name
+
+# ################################################################################################################################
+
+class _Row(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+class _Result(list):
+    columns = OrderedDict((('id', None), ('name', None), ('opaque1', None)))
+
+class _ODB(object):
+    def __init__(self):
+        self.calls = 0
+
+    def get_out_ftp_list(self, cluster_id, needs_columns=False):
+        self.calls += 1
+        result = _Result([_Row(id=1, name='ftp1', opaque1='{"extra": 123}'), _Row(id=2, name='ftp2', opaque1=None)])
+        return (result, result.columns) if needs_columns else result
+
+# ################################################################################################################################
+
+class ConfigSnapshotTestCase(TestCase):
+
+    def setUp(self):
+        self.work_dir = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.work_dir)
+
+# ################################################################################################################################
+
+    def test_record_replay(self):
+        odb = _ODB()
+
+        snapshot = ConfigSnapshot(self.work_dir, 'key1')
+        self.assertFalse(snapshot.load())
+
+        recorded = ConfigDict.from_query('out_ftp', snapshot.get_odb(odb).get_out_ftp_list(1, True))
+        snapshot.get_odb(odb).get_out_ftp_list(1, False)
+        snapshot.save()
+        self.assertEqual(odb.calls, 2)
+
+        snapshot = ConfigSnapshot(self.work_dir, 'key1')
+        self.assertTrue(snapshot.load())
+
+        replayed_odb = snapshot.get_odb(odb)
+        replayed = ConfigDict.from_query('out_ftp', replayed_odb.get_out_ftp_list(1, True))
+        rows = replayed_odb.get_out_ftp_list(1, False)
+
+        # Nothing was read from the ODB this time
+        self.assertEqual(odb.calls, 2)
+        self.assertEqual(replayed_odb.is_replay, True)
+
+        self.assertListEqual(sorted(replayed.keys()), ['ftp1', 'ftp2'])
+        self.assertDictEqual(dict(replayed['ftp1']['config']), dict(recorded['ftp1']['config']))
+        self.assertEqual(replayed['ftp1']['config']['extra'], 123)
+
+        self.assertEqual(rows[1].name, 'ftp2')
+        self.assertDictEqual(rows[1]._asdict(), {'id':2, 'name':'ftp2', 'opaque1':None})
+
+# ################################################################################################################################
+
+    def test_other_deployment(self):
+        snapshot = ConfigSnapshot(self.work_dir, 'key1')
+        snapshot.get_odb(_ODB()).get_out_ftp_list(1, True)
+        snapshot.save()
+
+        self.assertFalse(ConfigSnapshot(self.work_dir, 'key2').load())
+
+# ################################################################################################################################
+
+    def test_delete(self):
+        snapshot = ConfigSnapshot(self.work_dir, 'key1')
+        snapshot.save()
+        self.assertTrue(os.path.exists(os.path.join(self.work_dir, file_name)))
+
+        ConfigSnapshot.delete(self.work_dir)
+        self.assertFalse(os.path.exists(os.path.join(self.work_dir, file_name)))
+
+        # Deleting a snapshot that does not exist is not an error
+        ConfigSnapshot.delete(self.work_dir)
+
+# ################################################################################################################################
+
+    def test_is_config_msg(self):
+        self.assertTrue(ConfigSnapshot.is_config_msg({'action': SECURITY.BASIC_AUTH_EDIT.value}))
+        self.assertTrue(ConfigSnapshot.is_config_msg({'action': SECURITY.JWT_CHANGE_PASSWORD.value}))
+        self.assertFalse(ConfigSnapshot.is_config_msg({'action': SERVICE.PUBLISH.value}))
+        self.assertFalse(ConfigSnapshot.is_config_msg({}))
+
+# ################################################################################################################################
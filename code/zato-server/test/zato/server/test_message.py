@@ -21,7 +21,7 @@ from lxml import etree
 
 # Zato
 from zato.common.test import rand_string
-from zato.server.message import JSONPointerStore, Mapper, XPathStore
+from zato.server.message import JSONPointerStore, Mapper, MessageFacade, NamespaceStore, XPathStore
 
 logger = getLogger(__name__)
 
@@ -327,6 +327,47 @@ class TestXPathStore(TestCase):
 
 # ################################################################################################################################
 
+class TestMessageFacade(TestCase):
+
+    def get_facade(self, payload):
+        jps = JSONPointerStore()
+        jps.add('a', Bunch(value='/a'))
+        jps.add('b', Bunch(value='/b/c'))
+
+        xps = XPathStore()
+        xps.add('a', Bunch(value='//a'))
+        xps.add('b', Bunch(value='//b'))
+
+        return MessageFacade(jps, xps, NamespaceStore(), payload)
+
+    def test_get_many_json(self):
+        facade = self.get_facade('{"a":"123", "b":{"c":456}}')
+
+        # The payload is parsed once and the same document is used each time
+        doc = facade.json_pointer()._doc
+        self.assertIs(facade.json_pointer()._doc, doc)
+        self.assertDictEqual(facade.json_pointer().get_many(['a', 'b']), {'a':'123', 'b':456})
+
+        # Documents that are already parsed are used as they are
+        doc = {'a':'789'}
+        self.assertIs(facade.json_pointer(doc)._doc, doc)
+        self.assertDictEqual(facade.json_pointer(doc).get_many(['a', 'b'], 'default'), {'a':'789', 'b':'default'})
+
+    def test_get_many_xml(self):
+        facade = self.get_facade('<?xml version="1.0" encoding="utf-8"?><root><a>123</a><b>456</b><b>789</b></root>')
+
+        doc = facade.xpath()._doc
+        self.assertIs(facade.xpath()._doc, doc)
+        self.assertDictEqual(facade.xpath().get_many(['a', 'b']), {'a':'123', 'b':['456', '789']})
+
+        # The same string is parsed separately for each data format
+        facade = self.get_facade('"<root/>"')
+        self.assertEquals(facade.json_pointer()._doc, '<root/>')
+        self.assertEquals(facade.xpath(facade.json_pointer()._doc)._doc.tag, 'root')
+        self.assertEquals(len(facade._docs), 2)
+
+# ################################################################################################################################
+
 class TestMapper(TestCase):
     def test_map(self):
         source = {
@@ -350,3 +391,40 @@ class TestMapper(TestCase):
         self.assertListEqual(target.aa, [1, 2, '3', 4])
         self.assertEquals(target.bb, '123')
         self.assertEquals(target.cc.dd, 123)
+
+    def test_compile(self):
+        source = {
+            'a': {
+                'b': [1, 2, '3', 4],
+                'c': {'d':'123', 'e':''}
+            },
+            'l': [{'x':'1'}]}
+
+        items = [
+            ('/a/b', '/aa'),
+            ('/a/c/d', '/bb'),
+            ('int:/a/c/d', '/cc/dd'),
+            ('int:/a/c/d', '/cc/ee/ff/19'),
+            ('/a/c/e', '/dd'),
+            ('/a/zzz', '/ee'),
+            ('/l/0/x', '/ff'),
+        ]
+
+        for skip_missing in (True, False):
+            m = Mapper(source, skip_missing=skip_missing, default='default')
+            m.map_many(items)
+
+            plan = Mapper(None, skip_missing=skip_missing, default='default').compile(items)
+
+            # The plan gives the same results as the mapper it was compiled from and can be applied many times
+            self.assertDictEqual(plan.apply(source), m.target)
+            self.assertListEqual(plan.apply_many([source, source]), [m.target, m.target])
+
+        # Values can be set in existing targets, including ones that contain lists
+        target = {'aa': [0, 0], 'bb':{}}
+        plan = Mapper(None).compile([('/a/c/d', '/aa/1'), ('/a/c/d', '/bb/cc')])
+
+        self.assertIs(plan.apply(source, target), target)
+        self.assertDictEqual(target, {'aa': [0, '123'], 'bb':{'cc':'123'}})
+
+# ################################################################################################################################
@@ -13,12 +13,15 @@ from logging import getLogger
 from unittest import TestCase
 from uuid import uuid4
 
+# gevent
+from gevent import sleep, spawn
+
 # simple-rbac
 from rbac.acl import get_family
 
 # Zato
 from zato.common.test import rand_int, rand_string
-from zato.server.rbac_ import RBAC
+from zato.server.rbac_ import DelegatedRoleCache, RBAC
 
 logger = getLogger(__name__)
 
@@ -792,3 +795,115 @@ class IsAllowedTestCase(TestCase):
         self.assertFalse(rbac.is_role_allowed(role_id1, perm_id1, res_name2))
 
 # ################################################################################################################################
+
+class IsClientAllowedTestCase(TestCase):
+
+    def assert_same_as_registry(self, rbac, client_defs, perm_ids, resources):
+        """ The compiled matrix must give the same answers that walking the registry does.
+        """
+        for client_def in client_defs:
+            roles = rbac.client_def_to_role_id.get(client_def)
+            for perm_id in perm_ids:
+                for resource in resources:
+                    expected = rbac.registry.is_any_allowed(roles, perm_id, resource) if roles else False
+                    self.assertIs(rbac.is_client_allowed(client_def, perm_id, resource), expected,
+                        (client_def, perm_id, resource))
+
+    def test_is_client_allowed(self):
+
+        rbac = RBAC()
+
+        # Role 1 is the parent of role 2, which is the parent of role 3, role 4 has no parents
+        rbac.create_role(1, 'role1', None)
+        rbac.create_role(2, 'role2', 1)
+        rbac.create_role(3, 'role3', 2)
+        rbac.create_role(4, 'role4', None)
+
+        rbac.create_permission(11, 'Read')
+        rbac.create_permission(22, 'Update')
+
+        for resource in ('res1', 'res2', 'res3'):
+            rbac.create_resource(resource)
+
+        rbac.create_client_role('client1', 1)
+        rbac.create_client_role('client2', 3)
+        rbac.create_client_role('client3', 3)
+        rbac.create_client_role('client3', 4)
+
+        rbac.create_role_permission_allow(1, 11, 'res1')
+        rbac.create_role_permission_allow(4, 22, 'res2')
+        rbac.create_role_permission_deny(2, 22, 'res2')
+        rbac.create_role_permission_allow(3, 22, 'res3')
+
+        client_defs = ('client1', 'client2', 'client3', 'client4')
+        perm_ids = (11, 22)
+        resources = ('res1', 'res2', 'res3')
+
+        # Roles inherit rules of their parents and a single denied role denies the client
+        self.assertTrue(rbac.is_client_allowed('client2', 11, 'res1'))
+        self.assertFalse(rbac.is_client_allowed('client3', 22, 'res2'))
+        self.assertFalse(rbac.is_client_allowed('client4', 11, 'res1'))
+        self.assert_same_as_registry(rbac, client_defs, perm_ids, resources)
+
+        # Changes to rules, roles and clients are taken into account
+        rbac.delete_role_permission_deny(2, 22, 'res2')
+        self.assertTrue(rbac.is_client_allowed('client3', 22, 'res2'))
+        self.assert_same_as_registry(rbac, client_defs, perm_ids, resources)
+
+        rbac.edit_role(3, 'role3', 'role3', 4)
+        rbac.delete_client_role('client3', 4)
+        rbac.create_client_role('client4', 2)
+        self.assert_same_as_registry(rbac, client_defs, perm_ids, resources)
+
+        rbac.delete_permission(22)
+        rbac.delete_resource('res1')
+        self.assert_same_as_registry(rbac, client_defs, (11,), ('res2', 'res3'))
+
+# ################################################################################################################################
+
+class DelegatedRoleCacheTestCase(TestCase):
+
+    def test_get(self):
+        cache = DelegatedRoleCache()
+        lookups = []
+
+        def fetch(account):
+            lookups.append(account)
+            sleep(0.01)
+            return ['role.{}'.format(account)] if account != 'unknown' else []
+
+        # Concurrent requests for an account that is not cached yet result in a single lookup
+        greenlets = [spawn(cache.get, 'acc1', fetch) for _ in range(5)]
+        self.assertListEqual([g.get() for g in greenlets], [['role.acc1']] * 5)
+        self.assertListEqual(lookups, ['acc1'])
+
+        # Unknown accounts are cached too
+        self.assertListEqual(cache.get('unknown', fetch), [])
+        self.assertListEqual(cache.get('unknown', fetch), [])
+        self.assertListEqual(lookups, ['acc1', 'unknown'])
+
+        cache.delete('acc1')
+        self.assertListEqual(cache.get('acc1', fetch), ['role.acc1'])
+        self.assertListEqual(cache.get('unknown', fetch), [])
+        self.assertListEqual(lookups, ['acc1', 'unknown', 'acc1'])
+
+        self.assertDictEqual(cache.get_stats(), {'size':2, 'pending':0, 'hits':2, 'misses':3, 'waits':4, 'errors':0})
+
+    def test_get_error(self):
+        cache = DelegatedRoleCache(max_size=1)
+
+        def fetch(account):
+            sleep(0.01)
+            raise ValueError(account)
+
+        # Whoever waits for a failed lookup gets its exception and nothing is cached
+        greenlets = [spawn(cache.get, 'acc1', fetch) for _ in range(2)]
+        for g in greenlets:
+            self.assertRaises(ValueError, g.get)
+
+        self.assertListEqual(cache.get('acc2', lambda account: ['role']), ['role'])
+        self.assertListEqual(cache.get('acc3', lambda account: ['role']), ['role'])
+        self.assertListEqual(list(cache.entries), ['acc3'])
+        self.assertEqual(cache.get_stats()['errors'], 1)
+
+# ################################################################################################################################
@@ -9,6 +9,7 @@ Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 # stdlib
+from collections import OrderedDict
 from contextlib import closing
 from datetime import datetime, timedelta
 from logging import getLogger
@@ -19,7 +20,9 @@ from ipaddress import ip_address
 
 # Zato
 from zato.common.audit import audit_pii
+from zato.common.broker_message import SSO as BROKER_MSG_SSO
 from zato.common.odb.model import SSOSession as SessionModel
+from zato.common.util.metrics import monotonic
 from zato.sso import const, status_code, Session as SessionEntity, ValidationError
 from zato.sso.attr import AttrAPI
 from zato.sso.odb.query import get_session_by_ust, get_user_by_username
@@ -91,23 +94,166 @@ class SessionInfo(object):
 
 # ################################################################################################################################
 
+class SessionCacheEntry(object):
+    """ A session kept in SessionCache along with information about when it was last renewed.
+    """
+    __slots__ = ('sso_info', 'user_id', 'cached_until', 'expiration_time', 'renewed_at')
+
+    def __init__(self):
+        self.sso_info = None
+        self.user_id = None
+        self.cached_until = None
+        self.expiration_time = None
+        self.renewed_at = None
+
+# ################################################################################################################################
+
+class SessionCache(object):
+    """ Sessions recently read from the ODB, keyed by their USTs, so that they can be verified without any SQL queries
+    for up to ttl seconds. The cache is local to a server process, which is why whatever makes a session invalid
+    before its expiration time, e.g. a logout, is published to all processes in the cluster. The cache also keeps track
+    of when expiration times of sessions were last written to the ODB so that renewals of a session can be coalesced.
+    With ttl set to zero, sessions are never cached but renewals are still coalesced.
+    """
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+# ################################################################################################################################
+
+    def _get_entry(self, ust, needs_create=False):
+        entry = self.entries.get(ust)
+
+        if entry:
+            # Recently used entries are evicted last
+            del self.entries[ust]
+            self.entries[ust] = entry
+
+        elif needs_create:
+            entry = self.entries[ust] = SessionCacheEntry()
+
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+        return entry
+
+# ################################################################################################################################
+
+    def get(self, ust, now, _monotonic=monotonic):
+        """ Returns a session by its UST if it is cached, has not been in the cache for longer than ttl
+        and has not expired yet, or None otherwise.
+        """
+        entry = self._get_entry(ust)
+
+        if entry and entry.sso_info and entry.cached_until > _monotonic() and entry.expiration_time > now:
+            self.hits += 1
+            return entry.sso_info
+
+        self.misses += 1
+
+# ################################################################################################################################
+
+    def set(self, ust, sso_info, _monotonic=monotonic):
+        if not self.ttl:
+            return
+
+        entry = self._get_entry(ust, True)
+        entry.sso_info = sso_info
+        entry.user_id = sso_info.user_id
+        entry.cached_until = _monotonic() + self.ttl
+
+        # The expiration time may have been already set by a renewal that is newer than what was read from the ODB
+        if not entry.expiration_time or sso_info.expiration_time > entry.expiration_time:
+            entry.expiration_time = sso_info.expiration_time
+
+# ################################################################################################################################
+
+    def get_last_renewal(self, ust, interval, _monotonic=monotonic):
+        """ Returns the expiration time a session was last renewed with if that was less than interval seconds ago.
+        """
+        entry = self.entries.get(ust)
+        if entry and entry.renewed_at and _monotonic() - entry.renewed_at < interval:
+            return entry.expiration_time
+
+# ################################################################################################################################
+
+    def set_renewed(self, ust, expiration_time, _monotonic=monotonic):
+        entry = self._get_entry(ust, True)
+        entry.expiration_time = expiration_time
+        entry.renewed_at = _monotonic()
+
+# ################################################################################################################################
+
+    def delete(self, ust=None, user_id=None):
+        """ Deletes a session by its UST or all sessions of a user.
+        """
+        if ust:
+            self.entries.pop(ust, None)
+
+        if user_id:
+            for ust, entry in list(self.entries.items()):
+                if entry.user_id == user_id:
+                    del self.entries[ust]
+
+# ################################################################################################################################
+
+    def get_stats(self):
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+# ################################################################################################################################
+
 class SessionAPI(object):
     """ Logs a user in or out, provided that all authentication and authorization checks succeed,
     or returns details about already existing sessions.
     """
-    def __init__(self, sso_conf, encrypt_func, decrypt_func, hash_func, verify_hash_func):
+    def __init__(self, sso_conf, encrypt_func, decrypt_func, hash_func, verify_hash_func, server=None):
         self.sso_conf = sso_conf
         self.encrypt_func = encrypt_func
         self.decrypt_func = decrypt_func
         self.hash_func = hash_func
         self.verify_hash_func = verify_hash_func
+        self.server = server
         self.odb_session_func = None
 
+        # Added in 3.1, hence optional
+        session_conf = self.sso_conf.session
+        self.cache = SessionCache(int(session_conf.get('cache_ttl', 5)), int(session_conf.get('cache_max_size', 10000)))
+        self.renew_write_interval = int(session_conf.get('renew_write_interval', 30))
+
 # ################################################################################################################################
 
     def set_odb_session_func(self, func):
         self.odb_session_func = func
 
+# ################################################################################################################################
+
+    def invalidate(self, ust=None, user_id=None):
+        """ Removes a session, given by its UST, or all sessions of a user from caches of all server processes.
+        Must be called whenever a session stops being valid before its expiration time or when its user changes.
+        """
+        self.cache.delete(ust, user_id)
+
+        if self.server:
+            self.server.broker_client.publish({
+                'action': BROKER_MSG_SSO.SESSION_CACHE_DELETE.value,
+                'ust': self.encrypt_func(ust.encode('utf8')).decode('utf8') if ust else None,
+                'user_id': user_id,
+            })
+
+# ################################################################################################################################
+
+    def on_cache_delete_msg(self, msg):
+        """ Invoked when a server process, possibly this one, invalidated a session or sessions of a user.
+        """
+        self.cache.delete(self.decrypt_func(msg.ust) if msg.ust else None, msg.user_id)
+
 # ################################################################################################################################
 
     def _check_credentials(self, ctx, user):
@@ -336,6 +482,7 @@ class SessionAPI(object):
                 else:
                     set_password(self.odb_session_func, self.encrypt_func, self.hash_func, self.sso_conf, user.user_id,
                             ctx.input['new_password'], False)
+                    self.invalidate(user_id=user.user_id)
 
             # All validated, we can create a session object now
             creation_time = _now()
@@ -388,8 +535,12 @@ class SessionAPI(object):
         now = _now()
         ctx = VerifyCtx(self.decrypt_func(ust) if needs_decrypt else ust, remote_addr, current_app)
 
-        # Look up user and raise exception if not found by input UST
-        sso_info = self._get_session_by_ust(session, ctx.ust, now)
+        # Look up user and raise exception if not found by input UST, unless the session has been verified recently
+        sso_info = self.cache.get(ctx.ust, now)
+        if not sso_info:
+            sso_info = self._get_session_by_ust(session, ctx.ust, now)
+            if sso_info:
+                self.cache.set(ctx.ust, sso_info)
 
         # Invalid UST or the session has already expired but in either case
         # we can not access it.
@@ -401,6 +552,12 @@ class SessionAPI(object):
 
         # Everything is validated, we can renew the session, if told to.
         if renew:
+
+            # If the session was renewed recently enough, the expiration time stored in the ODB is still current
+            last_expiration_time = self.cache.get_last_renewal(ctx.ust, self.renew_write_interval)
+            if last_expiration_time:
+                return last_expiration_time
+
             expiration_time = now + timedelta(minutes=self.sso_conf.session.expiry)
             session.execute(
                 SessionModelUpdate().values({
@@ -408,6 +565,7 @@ class SessionAPI(object):
             }).where(
                 SessionModelTable.c.ust==ctx.ust
             ))
+            self.cache.set_renewed(ctx.ust, expiration_time)
             return expiration_time
         else:
             # Indicate success
@@ -533,4 +691,7 @@ class SessionAPI(object):
                 )
                 session.commit()
 
+                # No other server process may consider the session valid from now on
+                self.invalidate(ust)
+
 # ################################################################################################################################
@@ -213,7 +213,8 @@ class UserAPI(object):
         self.password_expiry = self.sso_conf.password.expiry
 
         # For convenience, sessions are accessible through user API.
-        self.session = SessionAPI(self.sso_conf, self.encrypt_func, self.decrypt_func, self.hash_func, self.verify_hash_func)
+        self.session = SessionAPI(self.sso_conf, self.encrypt_func, self.decrypt_func, self.hash_func, self.verify_hash_func,
+            server)
 
 # ################################################################################################################################
 
@@ -639,6 +640,9 @@ class UserAPI(object):
                 msg = 'Expected for rows_matched to be 1 instead of %d, user_id:`%s`, username:`%s`'
                 logger.warn(msg, rows_matched, user_id, username)
 
+        # Sessions of a deleted user must not be served from cache
+        self.session.invalidate(user_id=user.user_id)
+
 # ################################################################################################################################
 
     def delete_user_by_id(self, cid, user_id, current_ust, current_app, remote_addr, skip_sec=False):
@@ -675,6 +679,8 @@ class UserAPI(object):
             )
             session.commit()
 
+        self.session.invalidate(user_id=user_id)
+
 # ################################################################################################################################
 
     def lock_user_cli(self, user_id):
@@ -863,6 +869,9 @@ class UserAPI(object):
                 )
                 session.commit()
 
+            # Cached sessions of the user contain attributes that have just been updated, e.g. is_locked
+            self.session.invalidate(user_id=_user_id)
+
 # ################################################################################################################################
 
     def update_current_user(self, cid, data, current_ust, current_app, remote_addr):
@@ -896,6 +905,9 @@ class UserAPI(object):
         set_password(self.odb_session_func, self.encrypt_func, self.hash_func, self.sso_conf, user_id, password,
             must_change, password_expiry)
 
+        # Cached sessions of the user contain the old password and its expiration time
+        self.session.invalidate(user_id=user_id)
+
 # ################################################################################################################################
 
     def change_password(self, cid, data, current_ust, current_app, remote_addr):
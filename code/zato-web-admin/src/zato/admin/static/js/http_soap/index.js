@@ -144,6 +144,11 @@ $.fn.zato.http_soap.data_table.new_row = function(item, data, include_tr) {
     /* 9 */
     row += String.format('<td>{0}</td>', security_name);
 
+    /* 9a */
+    if(is_outgoing) {
+        row += '<td><span class="form_hint">---</span></td>';
+    }
+
     /* 10,11 */
     if(is_soap) {
         row += soap_action_tr;
@@ -184,6 +189,16 @@ $.fn.zato.http_soap.data_table.new_row = function(item, data, include_tr) {
         row += String.format("<td class='ignore'>{0}</td>", item.content_type);
     }
 
+    /* 27a,27b,27c,27d,27e,27f */
+    if(is_outgoing) {
+        row += String.format("<td class='ignore'>{0}</td>", item.circuit_failure_rate);
+        row += String.format("<td class='ignore'>{0}</td>", item.circuit_slow_call_time);
+        row += String.format("<td class='ignore'>{0}</td>", item.circuit_open_time);
+        row += String.format("<td class='ignore'>{0}</td>", item.concurrency_max);
+        row += String.format("<td class='ignore'>{0}</td>", item.concurrency_latency_target);
+        row += String.format("<td class='ignore'>{0}</td>", item.concurrency_queue_timeout);
+    }
+
     /* 28,29,30 */
     if(is_channel) {
         row += merge_url_params_req_tr;
@@ -53,6 +53,12 @@ class CreateForm(DataFormatForm):
     cache_id = forms.ChoiceField(widget=forms.Select())
     cache_expiry = forms.CharField(widget=forms.TextInput(attrs={'style':'width:20%'}), initial=0)
     content_encoding = forms.CharField(widget=forms.TextInput(attrs={'style':'width:20%'}))
+    circuit_failure_rate = forms.CharField(widget=forms.TextInput(attrs={'style':'width:15%'}))
+    circuit_slow_call_time = forms.CharField(widget=forms.TextInput(attrs={'style':'width:15%'}))
+    circuit_open_time = forms.CharField(widget=forms.TextInput(attrs={'style':'width:15%'}))
+    concurrency_max = forms.CharField(widget=forms.TextInput(attrs={'style':'width:15%'}))
+    concurrency_latency_target = forms.CharField(widget=forms.TextInput(attrs={'style':'width:15%'}))
+    concurrency_queue_timeout = forms.CharField(widget=forms.TextInput(attrs={'style':'width:15%'}))
     data_formats_allowed = SIMPLE_IO.HTTP_SOAP_FORMAT
 
     def __init__(self, security_list=[], sec_tls_ca_cert_list={}, cache_list=[], soap_versions=SOAP_VERSIONS,
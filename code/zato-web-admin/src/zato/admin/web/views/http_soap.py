@@ -47,6 +47,10 @@ TRANSPORT = {
     'soap': 'SOAP',
     }
 
+# Opaque attributes of outgoing connections that configure their circuit breakers and concurrency limits
+limits_config_keys = ('circuit_failure_rate', 'circuit_slow_call_time', 'circuit_open_time', 'concurrency_max',
+    'concurrency_latency_target', 'concurrency_queue_timeout')
+
 CACHE_TYPE = {
     CACHE.TYPE.BUILTIN: 'Built-in',
     CACHE.TYPE.MEMCACHED: 'Memcached',
@@ -88,8 +92,27 @@ def _get_edit_create_message(params, prefix=''):
         'cache_id': params.get(prefix + 'cache_id'),
         'cache_expiry': params.get(prefix + 'cache_expiry'),
         'content_encoding': params.get(prefix + 'content_encoding'),
+        'circuit_failure_rate': params.get(prefix + 'circuit_failure_rate'),
+        'circuit_slow_call_time': params.get(prefix + 'circuit_slow_call_time'),
+        'circuit_open_time': params.get(prefix + 'circuit_open_time'),
+        'concurrency_max': params.get(prefix + 'concurrency_max'),
+        'concurrency_latency_target': params.get(prefix + 'concurrency_latency_target'),
+        'concurrency_queue_timeout': params.get(prefix + 'concurrency_queue_timeout'),
     }
 
+def _get_limits_state(stats):
+    """ Returns a human-readable state of an outgoing connection's circuit breaker and concurrency limit.
+    """
+    out = []
+
+    if stats.get('circuit_state'):
+        out.append('Circuit {}'.format(stats.circuit_state))
+
+    if stats.get('concurrency_limit') is not None:
+        out.append('{}/{} in flight'.format(stats.concurrency_in_flight, stats.concurrency_limit))
+
+    return ', '.join(out)
+
 def _edit_create_response(req, id, verb, transport, connection, name):
 
     return_data = {
@@ -139,6 +162,9 @@ def index(req):
     if transport == 'soap':
         colspan += 2
 
+    if connection == 'outgoing':
+        colspan += 1
+
     if req.zato.cluster_id:
         for def_item in req.zato.client.invoke('zato.security.get-list', {'cluster_id': req.zato.cluster.id}):
             if connection == 'outgoing':
@@ -178,6 +204,12 @@ def index(req):
 
         data, meta = parse_response_data(req.zato.client.invoke('zato.http-soap.get-list', input_dict))
 
+        # Circuit breakers and concurrency limits exist only for outgoing connections
+        limits_state = {}
+        if connection == 'outgoing':
+            for stats in req.zato.client.invoke('zato.http-soap.get-limits-stats', {}):
+                limits_state[stats.name] = _get_limits_state(stats)
+
         for item in data:
             if query not in item.name:
                 continue
@@ -210,6 +242,7 @@ def index(req):
             if match_slash == '':
                 match_slash = True
 
+            _item = item
             item = HTTPSOAP(item.id, item.name, item.is_active, item.is_internal, connection,
                     transport, item.host, item.url_path, item.method, item.soap_action,
                     item.soap_version, item.data_format, item.ping_method,
@@ -219,6 +252,13 @@ def index(req):
                     security_name=security_name, content_type=item.content_type,
                     cache_id=item.cache_id, cache_name=cache_name, cache_type=item.cache_type, cache_expiry=item.cache_expiry,
                     content_encoding=item.content_encoding, match_slash=match_slash)
+
+            # Added in 3.1, hence optional
+            if connection == 'outgoing':
+                for name in limits_config_keys:
+                    setattr(item, name, _item.get(name))
+                item.limits_state = limits_state.get(item.name)
+
             items.append(item)
 
     return_data = {'zato_clusters':req.zato.clusters,